@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+为升级前上传的照片补算派生数据（服务器端命令行工具）
+
+    content_hash / perceptual_hash   重复照片检测（/api/photos/duplicates）使用
+    placeholder / dominant_color     照片列表的低清占位图和主色调（由缩略图生成）
+
+新上传和导入的照片在写入时已经计算，这里只处理缺失的照片。按ID分批处理，每批提交一次，
+中断后重新运行只处理仍缺失的照片；文件不存在或无法解码的照片跳过（下次运行仍会重试）
+
+用法:
+    python backfill_photos.py
+    python backfill_photos.py --user alice --batch-size 200
+"""
+import argparse
+import sys
+import time
+
+
+def run_backfill(args):
+    from sqlalchemy import and_, or_
+    from server import app, db, upgrade_schema, storage, user_data_changed, Photo, User
+    from utils.image_hash import sha256_file, phash_file, hash_to_hex
+    from utils.thumbnail import generate_placeholder
+
+    with app.app_context():
+        db.create_all()
+        upgrade_schema()
+
+        query = Photo.query.filter(or_(
+            Photo.content_hash.is_(None),
+            Photo.perceptual_hash.is_(None),
+            and_(Photo.placeholder.is_(None), Photo.thumbnail_path.isnot(None))
+        ))
+        if args.user:
+            user = User.query.filter_by(username=args.user).first()
+            if user is None:
+                print(f"❌ 用户不存在: {args.user}")
+                return 1
+            query = query.filter(Photo.user_id == user.id)
+
+        updated = skipped = 0
+        last_id = 0
+        start = time.perf_counter()
+        while True:
+            photos = query.filter(Photo.id > last_id).order_by(Photo.id).limit(args.batch_size).all()
+            if not photos:
+                break
+            last_id = photos[-1].id
+
+            users = set()
+            for photo in photos:
+                if not photo.placeholder and photo.thumbnail_path and storage.exists(photo.thumbnail_path):
+                    photo.placeholder, photo.dominant_color = generate_placeholder(
+                        storage.local_path(photo.thumbnail_path)
+                    )
+                    users.add(photo.user_id)
+                if photo.content_hash and photo.perceptual_hash:
+                    updated += 1
+                    continue
+                if not storage.exists(photo.file_path):
+                    skipped += 1
+                    print(f"  文件不存在，跳过 #{photo.id}: {photo.file_path}")
+                    continue
+                # 对象存储时会下载到本地缓存
+                local_path = storage.local_path(photo.file_path)
+                if not photo.content_hash:
+                    photo.content_hash = sha256_file(local_path)
+                if not photo.perceptual_hash:
+                    value = phash_file(local_path)
+                    photo.perceptual_hash = hash_to_hex(value) if value is not None else None
+                updated += 1
+            db.session.commit()
+            # 占位图出现在照片列表中，使这些用户的列表缓存失效
+            for user_id in users:
+                user_data_changed(user_id)
+            print(f"  已处理到 #{last_id}: 补算 {updated}  跳过 {skipped}")
+
+        elapsed = time.perf_counter() - start
+        print(f"✅ 完成: 补算 {updated}，跳过 {skipped}，用时 {elapsed:.1f}s")
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='为升级前上传的照片补算内容哈希、感知哈希和占位图')
+    parser.add_argument('--user', help='只处理该用户的照片')
+    parser.add_argument('--batch-size', type=int, default=200, help='每个事务处理的照片数')
+    args = parser.parse_args()
+    sys.exit(run_backfill(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+编辑流程峰值内存（RSS）测试：整图float32处理 vs 逐行带就地处理
+每个用例在独立子进程中运行，读取子进程的 ru_maxrss
+
+用法:
+    python benchmarks/bench_edit_memory.py --sizes 12 24 50
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+ADJUSTMENTS = {'brightness': 10, 'contrast': 20, 'saturation': 30, 'hue': 45}
+
+
+def make_image(path, megapixels):
+    import numpy as np
+    from PIL import Image
+
+    width = int((megapixels * 1e6 * 3) ** 0.5)
+    height = int(megapixels * 1e6 / width)
+    row = np.linspace(0, 255, width, dtype=np.uint8)
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
+    pixels[:, :, 0] = row
+    pixels[:, :, 1] = row[::-1]
+    pixels[:, :, 2] = 128
+    Image.fromarray(pixels).save(path, quality=90)
+    return width, height
+
+
+def run_legacy(path, out_path):
+    """原实现：整图转float32，调整后再整体转回uint8"""
+    import numpy as np
+    from PIL import Image
+    from benchmarks.bench_edit_pipeline import legacy_adjust
+
+    with Image.open(path) as img:
+        img = img.convert('RGB')
+        pixels = np.array(img)
+        img = Image.fromarray(legacy_adjust(pixels, ADJUSTMENTS), 'RGB')
+        img.save(out_path, quality=95, optimize=True)
+
+
+def run_strips(path, out_path):
+    """新实现：在PIL图像上逐行带就地调整"""
+    from PIL import Image
+    from utils.image_edit import adjust_image
+
+    with Image.open(path) as img:
+        img = img.convert('RGB')
+        adjust_image(img, ADJUSTMENTS)
+        img.save(out_path, quality=95, optimize=True)
+
+
+def _child(target, path, out_path, queue):
+    start = time.perf_counter()
+    target(path, out_path)
+    elapsed = time.perf_counter() - start
+    # Linux上ru_maxrss单位为KB
+    queue.put((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, elapsed))
+
+
+def measure(target, path, out_path):
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_child, args=(target, path, out_path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='编辑流程峰值内存测试')
+    parser.add_argument('--sizes', type=float, nargs='+', default=[12, 24, 50], help='图片尺寸（百万像素）')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for megapixels in args.sizes:
+            path = os.path.join(tmp, 'input.jpg')
+            out_path = os.path.join(tmp, 'output.jpg')
+            width, height = make_image(path, megapixels)
+            legacy_rss, legacy_time = measure(run_legacy, path, out_path)
+            strip_rss, strip_time = measure(run_strips, path, out_path)
+            print(f"{megapixels:5.0f} MP ({width}x{height})  "
+                  f"原实现 峰值 {legacy_rss:7.0f} MB {legacy_time:6.2f}s  "
+                  f"行带实现 峰值 {strip_rss:7.0f} MB {strip_time:6.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+调色流程基准测试：原逐步float32实现 vs 查找表 + 行带融合实现
+同时校验两者输出的最大像素差
+
+用法:
+    python benchmarks/bench_edit_pipeline.py --megapixels 24 --repeat 3
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+
+from utils.image_edit import adjust_pixels
+
+CASES = [
+    ('亮度+对比度', {'brightness': 20, 'contrast': 15}),
+    ('饱和度', {'saturation': 40}),
+    ('色相', {'hue': 45}),
+    ('全部', {'brightness': -10, 'contrast': 25, 'saturation': -30, 'hue': 120}),
+]
+
+
+def legacy_adjust(pixels, data):
+    """原 edit_photo 中的调色实现（用于对比）"""
+    img_array = np.array(pixels, dtype=np.float32)
+
+    # 应用亮度调整（与前端算法一致）
+    if 'brightness' in data:
+        brightness_value = float(data['brightness'])
+        if brightness_value != 0:
+            img_array[:, :, :3] = np.clip(img_array[:, :, :3] + brightness_value, 0, 255)
+
+    # 应用对比度调整（与前端算法一致）
+    if 'contrast' in data:
+        contrast_value = float(data['contrast'])
+        if contrast_value != 0:
+            contrast_factor = (contrast_value + 100) / 100.0
+            img_array[:, :, :3] = np.clip((img_array[:, :, :3] - 128) * contrast_factor + 128, 0, 255)
+
+    # 应用饱和度调整（与前端算法一致）
+    if 'saturation' in data:
+        saturation_value = float(data['saturation'])
+        if saturation_value != 0:
+            saturation_factor = (saturation_value + 100) / 100.0
+            # 计算灰度值（使用与前端相同的权重）
+            gray = 0.299 * img_array[:, :, 0] + 0.587 * img_array[:, :, 1] + 0.114 * img_array[:, :, 2]
+            gray = np.stack([gray, gray, gray], axis=2)
+            # 应用饱和度调整
+            img_array[:, :, :3] = np.clip(gray + (img_array[:, :, :3] - gray) * saturation_factor, 0, 255)
+
+    # 应用色相调整（与前端算法一致，使用HSL）
+    if 'hue' in data:
+        hue_shift = float(data['hue'])
+        if hue_shift != 0:
+            try:
+                # RGB转HSL（与前端算法一致）
+                def rgb_to_hsl(rgb_array):
+                    """将RGB数组转换为HSL"""
+                    r, g, b = rgb_array[:, :, 0] / 255.0, rgb_array[:, :, 1] / 255.0, rgb_array[:, :, 2] / 255.0
+                    max_val = np.maximum(np.maximum(r, g), b)
+                    min_val = np.minimum(np.minimum(r, g), b)
+                    delta = max_val - min_val
+
+                    l = (max_val + min_val) / 2.0
+                    s = np.zeros_like(l)
+                    h = np.zeros_like(l)
+
+                    # 计算饱和度
+                    mask = delta != 0
+                    s[mask] = np.where(l[mask] > 0.5, delta[mask] / (2 - max_val[mask] - min_val[mask]), 
+                                       delta[mask] / (max_val[mask] + min_val[mask]))
+
+                    # 计算色相
+                    mask_r = (delta != 0) & (max_val == r)
+                    mask_g = (delta != 0) & (max_val == g)
+                    mask_b = (delta != 0) & (max_val == b)
+
+                    h[mask_r] = ((g[mask_r] - b[mask_r]) / delta[mask_r]) % 6
+                    h[mask_g] = ((b[mask_g] - r[mask_g]) / delta[mask_g]) + 2
+                    h[mask_b] = ((r[mask_b] - g[mask_b]) / delta[mask_b]) + 4
+
+                    h = h / 6.0
+                    return np.stack([h, s, l], axis=2)
+
+                def hsl_to_rgb(hsl_array):
+                    """将HSL数组转换为RGB"""
+                    h, s, l = hsl_array[:, :, 0], hsl_array[:, :, 1], hsl_array[:, :, 2]
+
+                    def hue2rgb(p, q, t):
+                        # 与前端算法完全一致
+                        t = np.where(t < 0, t + 1, t)
+                        t = np.where(t > 1, t - 1, t)
+                        result = np.zeros_like(t)
+                        # 分段处理，与前端hue2rgb函数一致
+                        mask1 = t < 1/6
+                        mask2 = (t >= 1/6) & (t < 1/2)
+                        mask3 = (t >= 1/2) & (t < 2/3)
+                        mask4 = t >= 2/3
+                        result[mask1] = p[mask1] + (q[mask1] - p[mask1]) * 6 * t[mask1]
+                        result[mask2] = q[mask2]
+                        result[mask3] = p[mask3] + (q[mask3] - p[mask3]) * (2/3 - t[mask3]) * 6
+                        result[mask4] = p[mask4]  # t >= 2/3 的情况
+                        return result
+
+                    r = np.zeros_like(l)
+                    g = np.zeros_like(l)
+                    b = np.zeros_like(l)
+
+                    mask = s != 0
+                    q = np.where(l[mask] < 0.5, l[mask] * (1 + s[mask]), l[mask] + s[mask] - l[mask] * s[mask])
+                    p = 2 * l[mask] - q
+
+                    r[mask] = hue2rgb(p, q, h[mask] + 1/3)
+                    g[mask] = hue2rgb(p, q, h[mask])
+                    b[mask] = hue2rgb(p, q, h[mask] - 1/3)
+
+                    # 无饱和度的情况
+                    r[~mask] = l[~mask]
+                    g[~mask] = l[~mask]
+                    b[~mask] = l[~mask]
+
+                    return np.stack([r * 255, g * 255, b * 255], axis=2)
+
+                # 转换为HSL
+                hsl_array = rgb_to_hsl(img_array)
+
+                # 应用色相偏移
+                hsl_array[:, :, 0] = (hsl_array[:, :, 0] + hue_shift / 360.0) % 1.0
+
+                # 转换回RGB
+                img_array[:, :, :3] = hsl_to_rgb(hsl_array)
+
+            except Exception as e:
+                print(f"色相调整失败: {e}")
+                import traceback
+                traceback.print_exc()
+
+
+    return np.clip(img_array, 0, 255).astype(np.uint8)
+
+
+def make_pixels(megapixels):
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(megapixels * 1e6 / width)
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+def timeit(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='调色流程基准测试')
+    parser.add_argument('--megapixels', type=float, default=12)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pixels = make_pixels(args.megapixels)
+    print(f"图片尺寸: {pixels.shape[1]}x{pixels.shape[0]} ({pixels.shape[0] * pixels.shape[1] / 1e6:.1f} MP)")
+
+    for name, data in CASES:
+        legacy_time, expected = timeit(lambda: legacy_adjust(pixels, data), args.repeat)
+        fused_time, actual = timeit(lambda: adjust_pixels(pixels.copy(), **data), args.repeat)
+        max_diff = int(np.abs(expected.astype(np.int16) - actual.astype(np.int16)).max())
+        print(f"{name:<10} 原实现 {legacy_time * 1000:8.0f} ms  融合实现 {fused_time * 1000:8.0f} ms  "
+              f"({legacy_time / fused_time:5.1f}x)  最大像素差 {max_diff}")
+
+
+if __name__ == '__main__':
+    main()
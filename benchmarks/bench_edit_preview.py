@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+编辑预览耗时测试：全尺寸调色 vs 代理图（长边1200px）预览
+代理图在服务端按 (照片, 编辑版本) 缓存，这里只计算缓存命中后的单次预览耗时
+
+用法:
+    python benchmarks/bench_edit_preview.py --megapixels 12 --repeat 10
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.image_edit import apply_operation  # noqa: E402
+
+OPERATION = {'brightness': 10, 'contrast': 20, 'saturation': 30, 'hue': 45}
+
+
+def make_image(megapixels):
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(megapixels * 1e6 / width)
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)
+    pixels = np.empty((height, width, 3), dtype=np.float32)
+    pixels[:, :, 0] = gradient
+    pixels[:, :, 1] = gradient[::-1]
+    pixels[:, :, 2] = 128
+    pixels += rng.normal(0, 4, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), 'RGB')
+
+
+def render(img, quality):
+    result = apply_operation(img.copy(), OPERATION)
+    buffer = io.BytesIO()
+    result.save(buffer, format='JPEG', quality=quality)
+    return buffer.getbuffer().nbytes
+
+
+def timeit(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000, float(np.median(times)) * 1000, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='编辑预览耗时测试')
+    parser.add_argument('--megapixels', type=float, default=12, help='原图尺寸（百万像素）')
+    parser.add_argument('--proxy-size', type=int, default=1200, help='代理图长边像素')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    original = make_image(args.megapixels)
+    proxy = original.copy()
+    proxy.thumbnail((args.proxy_size, args.proxy_size), Image.Resampling.LANCZOS)
+
+    full = timeit(lambda: render(original, 95), max(1, args.repeat // 5))
+    preview = timeit(lambda: render(proxy, 80), args.repeat)
+    print(f"全尺寸 {original.size[0]}x{original.size[1]}: 最快 {full[0]:7.1f} ms  中位数 {full[1]:7.1f} ms  {full[2] / 1024:7.0f} KB")
+    print(f"代理图 {proxy.size[0]}x{proxy.size[1]}:  最快 {preview[0]:7.1f} ms  中位数 {preview[1]:7.1f} ms  {preview[2] / 1024:7.0f} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+EXIF提取吞吐测试（文件数/秒）：原实现（exifread整文件解析 + PIL备选） vs 轻量元数据段解析
+样本包含带EXIF/GPS的JPEG、无EXIF的JPEG，以及HEIC结构（ftyp/meta/iloc/mdat）的样本
+
+用法:
+    python benchmarks/bench_exif.py --count 200 --workers 8
+"""
+import argparse
+import io
+import os
+import struct
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+from PIL.TiffImagePlugin import IFDRational
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.exif_reader import extract_exif, extract_exif_many  # noqa: E402
+
+
+def make_exif(index):
+    exif = Image.Exif()
+    exif[0x010F] = 'Canon'
+    exif[0x0110] = f'EOS R{index % 8}'
+    exif[0x0132] = '2024:05:01 10:00:00'
+    exif_ifd = exif.get_ifd(0x8769)
+    exif_ifd[0x9003] = f'2024:05:{index % 28 + 1:02d} 08:30:00'
+    exif_ifd[0x8827] = 100 * (index % 16 + 1)
+    exif_ifd[0x829D] = IFDRational(28, 10)
+    exif_ifd[0x829A] = IFDRational(1, 250)
+    exif_ifd[0x920A] = IFDRational(50, 1)
+    exif_ifd[0xA403] = index % 2
+    exif_ifd[0x9209] = 16
+    exif_ifd[0xA402] = 0
+    exif_ifd[0x9207] = 5
+    gps = exif.get_ifd(0x8825)
+    gps[1] = 'N'
+    gps[2] = (30.0, 15.0, 12.5)
+    gps[3] = 'E'
+    gps[4] = (120.0, 10.0, 30.0)
+    return exif
+
+
+def make_pixels(width, height, seed):
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)
+    pixels = np.repeat(gradient[None, :, None], height, axis=0).repeat(3, axis=2)
+    pixels += rng.normal(0, 8, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), 'RGB')
+
+
+def _box(box_type, payload):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def _full_box(box_type, version, payload):
+    return _box(box_type, struct.pack('>I', version << 24) + payload)
+
+
+def make_heif_like(exif_bytes, image_data):
+    """构造HEIC结构的样本：meta中登记一个 hvc1 图像项和一个 Exif 项，数据放在mdat中"""
+    tiff = exif_bytes[6:] if exif_bytes.startswith(b'Exif\x00\x00') else exif_bytes
+    exif_item = struct.pack('>I', 0) + tiff
+
+    ftyp = _box(b'ftyp', b'heic' + struct.pack('>I', 0) + b'mif1heic')
+    hdlr = _full_box(b'hdlr', 0, struct.pack('>I', 0) + b'pict' + b'\x00' * 12 + b'\x00')
+    infe_image = _full_box(b'infe', 2, struct.pack('>HH', 1, 0) + b'hvc1' + b'\x00')
+    infe_exif = _full_box(b'infe', 2, struct.pack('>HH', 2, 0) + b'Exif' + b'\x00')
+    iinf = _full_box(b'iinf', 0, struct.pack('>H', 2) + infe_image + infe_exif)
+
+    def build(mdat_offset):
+        items = [(1, mdat_offset + 8, len(image_data)), (2, mdat_offset + 8 + len(image_data), len(exif_item))]
+        body = bytes([0x44, 0x00]) + struct.pack('>H', len(items))
+        for item_id, offset, length in items:
+            body += struct.pack('>HHHII', item_id, 0, 1, offset, length)
+        iloc = _full_box(b'iloc', 0, body)
+        return _full_box(b'meta', 0, hdlr + iinf + iloc)
+
+    meta = build(0)
+    meta = build(len(ftyp) + len(meta))
+    mdat = _box(b'mdat', image_data + exif_item)
+    return ftyp + meta + mdat
+
+
+def make_corpus(directory, count, width, height):
+    paths = []
+    for index in range(count):
+        img = make_pixels(width, height, index)
+        kind = index % 4
+        if kind == 3:
+            # 无EXIF的图片（原实现会再用PIL解析一遍）
+            path = os.path.join(directory, f'plain_{index}.jpg')
+            img.save(path, quality=90)
+        else:
+            exif = make_exif(index)
+            if kind == 2:
+                buffer = io.BytesIO()
+                img.save(buffer, 'JPEG', quality=90)
+                path = os.path.join(directory, f'heic_{index}.heic')
+                with open(path, 'wb') as f:
+                    f.write(make_heif_like(exif.tobytes(), buffer.getvalue()))
+            else:
+                path = os.path.join(directory, f'exif_{index}.jpg')
+                img.save(path, quality=90, exif=exif)
+        paths.append(path)
+    return paths
+
+
+def legacy_extract(path):
+    """原实现的解析路径：exifread 解析整个文件，没有结果时再用 PIL 读取一遍"""
+    import exifread
+
+    try:
+        with open(path, 'rb') as f:
+            tags = exifread.process_file(f, details=False)
+        if tags:
+            return tags
+    except Exception:
+        pass
+    try:
+        with Image.open(path) as img:
+            exif = img.getexif()
+            return dict(exif), exif.get_ifd(0x8825)
+    except Exception:
+        return {}
+
+
+def measure(func, paths):
+    start = time.perf_counter()
+    for path in paths:
+        func(path)
+    return len(paths) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXIF提取吞吐测试')
+    parser.add_argument('--count', type=int, default=200, help='样本数量')
+    parser.add_argument('--size', type=int, nargs=2, default=[2000, 1500], help='样本尺寸')
+    parser.add_argument('--workers', type=int, default=8, help='批量模式线程数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_corpus(tmp, args.count, *args.size)
+        total_mb = sum(os.path.getsize(path) for path in paths) / 1024 / 1024
+        print(f"样本: {len(paths)} 个文件, {total_mb:.0f} MB")
+
+        heic = [path for path in paths if path.endswith('.heic')]
+        found = sum(1 for path in heic if extract_exif(path).get('latitude') is not None)
+        legacy_found = sum(1 for path in heic if 'GPS GPSLatitude' in legacy_extract(path))
+        print(f"HEIC样本GPS提取: 原实现 {legacy_found}/{len(heic)}, 元数据段解析 {found}/{len(heic)}")
+
+        # 先各跑一遍预热文件缓存
+        measure(legacy_extract, paths)
+        measure(extract_exif, paths)
+        legacy = measure(legacy_extract, paths)
+        lean = measure(extract_exif, paths)
+        start = time.perf_counter()
+        for _ in extract_exif_many(paths, workers=args.workers):
+            pass
+        bulk = len(paths) / (time.perf_counter() - start)
+        print(f"原实现（exifread + PIL）: {legacy:8.0f} 文件/秒")
+        print(f"元数据段解析:             {lean:8.0f} 文件/秒")
+        print(f"批量模式（{args.workers}线程）:       {bulk:8.0f} 文件/秒")
+
+
+if __name__ == '__main__':
+    main()
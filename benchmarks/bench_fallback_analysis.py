@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+回退颜色/亮度分析的微基准测试：全尺寸解码的旧实现 vs 缩小解码的新实现
+
+用法:
+    python benchmarks/bench_fallback_analysis.py --width 4000 --height 3000 --repeat 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import cv2
+import numpy as np
+
+from utils.color_analysis import analyze_image_colors, color_tags_from_stats
+
+
+def legacy_analysis(image_path):
+    """旧实现：全尺寸解码，平均色相 + 单独的灰度转换"""
+    img = cv2.imread(image_path)
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    hue_mean = np.mean(hsv[:, :, 0])
+    brightness = np.mean(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+    return hue_mean, brightness
+
+
+def make_photo(path, width, height):
+    """生成带渐变和噪声的测试照片"""
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    img = np.empty((height, width, 3), dtype=np.float32)
+    img[:, :, 0] = x
+    img[:, :, 1] = y
+    img[:, :, 2] = 128
+    img += rng.normal(0, 4, img.shape).astype(np.float32)
+    cv2.imwrite(path, np.clip(img, 0, 255).astype(np.uint8), [cv2.IMWRITE_JPEG_QUALITY, 90])
+
+
+def timeit(func, path, repeat):
+    func(path)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(path)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回退分析微基准')
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=3000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.jpg')
+        make_photo(path, args.width, args.height)
+
+        legacy = timeit(legacy_analysis, path, args.repeat)
+        fast = timeit(analyze_image_colors, path, args.repeat)
+
+        print(f"图片尺寸: {args.width}x{args.height}, 文件大小: {os.path.getsize(path) / 1024:.0f} KB")
+        print(f"旧实现（全尺寸）: {legacy * 1000:8.1f} ms/张")
+        print(f"新实现（缩小解码）: {fast * 1000:8.1f} ms/张  ({legacy / fast:.1f}x)")
+        print(f"新实现标签: {color_tags_from_stats(analyze_image_colors(path))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+照片列表序列化耗时：原实现（ORM对象 + 逐张加载标签 + 标准库json） vs 列查询 + 批量标签 + orjson，
+以及列式格式（?format=columns），分别统计查询、构造、序列化的时间和响应体积
+
+使用临时SQLite数据库（不需要MySQL），每张照片带若干标签
+
+用法:
+    python benchmarks/bench_listing_serialization.py --photos 1000 --sizes 20,200,1000 --repeat 20
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+WORK_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'bench.db')
+os.environ['RESPONSE_CACHE_ENABLED'] = 'false'
+os.environ.setdefault('AI_PROVIDER', 'fallback')
+os.chdir(WORK_DIR)
+
+import server  # noqa: E402
+from server import Photo, PhotoTag, Tag, User, app, db  # noqa: E402
+from utils.fast_json import orjson  # noqa: E402
+
+
+def seed(photo_count, tags_per_photo):
+    db.create_all()
+    user = User(username='benchuser', email='bench@example.com', password_hash='x')
+    db.session.add(user)
+    tags = [Tag(name=f'标签{i}', type='auto') for i in range(40)]
+    db.session.add_all(tags)
+    db.session.flush()
+    start = datetime(2024, 1, 1)
+    photos = [
+        Photo(
+            user_id=user.id, filename=f'{index:064x}.jpg', original_filename=f'IMG_{index:05d}.jpg',
+            file_path=f'uploads/{index:064x}.jpg', thumbnail_path=f'thumbnails/thumb_{index:064x}.jpg',
+            file_size=2_000_000 + index, mime_type='image/jpeg', width=4032, height=3024,
+            taken_at=start + timedelta(hours=index), location_name='上海' if index % 3 else None,
+            placeholder='data:image/webp;base64,' + 'A' * 120, dominant_color='#336699',
+            edit_version=index % 2, created_at=start + timedelta(minutes=index)
+        )
+        for index in range(photo_count)
+    ]
+    db.session.add_all(photos)
+    db.session.flush()
+    db.session.add_all(
+        PhotoTag(photo_id=photo.id, tag_id=tags[(photo.id + offset) % len(tags)].id)
+        for photo in photos for offset in range(tags_per_photo)
+    )
+    db.session.commit()
+    return user.id
+
+
+def legacy_listing(user_id, per_page):
+    """改动前的 get_photos：完整ORM对象，逐张访问 photo.tags，标准库json"""
+    photos = (Photo.query.filter_by(user_id=user_id).order_by(Photo.created_at.desc())
+              .paginate(page=1, per_page=per_page, error_out=False))
+    items = [{
+        'id': photo.id,
+        'filename': photo.filename,
+        'original_filename': photo.original_filename,
+        'width': photo.width,
+        'height': photo.height,
+        'file_size': photo.file_size,
+        'taken_at': photo.taken_at.isoformat() if photo.taken_at else None,
+        'location': photo.location_name,
+        'tags': [tag.name for tag in photo.tags],
+        'edit_version': photo.edit_version or 0,
+        'thumbnail_url': f'/api/thumbnail/{photo.id}',
+        'placeholder': photo.placeholder,
+        'dominant_color': photo.dominant_color
+    } for photo in photos.items]
+    built = time.perf_counter()
+    body = json.dumps({'photos': items, 'total': photos.total}, separators=(',', ':'), sort_keys=True)
+    return built, body.encode('utf-8')
+
+
+def projected_listing(user_id, per_page, columnar):
+    """当前的 get_photos：列查询 + 批量标签 + orjson"""
+    photos = (db.session.query(*server.PHOTO_LIST_COLUMNS).filter(Photo.user_id == user_id)
+              .order_by(Photo.created_at.desc()).paginate(page=1, per_page=per_page, error_out=False))
+    tags = server.load_photo_tags([photo.id for photo in photos.items])
+    if columnar:
+        items = server.photo_list_columns(photos.items, tags)
+    else:
+        items = [server.photo_list_item(photo, tags[photo.id]) for photo in photos.items]
+    built = time.perf_counter()
+    return built, app.json.dumps({'photos': items, 'total': photos.total}).encode('utf-8')
+
+
+def measure(run, repeat):
+    build_times, dump_times, total_times = [], [], []
+    body = b''
+    for _ in range(repeat):
+        # 每次清空会话，避免上一轮加载的对象和标签留在身份映射中
+        db.session.expire_all()
+        db.session.remove()
+        start = time.perf_counter()
+        built, body = run()
+        end = time.perf_counter()
+        build_times.append(built - start)
+        dump_times.append(end - built)
+        total_times.append(end - start)
+    return (statistics.median(build_times) * 1000, statistics.median(dump_times) * 1000,
+            statistics.median(total_times) * 1000, len(body))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='照片列表序列化耗时测试')
+    parser.add_argument('--photos', type=int, default=1000, help='照片数量')
+    parser.add_argument('--tags', type=int, default=6, help='每张照片的标签数')
+    parser.add_argument('--sizes', default='20,200,1000', help='每页条数，逗号分隔')
+    parser.add_argument('--repeat', type=int, default=20, help='每项重复次数（取中位数）')
+    args = parser.parse_args()
+
+    print(f'orjson: {"已安装 " + orjson.__version__ if orjson else "未安装（退回标准库）"}')
+    with app.app_context():
+        user_id = seed(args.photos, args.tags)
+        print(f'照片 {args.photos} 张，每张 {args.tags} 个标签\n')
+        print(f'{"每页":>6}  {"实现":<22}{"查询+构造":>10}{"序列化":>10}{"合计":>10}{"体积":>10}')
+        for per_page in [int(value) for value in args.sizes.split(',')]:
+            variants = [
+                ('原实现', lambda: legacy_listing(user_id, per_page)),
+                ('列查询+orjson', lambda: projected_listing(user_id, per_page, False)),
+                ('列式格式', lambda: projected_listing(user_id, per_page, True)),
+            ]
+            baseline = None
+            for name, run in variants:
+                with app.test_request_context():
+                    build_ms, dump_ms, total_ms, size = measure(run, args.repeat)
+                baseline = baseline or total_ms
+                print(f'{per_page:>6}  {name:<22}{build_ms:>8.2f}ms{dump_ms:>8.2f}ms{total_ms:>8.2f}ms'
+                      f'{size / 1024:>8.1f}KB  x{baseline / total_ms:.1f}')
+            print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+本地分类模型吞吐量测试（CPU，images/s）
+
+用法:
+    python benchmarks/bench_local_model.py --count 64 --batch-size 8
+    python benchmarks/bench_local_model.py --baseline   # 同时测量每次重建pipeline的旧方式
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+from PIL import Image
+
+
+def make_images(directory, count, size=(640, 480)):
+    """生成随机测试图片"""
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(count):
+        data = rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+        path = os.path.join(directory, f'bench_{i}.jpg')
+        Image.fromarray(data).save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def report(name, count, elapsed):
+    print(f"{name:<28} {count:>5} 张  {elapsed:8.2f}s  {count / elapsed:8.2f} images/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模型吞吐量测试')
+    parser.add_argument('--count', type=int, default=32)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=0)
+    parser.add_argument('--backend', default='torch', choices=['torch', 'onnx'])
+    parser.add_argument('--baseline', action='store_true', help='测量每张图片重建pipeline的旧方式（很慢）')
+    args = parser.parse_args()
+
+    try:
+        import transformers  # noqa: F401
+    except ImportError:
+        print("Transformers库未安装，请运行: pip install transformers torch")
+        return
+
+    from utils.local_model import LocalModelServer
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_images(tmp, args.count)
+
+        if args.baseline:
+            from transformers import pipeline
+            sample = paths[:min(4, len(paths))]
+            start = time.perf_counter()
+            for path in sample:
+                classifier = pipeline("image-classification", model="microsoft/resnet-50")
+                with Image.open(path) as img:
+                    classifier(img)
+            report('每次重建pipeline', len(sample), time.perf_counter() - start)
+
+        server = LocalModelServer(backend=args.backend, batch_size=args.batch_size,
+                                  num_threads=args.threads or None)
+        start = time.perf_counter()
+        server.warmup()
+        print(f"模型加载耗时: {time.perf_counter() - start:.2f}s")
+
+        # 预热一次，排除首次推理的初始化开销
+        server.classify(paths[0])
+
+        unbatched = LocalModelServer(backend=args.backend, batch_size=1,
+                                     num_threads=args.threads or None)
+        unbatched._classifier = server._classifier
+        start = time.perf_counter()
+        for path in paths:
+            unbatched.classify(path)
+        report('常驻模型 batch=1', len(paths), time.perf_counter() - start)
+
+        start = time.perf_counter()
+        server.classify_many(paths)
+        report(f'常驻模型 batch={args.batch_size}', len(paths), time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    main()
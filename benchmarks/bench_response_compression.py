@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+JSON 响应压缩：各编码、各等级的压缩后体积、压缩/解压耗时，以及按给定带宽估算的总传输时间
+
+样本为 /api/photos 的列表响应（含完整标签列表和占位图），分别测试每页 20/200/1000 条
+
+用法:
+    python benchmarks/bench_response_compression.py --sizes 20,200,1000 --bandwidth 20
+"""
+import argparse
+import base64
+import gzip
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.compression import ResponseCompressor, brotli, zstandard  # noqa: E402
+from utils.fast_json import OrjsonProvider  # noqa: E402
+from flask import Flask  # noqa: E402
+
+TAG_POOL = ['比例:4:3', '方向:横向', '方向:纵向', '红色', '蓝色', '绿色', '色彩鲜艳', '中等亮度', '昏暗', '明亮',
+            '模糊', '清晰', '低对比度', '高对比度', '图片', '照片', '风景', '人物', '建筑', '美食', '旅行', '家庭']
+
+
+def make_payload(rows, seed=0):
+    rng = random.Random(seed)
+    photos = []
+    for index in range(rows):
+        photo_id = 10000 + index
+        placeholder = base64.b64encode(bytes(rng.getrandbits(8) for _ in range(rng.randint(70, 110)))).decode('ascii')
+        photos.append({
+            'id': photo_id,
+            'filename': f'{rng.getrandbits(256):064x}.jpg',
+            'original_filename': f'IMG_{rng.randint(1000, 9999)}.JPG',
+            'width': 4032,
+            'height': 3024,
+            'file_size': rng.randint(1_500_000, 6_000_000),
+            'taken_at': f'2024-0{rng.randint(1, 9)}-{rng.randint(10, 28)}T{rng.randint(10, 23)}:{rng.randint(10, 59)}:00',
+            'location': rng.choice([None, '上海市', '杭州市西湖区']),
+            'tags': rng.sample(TAG_POOL, rng.randint(4, 11)),
+            'edit_version': rng.choice([0, 0, 0, 1, 2]),
+            'thumbnail_url': f'/api/thumbnail/{photo_id}',
+            'placeholder': 'data:image/webp;base64,' + placeholder,
+            'dominant_color': f'#{rng.getrandbits(24):06x}'
+        })
+    return {'photos': photos, 'total': rows, 'page': 1, 'per_page': rows, 'pages': 1}
+
+
+def decompressor(encoding):
+    if encoding == 'zstd':
+        return zstandard.ZstdDecompressor().decompress
+    if encoding == 'br':
+        return brotli.decompress
+    return gzip.decompress
+
+
+def timed(func, data, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(data)
+        times.append(time.perf_counter() - start)
+    return result, statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON响应压缩测试')
+    parser.add_argument('--sizes', default='20,200,1000', help='每页条数，逗号分隔')
+    parser.add_argument('--bandwidth', type=float, default=20.0, help='估算传输时间使用的带宽（Mbit/s）')
+    parser.add_argument('--repeat', type=int, default=20, help='每项重复次数（取中位数）')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.json = OrjsonProvider(app)
+    levels = {'gzip': [1, 5, 9], 'br': [1, 4, 11], 'zstd': [1, 3, 19]}
+    available = [name for name, module in (('gzip', gzip), ('br', brotli), ('zstd', zstandard)) if module]
+    print(f'可用编码: {", ".join(available)}；带宽 {args.bandwidth} Mbit/s（传输时间 = 压缩 + 传输 + 解压）\n')
+
+    bytes_per_ms = args.bandwidth * 1_000_000 / 8 / 1000
+    for rows in [int(value) for value in args.sizes.split(',')]:
+        body = app.json.dumps(make_payload(rows)).encode('utf-8')
+        print(f'每页 {rows} 条，原始 {len(body) / 1024:.1f}KB，不压缩传输 {len(body) / bytes_per_ms:.2f}ms')
+        print(f'  {"编码":<10}{"等级":>4}{"体积":>10}{"压缩率":>8}{"压缩":>10}{"解压":>10}{"合计":>10}')
+        for encoding in available:
+            for level in levels[encoding]:
+                compressor = ResponseCompressor(min_size=0, levels={encoding: level})
+                compressed, compress_ms = timed(lambda data: compressor.compress(encoding, data), body, args.repeat)
+                restored, decompress_ms = timed(decompressor(encoding), compressed, args.repeat)
+                assert restored == body
+                total_ms = compress_ms + len(compressed) / bytes_per_ms + decompress_ms
+                default = '*' if compressor.levels[encoding] == ResponseCompressor().levels[encoding] == level else ' '
+                print(f'  {encoding:<10}{level:>4}{default}{len(compressed) / 1024:>8.1f}KB{len(compressed) / len(body):>8.1%}'
+                      f'{compress_ms:>8.2f}ms{decompress_ms:>8.2f}ms{total_ms:>8.2f}ms')
+        print()
+    print('* 为默认等级')
+
+
+if __name__ == '__main__':
+    main()
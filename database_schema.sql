@@ -31,6 +31,12 @@ CREATE TABLE photos (
     latitude DECIMAL(10, 8),
     longitude DECIMAL(11, 8),
     location_name VARCHAR(200),
+    content_hash CHAR(64),
+    perceptual_hash CHAR(16),
+    placeholder VARCHAR(512),
+    dominant_color CHAR(7),
+    edit_version INT DEFAULT 0,
+    edit_revision INT DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
@@ -55,6 +61,66 @@ CREATE TABLE photo_tags (
     UNIQUE KEY unique_photo_tag (photo_id, tag_id)
 );
 
+-- 图片向量表（语义搜索，float16 向量）
+CREATE TABLE photo_embeddings (
+    photo_id INT PRIMARY KEY,
+    user_id INT NOT NULL,
+    model_name VARCHAR(200) NOT NULL,
+    dim INT NOT NULL,
+    vector BLOB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (photo_id) REFERENCES photos(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- 照片编辑记录表（非破坏性编辑，第N版 = 依次应用第1..N个操作）
+CREATE TABLE photo_edits (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    photo_id INT NOT NULL,
+    version INT NOT NULL,
+    operation TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (photo_id) REFERENCES photos(id) ON DELETE CASCADE,
+    UNIQUE KEY unique_photo_edit_version (photo_id, version)
+);
+
+-- 分块上传会话表
+CREATE TABLE upload_sessions (
+    id VARCHAR(36) PRIMARY KEY,
+    user_id INT NOT NULL,
+    filename VARCHAR(255) NOT NULL,
+    original_filename VARCHAR(255) NOT NULL,
+    file_path VARCHAR(500) NOT NULL,
+    total_size BIGINT NOT NULL,
+    uploaded_size BIGINT NOT NULL DEFAULT 0,
+    tags VARCHAR(500),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- 用户统计表（上传、删除、编辑、标签变化时增量更新）
+CREATE TABLE user_stats (
+    user_id INT PRIMARY KEY,
+    photo_count INT NOT NULL DEFAULT 0,
+    total_size BIGINT NOT NULL DEFAULT 0,
+    edited_count INT NOT NULL DEFAULT 0,
+    tag_counts TEXT,
+    camera_counts TEXT,
+    first_taken_at DATETIME,
+    last_taken_at DATETIME,
+    date_range_stale BOOLEAN NOT NULL DEFAULT FALSE,
+    recent_photo_ids TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- 存储中的原图文件（上传/导入与删除照片之间按文件加行锁；pending 为尚未提交照片记录的上传数）
+CREATE TABLE stored_files (
+    path VARCHAR(255) PRIMARY KEY,
+    pending INT NOT NULL DEFAULT 0
+);
+
 -- 相册表
 CREATE TABLE albums (
     id INT PRIMARY KEY AUTO_INCREMENT,
@@ -84,8 +150,11 @@ CREATE TABLE album_photos (
 CREATE INDEX idx_photos_user_id ON photos(user_id);
 CREATE INDEX idx_photos_taken_at ON photos(taken_at);
 CREATE INDEX idx_photos_location ON photos(latitude, longitude);
+CREATE INDEX idx_photos_user_content_hash ON photos(user_id, content_hash);
 CREATE INDEX idx_photo_tags_photo_id ON photo_tags(photo_id);
 CREATE INDEX idx_photo_tags_tag_id ON photo_tags(tag_id);
+CREATE INDEX idx_photo_embeddings_user_id ON photo_embeddings(user_id);
+CREATE INDEX idx_upload_sessions_user_id ON upload_sessions(user_id);
 CREATE INDEX idx_albums_user_id ON albums(user_id);
 CREATE INDEX idx_album_photos_album_id ON album_photos(album_id);
 CREATE INDEX idx_album_photos_photo_id ON album_photos(photo_id);
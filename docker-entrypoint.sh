@@ -17,10 +17,11 @@ echo "MySQL已就绪，初始化数据库..."
 
 # 执行数据库初始化
 python -c "
-from server import app, db
+from server import app, db, upgrade_schema
 with app.app_context():
     try:
         db.create_all()
+        upgrade_schema()
         print('数据库表创建完成')
     except Exception as e:
         print(f'数据库初始化警告: {e}')
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+批量导入已有照片目录（服务器端命令行工具）
+
+1. 遍历目录，在进程池中计算每个文件的SHA-256，与该用户已有照片及本次导入的其他文件去重
+2. 不重复的文件在进程池中复制到上传目录，生成缩略图、EXIF、感知哈希和标签
+3. 每批结果在一个事务中批量写入 Photo/Tag/PhotoTag，提交成功后记录断点；中断后重新运行会跳过已完成的文件
+
+用法:
+    python import_photos.py /data/photos --user alice
+    python import_photos.py /data/photos --user alice --workers 8 --batch-size 1000 --link
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+
+def insert_batch(results, user_id, tag_ids):
+    """在一个事务中写入一批照片及其标签关联，tag_ids 为 {标签名: ID} 缓存（会补充新建的标签）"""
+    from server import db, bulk_insert_photos, user_data_changed
+
+    bulk_insert_photos(user_id, results, tag_ids=tag_ids)
+    db.session.commit()
+    # 使用 Redis 缓存时，正在运行的后端也会看到新导入的照片
+    user_data_changed(user_id)
+
+
+def remove_files(results):
+    """撤销未能入库的文件的预留，删除没有其他照片引用的文件"""
+    from server import release_photo_files
+
+    for result in results:
+        release_photo_files(result['file_path'], result['thumbnail_path'], reserved=True)
+
+
+def run_import(args):
+    from server import app, db, upgrade_schema, storage, reserve_stored_files, User, Photo, Tag
+    from utils.bulk_import import Checkpoint, hash_file, iter_image_files, process_file
+
+    root = os.path.abspath(args.directory)
+    if not os.path.isdir(root):
+        print(f"❌ 目录不存在: {root}")
+        return 1
+
+    with app.app_context():
+        db.create_all()
+        upgrade_schema()
+
+        user = User.query.filter_by(username=args.user).first()
+        if not user:
+            print(f"❌ 用户不存在: {args.user}")
+            return 1
+
+        checkpoint = Checkpoint(args.checkpoint or f'import_checkpoint_{user.id}.log')
+        known_hashes = {
+            content_hash for (content_hash,) in
+            db.session.query(Photo.content_hash).filter(Photo.user_id == user.id, Photo.content_hash.isnot(None))
+        }
+        tag_ids = {name: tag_id for tag_id, name in db.session.query(Tag.id, Tag.name)}
+
+        pending = [path for path in iter_image_files(root) if path not in checkpoint]
+        print(f"📂 {root}: 待处理 {len(pending)} 个文件（断点记录中已完成 {len(checkpoint)} 个）")
+        if not pending:
+            return 0
+
+        worker = partial(process_file, storage=storage, link=args.link, ai=args.ai)
+        imported = duplicates = failed = 0
+        start = time.perf_counter()
+        # spawn：子进程只导入 utils 模块，不继承数据库连接
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            for batch_start in range(0, len(pending), args.batch_size):
+                batch = pending[batch_start:batch_start + args.batch_size]
+
+                unique, skipped = [], []
+                for item in executor.map(hash_file, batch, chunksize=16):
+                    if 'error' in item:
+                        failed += 1
+                        print(f"  读取失败 {item['source_path']}: {item['error']}")
+                    elif item['content_hash'] in known_hashes:
+                        duplicates += 1
+                        skipped.append(item['source_path'])
+                    else:
+                        known_hashes.add(item['content_hash'])
+                        unique.append(item)
+
+                # 放入存储前预留：同时删除相同内容的照片不会删掉尚未入库的文件
+                if unique:
+                    reserve_stored_files([
+                        storage.original_path(item['content_hash'], item['source_path'].rsplit('.', 1)[-1].lower())
+                        for item in unique
+                    ])
+                results, errors = [], []
+                for result in executor.map(worker, [item['source_path'] for item in unique],
+                                           [item['content_hash'] for item in unique], chunksize=4):
+                    if 'error' in result:
+                        failed += 1
+                        print(f"  处理失败 {result['source_path']}: {result['error']}")
+                        errors.append(result)
+                    else:
+                        results.append(result)
+                remove_files(errors)
+
+                try:
+                    if results:
+                        insert_batch(results, user.id, tag_ids)
+                except Exception as e:
+                    db.session.rollback()
+                    remove_files(results)
+                    print(f"❌ 写入数据库失败，已停止（重新运行会从断点继续）: {e}")
+                    return 1
+                # 重复文件也记入断点，失败的文件下次运行时重试
+                checkpoint.mark(skipped + [result['source_path'] for result in results])
+                imported += len(results)
+
+                elapsed = time.perf_counter() - start
+                processed = batch_start + len(batch)
+                print(f"  {processed}/{len(pending)}  导入 {imported}  重复 {duplicates}  失败 {failed}  "
+                      f"{processed / elapsed:.1f} 文件/秒")
+
+        elapsed = time.perf_counter() - start
+        print(f"✅ 完成: 导入 {imported}，重复 {duplicates}，失败 {failed}，"
+              f"用时 {elapsed:.1f}s（{len(pending) / elapsed:.1f} 文件/秒）")
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量导入已有照片目录')
+    parser.add_argument('directory', help='要导入的照片目录（递归遍历）')
+    parser.add_argument('--user', required=True, help='导入到该用户名下')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='进程数（默认CPU核数）')
+    parser.add_argument('--batch-size', type=int, default=1000, help='每个事务写入的文件数')
+    parser.add_argument('--checkpoint', help='断点记录文件（默认 import_checkpoint_<用户ID>.log）')
+    parser.add_argument('--link', action='store_true', help='使用硬链接代替复制（需在同一文件系统）')
+    parser.add_argument('--ai', action='store_true', help='同时进行AI内容分析生成标签（较慢）')
+    args = parser.parse_args()
+    sys.exit(run_import(args))
+
+
+if __name__ == '__main__':
+    main()
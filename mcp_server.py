@@ -183,6 +183,14 @@ class PhotoManagementMCP:
             "per_page": limit
         }
         
+        # 没有指定标签时，优先使用语义搜索（后端未启用时返回错误，回退到标签搜索）
+        if query and not tags:
+            response = self._make_request("GET", "/api/photos/semantic", params={"q": query, "limit": limit})
+            if "error" not in response and response.get("photos"):
+                logger.info(f"语义搜索返回 {len(response['photos'])} 张照片")
+                return [self._to_photo_info(photo_data) for photo_data in response["photos"]]
+            logger.info("语义搜索不可用或无结果，改用标签搜索")
+        
         # 如果提供了标签，优先使用标签筛选（更精确）
         if tags and len(tags) > 0:
             params["tag"] = tags[0]  # 后端只支持单个标签筛选
@@ -222,21 +230,25 @@ class PhotoManagementMCP:
                 logger.info(f"文件名搜索返回 {len(photo_list)} 张照片")
         
         for photo_data in photo_list:
-            photos.append(PhotoInfo(
-                id=photo_data["id"],
-                filename=photo_data["filename"],
-                original_filename=photo_data["original_filename"],
-                width=photo_data["width"],
-                height=photo_data["height"],
-                file_size=photo_data["file_size"],
-                taken_at=photo_data.get("taken_at"),
-                location=photo_data.get("location"),
-                tags=photo_data.get("tags", []),
-                thumbnail_url=f"{self.api_base_url}/api/thumbnail/{photo_data['id']}"
-            ))
+            photos.append(self._to_photo_info(photo_data))
         
         return photos
     
+    def _to_photo_info(self, photo_data: Dict[str, Any]) -> PhotoInfo:
+        """将API返回的照片数据转换为PhotoInfo"""
+        return PhotoInfo(
+            id=photo_data["id"],
+            filename=photo_data["filename"],
+            original_filename=photo_data["original_filename"],
+            width=photo_data["width"],
+            height=photo_data["height"],
+            file_size=photo_data["file_size"],
+            taken_at=photo_data.get("taken_at"),
+            location=photo_data.get("location"),
+            tags=photo_data.get("tags", []),
+            thumbnail_url=f"{self.api_base_url}/api/thumbnail/{photo_data['id']}"
+        )
+    
     def get_photo_details(self, photo_id: int) -> Optional[PhotoInfo]:
         """获取照片详情"""
         response = self._make_request("GET", f"/api/photo/{photo_id}")
@@ -295,7 +307,7 @@ async def list_tools() -> List[Tool]:
     return [
         Tool(
             name="search_photos",
-            description="搜索照片，支持关键词和标签筛选",
+            description="搜索照片，支持自然语言描述（语义搜索）、关键词和标签筛选",
             inputSchema={
                 "type": "object",
                 "properties": {
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+把已有照片迁移到按内容哈希分片的存储布局
+
+    uploads/<uuid>.<ext>            ->  uploads/ab/cd/<sha256>.<ext>
+    thumbnails/thumb_<uuid>.<ext>   ->  thumbnails/ab/cd/<sha256>.<ext>
+
+按ID分批处理：先把文件放到新位置（本地存储时硬链接，跨文件系统时复制；STORAGE_BACKEND=s3 时上传到存储桶），
+批量更新 file_path/thumbnail_path 并提交，提交成功后再删除旧文件，中途中断不会出现数据库指向不存在文件的情况，
+重新运行会跳过已迁移的照片。内容相同的照片迁移后共用同一个文件
+
+用法:
+    python migrate_storage.py
+    python migrate_storage.py --batch-size 1000 --dry-run
+"""
+import argparse
+import os
+import sys
+import time
+
+
+def run_migration(args):
+    from sqlalchemy import update
+    from server import app, db, upgrade_schema, storage, user_data_changed, Photo
+    from utils.image_hash import sha256_file
+    from utils.thumbnail import generate_thumbnail
+
+    with app.app_context():
+        db.create_all()
+        upgrade_schema()
+
+        migrated = skipped = missing = 0
+        last_id = 0
+        start = time.perf_counter()
+        while True:
+            rows = db.session.query(
+                Photo.id, Photo.user_id, Photo.file_path, Photo.thumbnail_path, Photo.content_hash
+            ).filter(Photo.id > last_id).order_by(Photo.id).limit(args.batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            updates, stale, users = [], [], set()
+            for row in rows:
+                ext = row.file_path.rsplit('.', 1)[-1].lower()
+                # 未迁移的照片：文件在旧布局的本地目录中
+                if not row.content_hash and not os.path.exists(row.file_path):
+                    missing += 1
+                    print(f"  文件不存在，跳过 #{row.id}: {row.file_path}")
+                    continue
+                content_hash = row.content_hash or sha256_file(row.file_path)
+                file_path = storage.original_path(content_hash, ext)
+                thumbnail_path = storage.thumbnail_path(content_hash, ext)
+                if row.file_path == file_path and row.thumbnail_path == thumbnail_path:
+                    skipped += 1
+                    continue
+                migrated_file = row.file_path == file_path
+                if not migrated_file and not os.path.exists(row.file_path):
+                    missing += 1
+                    print(f"  文件不存在，跳过 #{row.id}: {row.file_path}")
+                    continue
+
+                if not args.dry_run:
+                    if not migrated_file:
+                        storage.import_file(row.file_path, file_path, link=True)
+                        stale.append(row.file_path)
+                    if row.thumbnail_path != thumbnail_path:
+                        if row.thumbnail_path and os.path.exists(row.thumbnail_path):
+                            storage.import_file(row.thumbnail_path, thumbnail_path, link=True)
+                            stale.append(row.thumbnail_path)
+                        elif not storage.exists(thumbnail_path):
+                            source_path = storage.local_path(file_path) if migrated_file else row.file_path
+                            with storage.writing(thumbnail_path) as local_thumbnail_path:
+                                generate_thumbnail(source_path, local_thumbnail_path)
+                users.add(row.user_id)
+                updates.append({
+                    'id': row.id,
+                    'filename': os.path.basename(file_path),
+                    'file_path': file_path,
+                    'thumbnail_path': thumbnail_path,
+                    'content_hash': content_hash
+                })
+
+            if updates and not args.dry_run:
+                db.session.execute(update(Photo), updates)
+                db.session.commit()
+                # 运行中的服务按用户代次发现路径变化（配置了 Redis 时跨进程有效），重新加载照片归属和列表缓存
+                for user_id in users:
+                    user_data_changed(user_id)
+                # 旧布局的文件名包含uuid，每个文件只属于一张照片，提交后可以直接删除
+                for path in stale:
+                    if os.path.exists(path):
+                        os.remove(path)
+            migrated += len(updates)
+            print(f"  已处理到 #{last_id}: 迁移 {migrated}  已是新布局 {skipped}  缺失 {missing}")
+
+        elapsed = time.perf_counter() - start
+        action = '需要迁移' if args.dry_run else '迁移'
+        print(f"✅ 完成: {action} {migrated}，已是新布局 {skipped}，文件缺失 {missing}，用时 {elapsed:.1f}s")
+        return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='把已有照片迁移到按内容哈希分片的存储布局')
+    parser.add_argument('--batch-size', type=int, default=1000, help='每个事务更新的照片数')
+    parser.add_argument('--dry-run', action='store_true', help='只统计需要迁移的照片，不移动文件')
+    args = parser.parse_args()
+    sys.exit(run_migration(args))
+
+
+if __name__ == '__main__':
+    main()
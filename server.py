@@ -1,25 +1,54 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, redirect, make_response, Response, stream_with_context, g
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
+from werkzeug.wsgi import get_input_stream
 import os
 import uuid
 import json
+import threading
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import hashlib
+import shutil
+import io
+import mimetypes
+from collections import OrderedDict
+from functools import wraps
 from datetime import datetime, timedelta
 from PIL import Image, ImageEnhance, ImageFilter
-import exifread
 import magic
 import cv2
 import numpy as np
 import requests
-from sqlalchemy import or_, and_
+from sqlalchemy import UniqueConstraint, or_, and_, case, func, inspect as sa_inspect, text
+from sqlalchemy.exc import IntegrityError
 from dotenv import load_dotenv
 from urllib.parse import quote_plus
 import os
 from pathlib import Path
 from utils.ai_analyzer import analyze_image_with_ai
+from utils.embeddings import semantic_search_enabled, get_encoder, to_blob, from_blob
+from utils.vector_index import VectorIndex
+from utils.image_edit import (estimate_edit_memory, MemoryPool, normalize_operation, apply_operation,
+                              operation_size, to_rgb)
+from utils.jpeg_lossless import lossless_render
+from utils.edit_render import render_file
+from utils.exif_reader import extract_exif, extract_exif_many
+from utils.thumbnail import generate_thumbnail, generate_placeholder
+from utils.bulk_import import prepare_file
+from utils.multipart_stream import iter_multipart
+from utils.storage import create_storage, remove_local
+from utils.thumbnail_bundle import bundle_version, pack_bundle
+from utils.response_cache import create_response_cache, normalize_params
+from utils.db_routing import REPLICA_BIND, RoutingSession, engine_options, use_replica_for_request
+from utils.fast_json import OrjsonProvider
+from utils.compression import create_response_compressor
+from utils.photo_access import PhotoAccessCache
+from utils.image_hash import phash_file, hash_to_hex, hex_to_hash, cluster_near_duplicates
 
 # 显式加载项目根目录下的 .env（确保在读取 env 之前执行）
 env_path = Path(__file__).resolve().parent / ".env"
@@ -34,28 +63,118 @@ DB_NAME = os.getenv("DB_NAME", "photo_management")
 BACKEND_PORT = int(os.getenv("BACKEND_PORT", "5000"))
 # 对密码进行 URL 编码以避免特殊字符问题
 DB_PASSWORD_Q = quote_plus(DB_PASSWORD)
+# 只读副本（可选）：未单独配置的用户名、密码、端口、库名沿用主库
+DB_REPLICA_HOST = os.getenv("DB_REPLICA_HOST", "")
+DB_REPLICA_PORT = os.getenv("DB_REPLICA_PORT", DB_PORT)
+DB_REPLICA_USER = os.getenv("DB_REPLICA_USER", DB_USER)
+DB_REPLICA_PASSWORD_Q = quote_plus(os.getenv("DB_REPLICA_PASSWORD", DB_PASSWORD))
 
 
 app = Flask(__name__)
+# jsonify 使用 orjson 序列化（未安装时退回标准库）
+app.json = OrjsonProvider(app)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
-app.config['SQLALCHEMY_DATABASE_URI'] = (
+# DATABASE_URL / DATABASE_REPLICA_URL 可直接指定完整连接地址（例如本地测试用两个 SQLite 文件）
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL') or (
     f"mysql+pymysql://{DB_USER}:{DB_PASSWORD_Q}@{DB_HOST}:{DB_PORT}/{DB_NAME}?charset=utf8mb4"
 )
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL') or (
+    f"mysql+pymysql://{DB_REPLICA_USER}:{DB_REPLICA_PASSWORD_Q}@{DB_REPLICA_HOST}:{DB_REPLICA_PORT}/{DB_NAME}"
+    f"?charset=utf8mb4" if DB_REPLICA_HOST else ''
+)
+if DATABASE_REPLICA_URL:
+    app.config['SQLALCHEMY_BINDS'] = {
+        REPLICA_BIND: {'url': DATABASE_REPLICA_URL, **engine_options(DATABASE_REPLICA_URL)}
+    }
+# 用户有写入后的这段时间内继续读主库，避免读到复制延迟前的旧数据
+app.config['DB_REPLICA_STICKY_SECONDS'] = float(os.getenv('DB_REPLICA_STICKY_SECONDS', '5'))
 app.config['JWT_SECRET_KEY'] = 'jwt-secret-string'
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
 app.config['JWT_TOKEN_LOCATION'] = ['headers', 'query_string']
 app.config['JWT_QUERY_STRING_NAME'] = 'token'
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['THUMBNAIL_FOLDER'] = 'thumbnails'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['RENDER_FOLDER'] = 'renders'  # 编辑后照片的渲染缓存（每张照片一个子目录）
+# 每张照片保留渲染缓存的编辑版本数（当前版本加最近渲染过的版本），更早的版本在下次渲染时删除
+app.config['RENDER_VERSIONS_KEPT'] = int(os.getenv('RENDER_VERSIONS_KEPT', '3'))
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', str(16 * 1024 * 1024)))  # 单个请求体上限
+# 分块上传：整个文件的大小上限（与单个请求体上限无关）、建议的分块大小、未完成会话的保留时间
+app.config['MAX_UPLOAD_SIZE'] = int(os.getenv('MAX_UPLOAD_SIZE_MB', '2048')) * 1024 * 1024
+app.config['UPLOAD_CHUNK_SIZE'] = int(os.getenv('UPLOAD_CHUNK_SIZE_MB', '8')) * 1024 * 1024
+app.config['UPLOAD_SESSION_TTL'] = timedelta(hours=int(os.getenv('UPLOAD_SESSION_TTL_HOURS', '24')))
+# 多文件上传：整个请求体上限、处理线程数（缩略图/EXIF/AI分析）、每个事务写入的照片数
+app.config['MAX_BATCH_UPLOAD_SIZE'] = int(os.getenv('MAX_BATCH_UPLOAD_SIZE_MB', '4096')) * 1024 * 1024
+app.config['UPLOAD_WORKERS'] = int(os.getenv('UPLOAD_WORKERS', '0')) or os.cpu_count() or 1
+app.config['UPLOAD_COMMIT_SIZE'] = int(os.getenv('UPLOAD_COMMIT_SIZE', '100'))
+# 图片编辑内存限制：单次编辑的预估内存上限，以及所有并发编辑共享的内存池
+app.config['EDIT_MEMORY_BUDGET'] = int(os.getenv('EDIT_MEMORY_BUDGET_MB', '1024')) * 1024 * 1024
+app.config['EDIT_MEMORY_POOL'] = int(os.getenv('EDIT_MEMORY_POOL_MB', '2048')) * 1024 * 1024
+# 编辑预览：在长边约1200px的代理图上渲染，代理图解码结果缓存在内存中
+app.config['PREVIEW_SIZE'] = int(os.getenv('EDIT_PREVIEW_SIZE', '1200'))
+app.config['PREVIEW_QUALITY'] = int(os.getenv('EDIT_PREVIEW_QUALITY', '80'))
+app.config['PREVIEW_CACHE_SIZE'] = int(os.getenv('EDIT_PREVIEW_CACHE_SIZE', '16'))
+# 批量编辑：渲染进程数（默认CPU核数）与单次请求的照片数上限
+app.config['EDIT_WORKERS'] = int(os.getenv('EDIT_WORKERS', '0')) or os.cpu_count() or 1
+app.config['BATCH_EDIT_MAX_PHOTOS'] = int(os.getenv('BATCH_EDIT_MAX_PHOTOS', '500'))
+# 文件存储：local（本地磁盘）或 s3（S3兼容对象存储，多个后端节点可共用）
+app.config['STORAGE_BACKEND'] = os.getenv('STORAGE_BACKEND', 'local')
+app.config['STORAGE_CACHE_FOLDER'] = os.getenv('STORAGE_CACHE_FOLDER', 'storage_cache')
+# 对象存储本地缓存的总大小上限（超过后淘汰最久未使用的文件），0 表示不限制
+app.config['STORAGE_CACHE_MAX_SIZE'] = int(os.getenv('STORAGE_CACHE_MAX_MB', '2048')) * 1024 * 1024
+app.config['S3_BUCKET'] = os.getenv('S3_BUCKET', '')
+app.config['S3_ENDPOINT_URL'] = os.getenv('S3_ENDPOINT_URL', '')
+app.config['S3_REGION'] = os.getenv('S3_REGION', '')
+app.config['S3_ACCESS_KEY'] = os.getenv('S3_ACCESS_KEY', '')
+app.config['S3_SECRET_KEY'] = os.getenv('S3_SECRET_KEY', '')
+app.config['S3_MULTIPART_THRESHOLD'] = int(os.getenv('S3_MULTIPART_THRESHOLD_MB', '8')) * 1024 * 1024
+# 对象存储时图片请求重定向到预签名URL（客户端直接从存储下载），关闭后由后端流式转发
+app.config['STORAGE_REDIRECT'] = os.getenv('STORAGE_REDIRECT', 'true').lower() == 'true'
+app.config['PRESIGNED_URL_EXPIRES'] = int(os.getenv('PRESIGNED_URL_EXPIRES', '3600'))
+# 缩略图打包（/api/thumbnails/bundle）：单次请求的照片数上限、内存中缓存的打包结果总大小
+app.config['THUMBNAIL_BUNDLE_MAX'] = int(os.getenv('THUMBNAIL_BUNDLE_MAX', '200'))
+app.config['THUMBNAIL_BUNDLE_CACHE_SIZE'] = int(os.getenv('THUMBNAIL_BUNDLE_CACHE_MB', '64')) * 1024 * 1024
+# 读接口（照片列表、标签、用户信息）的按用户响应缓存：默认进程内LRU，配置Redis地址后多进程共用
+app.config['RESPONSE_CACHE_ENABLED'] = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+app.config['RESPONSE_CACHE_SIZE'] = int(os.getenv('RESPONSE_CACHE_SIZE_MB', '64')) * 1024 * 1024
+app.config['RESPONSE_CACHE_TTL'] = int(os.getenv('RESPONSE_CACHE_TTL', '300'))
+app.config['RESPONSE_CACHE_REDIS_URL'] = os.getenv('RESPONSE_CACHE_REDIS_URL', '')
+# /api 的JSON响应按 Accept-Encoding 压缩（zstd/Brotli/gzip）：最小压缩大小（字节）与各算法等级
+app.config['RESPONSE_COMPRESSION_ENABLED'] = os.getenv('RESPONSE_COMPRESSION_ENABLED', 'true').lower() == 'true'
+app.config['RESPONSE_COMPRESSION_MIN_SIZE'] = int(os.getenv('RESPONSE_COMPRESSION_MIN_SIZE', '1024'))
+app.config['RESPONSE_COMPRESSION_GZIP_LEVEL'] = int(os.getenv('RESPONSE_COMPRESSION_GZIP_LEVEL', '5'))
+app.config['RESPONSE_COMPRESSION_BROTLI_QUALITY'] = int(os.getenv('RESPONSE_COMPRESSION_BROTLI_QUALITY', '4'))
+app.config['RESPONSE_COMPRESSION_ZSTD_LEVEL'] = int(os.getenv('RESPONSE_COMPRESSION_ZSTD_LEVEL', '3'))
+# 图片接口的照片归属缓存：缓存的照片数上限、过期时间（秒，兜底其他进程对照片的修改）
+app.config['PHOTO_ACCESS_CACHE_ENABLED'] = os.getenv('PHOTO_ACCESS_CACHE_ENABLED', 'true').lower() == 'true'
+app.config['PHOTO_ACCESS_CACHE_SIZE'] = int(os.getenv('PHOTO_ACCESS_CACHE_SIZE', '100000'))
+app.config['PHOTO_ACCESS_CACHE_TTL'] = int(os.getenv('PHOTO_ACCESS_CACHE_TTL', '300'))
 
 # 确保上传目录存在
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['THUMBNAIL_FOLDER'], exist_ok=True)
+os.makedirs(app.config['RENDER_FOLDER'], exist_ok=True)
+
+# 原图和缩略图按内容哈希分片存放（uploads/ab/cd/<sha256>.<ext>），相同内容只保存一份
+storage = create_storage(app.config)
+
+# 按用户的响应缓存，照片/标签/编辑版本变化时通过 user_data_changed(user_id) 失效
+response_cache = create_response_cache(app.config)
+
+# JSON 响应压缩（在 compress_response 中统一处理）
+response_compressor = create_response_compressor(app.config)
+
+# 图片接口的照片归属缓存（照片ID -> 所有者、文件路径、编辑版本），编辑、删除后通过 invalidate 失效；
+# 其他进程的修改通过响应缓存的用户代次发现，只有配置 RESPONSE_CACHE_REDIS_URL 时跨进程有效，否则只适合单进程部署
+photo_access = PhotoAccessCache(
+    max_entries=app.config['PHOTO_ACCESS_CACHE_SIZE'],
+    ttl=app.config['PHOTO_ACCESS_CACHE_TTL'],
+    enabled=app.config['PHOTO_ACCESS_CACHE_ENABLED']
+)
 
 # 初始化扩展
-db = SQLAlchemy(app)
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
 jwt = JWTManager(app)
 CORS(app)
 
@@ -87,6 +206,13 @@ class Photo(db.Model):
     latitude = db.Column(db.Float)
     longitude = db.Column(db.Float)
     location_name = db.Column(db.String(200))
+    content_hash = db.Column(db.String(64), index=True)  # 文件内容SHA-256
+    perceptual_hash = db.Column(db.String(16))  # 64位pHash（十六进制）
+    placeholder = db.Column(db.String(512))  # 低清占位图（16px WebP 的 data URI）
+    dominant_color = db.Column(db.String(7))  # 主色调 #rrggbb
+    edit_version = db.Column(db.Integer, default=0)  # 当前编辑版本，0表示原图
+    # 每次编辑/撤销/重做/恢复原图都加一；撤销后再编辑会复用版本号，缓存键用它区分内容
+    edit_revision = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -108,6 +234,61 @@ class PhotoTag(db.Model):
     tag_id = db.Column(db.Integer, db.ForeignKey('tags.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class PhotoEmbedding(db.Model):
+    __tablename__ = 'photo_embeddings'
+    photo_id = db.Column(db.Integer, db.ForeignKey('photos.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    model_name = db.Column(db.String(200), nullable=False)
+    dim = db.Column(db.Integer, nullable=False)
+    vector = db.Column(db.LargeBinary, nullable=False)  # float16 向量
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class PhotoEdit(db.Model):
+    __tablename__ = 'photo_edits'
+    __table_args__ = (db.UniqueConstraint('photo_id', 'version', name='unique_photo_edit_version'),)
+    id = db.Column(db.Integer, primary_key=True)
+    photo_id = db.Column(db.Integer, db.ForeignKey('photos.id', ondelete='CASCADE'), nullable=False, index=True)
+    version = db.Column(db.Integer, nullable=False)  # 从1开始，第N版 = 依次应用第1..N个操作
+    operation = db.Column(db.Text, nullable=False)  # JSON格式的编辑操作
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class UploadSession(db.Model):
+    __tablename__ = 'upload_sessions'
+    id = db.Column(db.String(36), primary_key=True)  # uuid，即上传ID
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    original_filename = db.Column(db.String(255), nullable=False)
+    file_path = db.Column(db.String(500), nullable=False)  # 分块写入的临时文件，完成后移动到内容地址
+    total_size = db.Column(db.BigInteger, nullable=False)
+    uploaded_size = db.Column(db.BigInteger, nullable=False, default=0)  # 已写入的字节数（即下一个分块的偏移量）
+    tags = db.Column(db.String(500))  # 完成时添加的自定义标签（逗号分隔）
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class StoredFile(db.Model):
+    """存储中的原图文件（相同内容的照片共用）：上传/导入与删除照片之间按文件加行锁
+
+    pending 为已经放入存储、尚未提交照片记录的上传/导入数，大于0时删除照片不会删除文件
+    """
+    __tablename__ = 'stored_files'
+    path = db.Column(db.String(255), primary_key=True)
+    pending = db.Column(db.Integer, nullable=False, default=0)
+
+class UserStats(db.Model):
+    """每个用户一行的统计数据，在上传、删除、编辑、标签变化的事务中增量更新"""
+    __tablename__ = 'user_stats'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    photo_count = db.Column(db.Integer, nullable=False, default=0)
+    total_size = db.Column(db.BigInteger, nullable=False, default=0)
+    edited_count = db.Column(db.Integer, nullable=False, default=0)  # 当前为编辑版本的照片数
+    tag_counts = db.Column(db.Text)  # JSON {标签ID: 照片数}
+    camera_counts = db.Column(db.Text)  # JSON {相机: 照片数}
+    first_taken_at = db.Column(db.DateTime)
+    last_taken_at = db.Column(db.DateTime)
+    date_range_stale = db.Column(db.Boolean, nullable=False, default=False)  # 删除了边界上的照片，同一事务中持锁重新计算后清除
+    recent_photo_ids = db.Column(db.Text)  # JSON，最近上传的照片ID（新的在前）
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class Album(db.Model):
     __tablename__ = 'albums'
     id = db.Column(db.Integer, primary_key=True)
@@ -126,372 +307,747 @@ class AlbumPhoto(db.Model):
     sort_order = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+def upgrade_schema():
+    """为已存在的表补充模型中新增的列和唯一约束（db.create_all 不会修改已有表）"""
+    inspector = sa_inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            db.session.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            print(f"数据库升级: {table.name} 新增列 {column.name}")
+            if column.index:
+                db.session.execute(text(
+                    f'CREATE INDEX ix_{table.name}_{column.name} ON {table.name} ({column.name})'
+                ))
+    db.session.commit()
+
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing_keys = ({constraint['name'] for constraint in inspector.get_unique_constraints(table.name)}
+                         | {index['name'] for index in inspector.get_indexes(table.name)})
+        for constraint in table.constraints:
+            if not isinstance(constraint, UniqueConstraint) or not constraint.name or constraint.name in existing_keys:
+                continue
+            columns = ', '.join(column.name for column in constraint.columns)
+            try:
+                db.session.execute(text(f'CREATE UNIQUE INDEX {constraint.name} ON {table.name} ({columns})'))
+                db.session.commit()
+                print(f"数据库升级: {table.name} 新增唯一约束 {constraint.name}")
+            except Exception as e:
+                # 已有重复数据时无法创建，清理重复数据后重启即可自动补上
+                db.session.rollback()
+                print(f"数据库升级: {table.name} 无法创建唯一约束 {constraint.name}: {e}")
+
+    backfill_user_stats()
+
+def backfill_user_stats():
+    """为升级前注册、还没有统计行的用户汇总生成统计行（新用户注册时即创建），每个用户单独提交"""
+    missing = [user_id for (user_id,) in db.session.query(User.id).outerjoin(
+        UserStats, UserStats.user_id == User.id
+    ).filter(UserStats.user_id.is_(None))]
+    for user_id in missing:
+        try:
+            db.session.add(build_user_stats(user_id))
+            db.session.commit()
+        except IntegrityError:
+            # 其他进程同时启动并已生成
+            db.session.rollback()
+    if missing:
+        print(f"数据库升级: 为 {len(missing)} 个用户生成统计行")
+
+edit_memory_pool = MemoryPool(app.config['EDIT_MEMORY_POOL'])
+
+# 批量编辑渲染进程池（首次使用时创建）
+_edit_executor = None
+_edit_executor_lock = threading.Lock()
+
+def get_edit_executor():
+    """获取渲染进程池；使用spawn启动，避免在多线程的Flask进程中fork"""
+    global _edit_executor
+    with _edit_executor_lock:
+        if _edit_executor is None:
+            _edit_executor = ProcessPoolExecutor(
+                max_workers=app.config['EDIT_WORKERS'],
+                mp_context=multiprocessing.get_context('spawn')
+            )
+    return _edit_executor
+
+# 多文件上传处理线程池：解码、缩放、哈希计算会释放GIL，AI分析主要是网络等待
+_upload_executor = None
+_upload_executor_lock = threading.Lock()
+
+def get_upload_executor():
+    global _upload_executor
+    with _upload_executor_lock:
+        if _upload_executor is None:
+            _upload_executor = ThreadPoolExecutor(max_workers=app.config['UPLOAD_WORKERS'],
+                                                  thread_name_prefix='upload')
+    return _upload_executor
+
 # 工具函数
 def allowed_file(filename):
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff', 'webp'}
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def generate_thumbnail(image_path, thumbnail_path, size=(300, 300)):
-    """生成缩略图"""
+def save_upload_stream(stream, file_path, chunk_size=1024 * 1024):
+    """分块写入上传文件，同时计算SHA-256，返回 (文件大小, 十六进制摘要)"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(file_path, 'wb') as f:
+        for chunk in iter(lambda: stream.read(chunk_size), b''):
+            digest.update(chunk)
+            f.write(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
+
+def ensure_stored_files(paths):
+    """为原图存储键创建 stored_files 行（已存在时跳过）并提交
+
+    不存在时不能直接 SELECT ... FOR UPDATE：MySQL 对不存在的行加间隙锁，两个请求随后同时插入会死锁
+    """
+    for path in sorted(set(paths)):
+        if db.session.query(StoredFile.path).filter_by(path=path).first() is None:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(StoredFile(path=path, pending=0))
+            except IntegrityError:
+                pass
+    db.session.commit()
+
+def lock_stored_files(paths):
+    """对原图存储键加行锁（行由 ensure_stored_files 创建），返回 {存储键: StoredFile}
+
+    加锁是事务中的第一个读取时，之后的普通查询能看到持锁者提交的照片记录
+    """
+    paths = sorted(set(paths))
+    if not paths:
+        return {}
+    return {
+        stored.path: stored for stored in
+        StoredFile.query.filter(StoredFile.path.in_(paths)).with_for_update().populate_existing().all()
+    }
+
+def reserve_stored_files(paths):
+    """上传/导入把文件放到内容地址之前调用（单独提交）：写入照片记录之前，删除相同内容的照片不会删除文件"""
+    ensure_stored_files(paths)
+    for stored in lock_stored_files(paths).values():
+        stored.pending += 1
+    db.session.commit()
+
+def settle_stored_files(paths):
+    """在写入照片记录的事务中调用，随照片记录一起提交：预留转为照片记录的引用"""
+    for stored in lock_stored_files(paths).values():
+        stored.pending = max(stored.pending - 1, 0)
+
+def release_photo_files(file_path, thumbnail_path, reserved=False):
+    """删除不再被任何照片引用的原图和缩略图（相同内容的文件由多个照片共享），单独提交
+
+    在删除照片的事务提交之后（或入库失败回滚之后）调用。按原图加行锁，与上传/导入的预留互斥：
+    没有照片引用（按路径统计）且没有进行中的上传时才删除。reserved 为 True 时同时撤销本次的预留
+    """
+    if not file_path:
+        return
+    ensure_stored_files([file_path])
     try:
-        with Image.open(image_path) as img:
-            # 确保图片是RGB模式
-            if img.mode in ('RGBA', 'LA', 'P'):
-                # 如果有透明通道，转换为RGB（白色背景）
-                if img.mode == 'RGBA':
-                    background = Image.new('RGB', img.size, (255, 255, 255))
-                    background.paste(img, mask=img.split()[3])  # 使用alpha通道作为mask
-                    img = background
-                else:
-                    img = img.convert('RGB')
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # 生成缩略图
-            img.thumbnail(size, Image.Resampling.LANCZOS)
-            
-            # 根据缩略图文件扩展名确定保存格式
-            thumb_ext = os.path.splitext(thumbnail_path)[1].lower()
-            save_kwargs = {'optimize': True}
-            if thumb_ext in ['.jpg', '.jpeg']:
-                save_kwargs['quality'] = 85
-            
-            img.save(thumbnail_path, **save_kwargs)
-        return True
-    except Exception as e:
-        print(f"生成缩略图失败: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+        stored = lock_stored_files([file_path])[file_path]
+        if reserved:
+            stored.pending = max(stored.pending - 1, 0)
+        if stored.pending <= 0 and db.session.query(Photo.id).filter(Photo.file_path == file_path).first() is None:
+            storage.delete(file_path)
+            if thumbnail_path and db.session.query(Photo.id).filter(
+                Photo.thumbnail_path == thumbnail_path
+            ).first() is None:
+                storage.delete(thumbnail_path)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+def send_stored_file(key):
+    """返回存储中的文件，文件不存在时返回None
 
-def convert_to_degrees(value):
-    """将GPS坐标从度/分/秒格式转换为小数格式"""
+    本地存储直接发送；对象存储默认重定向到预签名URL（客户端直接从存储下载，不占用后端带宽），
+    关闭 STORAGE_REDIRECT 时由后端流式转发
+    """
+    if storage.name == 'local':
+        return send_file(key) if storage.exists(key) else None
+    if app.config['STORAGE_REDIRECT']:
+        url = storage.presigned_url(key, app.config['PRESIGNED_URL_EXPIRES'])
+        if url:
+            return redirect(url)
     try:
-        d = float(value.values[0].num) / float(value.values[0].den)
-        m = float(value.values[1].num) / float(value.values[1].den)
-        s = float(value.values[2].num) / float(value.values[2].den)
-        return d + (m / 60.0) + (s / 3600.0)
-    except:
+        body, length = storage.open(key)
+    except Exception as e:
+        print(f"读取存储文件失败 {key}: {e}")
+        return None
+
+    def generate():
         try:
-            # 如果已经是小数格式
-            return float(value)
-        except:
-            return None
+            for chunk in iter(lambda: body.read(1024 * 1024), b''):
+                yield chunk
+        finally:
+            body.close()
 
-def extract_exif_data(image_path):
-    """提取EXIF数据，支持多种格式和字段"""
-    exif_data = {}
-    
-    # 方法1: 使用exifread库
+    response = Response(stream_with_context(generate()),
+                        mimetype=mimetypes.guess_type(key)[0] or 'application/octet-stream')
+    if length is not None:
+        response.headers['Content-Length'] = str(length)
+    return response
+
+def user_data_changed(user_id):
+    """用户的照片、标签、编辑版本的修改已提交：使响应缓存失效，并在 DB_REPLICA_STICKY_SECONDS 内读主库
+
+    写入标记与缓存代次保存在同一后端（配置 Redis 时各进程共用），一次操作同时更新
+    """
+    sticky = app.config['DB_REPLICA_STICKY_SECONDS'] if REPLICA_BIND in app.config.get('SQLALCHEMY_BINDS', {}) else 0
+    response_cache.invalidate(int(user_id), sticky)
+
+def current_user_state(user_id):
+    """本次请求的 (用户代次, 最近是否有写入)，每个请求只从后端读取一次
+
+    缓存键、照片归属缓存与主库/副本的选择都基于同一次读取的结果
+    """
+    state = g.get('user_state')
+    if state is None or state[0] != user_id:
+        state = g.user_state = (user_id, *response_cache.user_state(user_id))
+    return state[1], state[2]
+
+@app.after_request
+def compress_response(response):
+    """按 Accept-Encoding 压缩 /api 下的JSON响应；图片、缩略图打包等已压缩的内容原样返回
+
+    响应缓存中保存的是压缩前的内容，不同客户端可以协商各自的编码
+    """
+    if not request.path.startswith('/api/') or not response_compressor.should_compress(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = response_compressor.choose(request.accept_encodings)
+    if encoding is None:
+        return response
+    response.set_data(response_compressor.compress(encoding, response.get_data()))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def read_replica(view):
+    """只读接口：读操作发往只读副本（未配置副本、或用户刚有写入时仍读主库）
+
+    DB_REPLICA_STICKY_SECONDS 需要大于副本的最大复制延迟，否则标记过期后仍可能读到旧数据
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if REPLICA_BIND in app.config.get('SQLALCHEMY_BINDS', {}):
+            _, written = current_user_state(int(get_jwt_identity()))
+            if not written:
+                use_replica_for_request()
+        return view(*args, **kwargs)
+    return wrapper
+
+def cached_json(endpoint):
+    """按用户缓存GET接口的JSON响应（放在 jwt_required 之后），响应头 X-Cache 标明是否命中"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not response_cache.enabled:
+                return view(*args, **kwargs)
+            user_id = int(get_jwt_identity())
+            # 先读取代次再计算响应：计算期间发生的修改会使本次结果所在的代次失效；
+            # 代次与 read_replica 判断写入标记用的是同一次读取，读到新代次时一定已改读主库
+            generation, _ = current_user_state(user_id)
+            key = response_cache.key(endpoint, user_id, generation, normalize_params(request.args.items(multi=True)))
+            if key is None:
+                return view(*args, **kwargs)
+            body = response_cache.get(endpoint, key)
+            if body is not None:
+                response = Response(body, mimetype='application/json')
+                response.headers['X-Cache'] = 'HIT'
+                return response
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and response.mimetype == 'application/json':
+                response_cache.set(key, response.get_data())
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+def get_edit_operations(photo, version=None):
+    """返回照片在指定编辑版本（默认当前版本）下需要依次应用的操作列表"""
+    if version is None:
+        version = photo.edit_version or 0
+    if version <= 0:
+        return []
+    edits = (PhotoEdit.query.filter(PhotoEdit.photo_id == photo.id, PhotoEdit.version <= version)
+             .order_by(PhotoEdit.version).all())
+    return [json.loads(edit.operation) for edit in edits]
+
+def edit_size_chain(original_size, operations):
+    """依次计算每个操作后的图片尺寸（只读文件头，不解码），返回包含原图尺寸在内的列表"""
+    sizes = [tuple(original_size)]
+    for operation in operations:
+        sizes.append(operation_size(sizes[-1], operation))
+    return sizes
+
+def render_dir(photo):
+    """照片的渲染缓存目录：renders/{照片ID}/"""
+    return os.path.join(app.config['RENDER_FOLDER'], str(photo.id))
+
+def render_path(photo, version, revision, max_size=None):
+    """渲染缓存路径：renders/{照片ID}/v{版本}_r{修订号}_{full|宽x高}.{jpg|png}（目录在写入前创建）
+
+    撤销后再编辑会复用版本号，文件名带上修订号，各节点缓存的旧渲染不会被误用
+    """
+    ext = '.png' if os.path.splitext(photo.file_path)[1].lower() == '.png' else '.jpg'
+    label = 'full' if max_size is None else f'{max_size[0]}x{max_size[1]}'
+    return os.path.join(render_dir(photo), f'v{version}_r{revision or 0}_{label}{ext}')
+
+def list_renders(photo):
+    """照片的渲染缓存文件：[(版本, 文件路径)]，跳过写入中的临时文件"""
+    directory = render_dir(photo)
     try:
-        with open(image_path, 'rb') as f:
-            tags = exifread.process_file(f, details=False)
-        
-        # 调试：打印所有可用的EXIF标签（仅前20个，避免输出过多）
-        available_tags = list(tags.keys())[:20]
-        print(f"可用EXIF标签（前20个）: {available_tags}")
-        
-        # 提取拍摄时间（尝试多个字段）
-        taken_at = None
-        date_fields = [
-            'EXIF DateTimeOriginal',
-            'EXIF DateTimeDigitized', 
-            'Image DateTime',
-            'EXIF DateTime',
-            'EXIF SubSecTimeOriginal',  # 子秒时间
-            'EXIF SubSecTimeDigitized'
-        ]
-        for field in date_fields:
-            if field in tags:
-                try:
-                    date_str = str(tags[field])
-                    print(f"找到日期字段 {field}: {date_str}")
-                    # 处理不同的日期格式
-                    for fmt in ['%Y:%m:%d %H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y/%m/%d %H:%M:%S', '%Y-%m-%d %H:%M:%S.%f']:
-                        try:
-                            taken_at = datetime.strptime(date_str, fmt)
-                            print(f"成功解析日期: {taken_at}")
-                            break
-                        except ValueError:
-                            continue
-                    if taken_at:
-                        break
-                except Exception as e:
-                    print(f"解析日期字段 {field} 失败: {e}")
-                    continue
-        
-        if taken_at:
-            exif_data['taken_at'] = taken_at
-            print(f"设置拍摄时间: {taken_at}")
-        
-        # 提取更多EXIF拍摄参数
-        # ISO感光度
-        if 'EXIF ISOSpeedRatings' in tags:
-            try:
-                exif_data['iso'] = int(str(tags['EXIF ISOSpeedRatings']))
-            except:
-                pass
-        elif 'EXIF ISO' in tags:
-            try:
-                exif_data['iso'] = int(str(tags['EXIF ISO']))
-            except:
-                pass
-        
-        # 光圈值
-        if 'EXIF FNumber' in tags:
-            fnumber = tags['EXIF FNumber']
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    renders = []
+    for name in names:
+        version = name[1:].split('_', 1)[0]
+        if name.startswith('v') and version.isdigit() and '.tmp' not in name:
+            renders.append((int(version), os.path.join(directory, name)))
+    return renders
+
+def remove_renders(photo, min_version=0):
+    """删除照片版本号不小于min_version的渲染缓存；min_version为0时删除整个目录"""
+    if min_version <= 0:
+        shutil.rmtree(render_dir(photo), ignore_errors=True)
+        return
+    for version, path in list_renders(photo):
+        if version >= min_version:
             try:
-                if hasattr(fnumber, 'values'):
-                    exif_data['f_number'] = float(fnumber.values[0].num) / float(fnumber.values[0].den)
-                else:
-                    exif_data['f_number'] = float(str(fnumber))
-            except:
+                os.remove(path)
+            except OSError:
                 pass
-        
-        # 快门速度
-        if 'EXIF ExposureTime' in tags:
-            exposure = tags['EXIF ExposureTime']
+
+def prune_renders(photo, current_version, current_revision):
+    """只保留当前版本和最近渲染过的 RENDER_VERSIONS_KEPT - 1 个其他版本的渲染缓存（按版本和修订号区分）"""
+    current = f'v{current_version}_r{current_revision or 0}_'
+    latest, files = {}, []
+    for _, path in list_renders(photo):
+        try:
+            modified = os.path.getmtime(path)
+        except OSError:
+            continue
+        name = os.path.basename(path)
+        key = name[:name.index('_', name.index('_') + 1) + 1]
+        latest[key] = max(latest.get(key, 0), modified)
+        files.append((key, path))
+    others = sorted((key for key in latest if key != current), key=latest.get, reverse=True)
+    evicted = set(others[max(app.config['RENDER_VERSIONS_KEPT'] - 1, 0):])
+    for key, path in files:
+        if key in evicted:
             try:
-                if hasattr(exposure, 'values'):
-                    exif_data['exposure_time'] = float(exposure.values[0].num) / float(exposure.values[0].den)
-                else:
-                    exif_data['exposure_time'] = float(str(exposure))
-            except:
+                os.remove(path)
+            except OSError:
                 pass
-        
-        # 焦距
-        if 'EXIF FocalLength' in tags:
-            focal = tags['EXIF FocalLength']
+
+def remove_legacy_renders():
+    """删除旧布局（renders/{照片ID}_v{版本}_*.jpg，直接放在 renders/ 下）的渲染缓存，之后按需重新渲染"""
+    removed = 0
+    for entry in os.scandir(app.config['RENDER_FOLDER']):
+        if entry.is_file():
             try:
-                if hasattr(focal, 'values'):
-                    exif_data['focal_length'] = float(focal.values[0].num) / float(focal.values[0].den)
-                else:
-                    exif_data['focal_length'] = float(str(focal))
-            except:
+                os.remove(entry.path)
+                removed += 1
+            except OSError:
                 pass
-        
-        # 白平衡
-        if 'EXIF WhiteBalance' in tags:
-            exif_data['white_balance'] = str(tags['EXIF WhiteBalance']).strip()
-        
-        # 闪光灯
-        if 'EXIF Flash' in tags:
-            exif_data['flash'] = str(tags['EXIF Flash']).strip()
-        
-        # 拍摄模式
-        if 'EXIF ExposureMode' in tags:
-            exif_data['exposure_mode'] = str(tags['EXIF ExposureMode']).strip()
-        
-        # 测光模式
-        if 'EXIF MeteringMode' in tags:
-            exif_data['metering_mode'] = str(tags['EXIF MeteringMode']).strip()
-        
-        # 提取相机品牌
-        if 'Image Make' in tags:
-            exif_data['camera_make'] = str(tags['Image Make']).strip()
-        elif 'EXIF Make' in tags:
-            exif_data['camera_make'] = str(tags['EXIF Make']).strip()
-        
-        # 提取相机型号
-        if 'Image Model' in tags:
-            exif_data['camera_model'] = str(tags['Image Model']).strip()
-        elif 'EXIF Model' in tags:
-            exif_data['camera_model'] = str(tags['EXIF Model']).strip()
-        
-        # 提取GPS坐标（需要正确转换度/分/秒格式）
-        gps_tags = [tag for tag in tags.keys() if 'GPS' in tag]
-        if gps_tags:
-            print(f"找到GPS相关标签: {gps_tags}")
-            # 打印所有GPS标签的详细信息
-            for gps_tag in gps_tags:
-                print(f"  {gps_tag}: {tags[gps_tag]}")
-        
-        # 尝试多种可能的GPS标签名称格式
-        lat_tag = None
-        lon_tag = None
-        lat_ref_tag = None
-        lon_ref_tag = None
-        
-        # 常见的GPS标签名称变体
-        possible_lat_tags = ['GPS GPSLatitude', 'GPS Latitude', 'GPSLatitude']
-        possible_lon_tags = ['GPS GPSLongitude', 'GPS Longitude', 'GPSLongitude']
-        possible_lat_ref_tags = ['GPS GPSLatitudeRef', 'GPS LatitudeRef', 'GPSLatitudeRef']
-        possible_lon_ref_tags = ['GPS GPSLongitudeRef', 'GPS LongitudeRef', 'GPSLongitudeRef']
-        
-        # 查找实际的标签名称
-        for tag_name in tags.keys():
-            tag_upper = tag_name.upper()
-            if 'LATITUDE' in tag_upper and 'REF' not in tag_upper:
-                lat_tag = tag_name
-            elif 'LONGITUDE' in tag_upper and 'REF' not in tag_upper:
-                lon_tag = tag_name
-            elif 'LATITUDE' in tag_upper and 'REF' in tag_upper:
-                lat_ref_tag = tag_name
-            elif 'LONGITUDE' in tag_upper and 'REF' in tag_upper:
-                lon_ref_tag = tag_name
-        
-        print(f"检测到的GPS标签: lat={lat_tag}, lon={lon_tag}, lat_ref={lat_ref_tag}, lon_ref={lon_ref_tag}")
-        
-        # 使用找到的标签名称提取GPS坐标
-        if lat_tag and lon_tag:
-            try:
-                lat_ref = str(tags.get(lat_ref_tag, 'N')).upper() if lat_ref_tag else 'N'
-                lon_ref = str(tags.get(lon_ref_tag, 'E')).upper() if lon_ref_tag else 'E'
-                
-                print(f"GPS纬度原始值: {tags[lat_tag]}, 参考: {lat_ref}")
-                print(f"GPS经度原始值: {tags[lon_tag]}, 参考: {lon_ref}")
-                
-                lat = convert_to_degrees(tags[lat_tag])
-                lon = convert_to_degrees(tags[lon_tag])
-                
-                if lat is not None and lon is not None:
-                    # 根据方向调整正负
-                    if lat_ref == 'S':
-                        lat = -lat
-                    if lon_ref == 'W':
-                        lon = -lon
-                    
-                    exif_data['latitude'] = lat
-                    exif_data['longitude'] = lon
-                    print(f"成功提取GPS坐标: ({lat}, {lon})")
-                else:
-                    print(f"GPS坐标转换失败: lat={lat}, lon={lon}")
-            except Exception as e:
-                print(f"提取GPS坐标失败: {e}")
-                import traceback
-                traceback.print_exc()
-        else:
-            print(f"未找到GPS坐标标签 (lat_tag={lat_tag}, lon_tag={lon_tag})")
-        
-        # 如果已经提取到数据，直接返回
-        if exif_data:
-            return exif_data
-            
-    except Exception as e:
-        print(f"使用exifread提取EXIF数据失败: {e}")
-    
-    # 方法2: 使用PIL的EXIF功能作为备选
+    if removed:
+        print(f"已删除旧布局的渲染缓存 {removed} 个")
+
+remove_legacy_renders()
+
+def render_photo(photo, max_size=None):
+    """返回照片当前编辑版本的渲染文件路径，按 (照片, 版本, 尺寸) 缓存
+
+    完整尺寸从原图重放全部操作（避免多次编辑的重复压缩损失）；
+    指定尺寸时由完整渲染（未编辑时为原图）缩小得到。未编辑且不指定尺寸时返回原图路径
+    """
+    version = photo.edit_version or 0
+    if version <= 0 and max_size is None:
+        return storage.local_path(photo.file_path)
+
+    path = render_path(photo, version, photo.edit_revision, max_size)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    base, ext = os.path.splitext(path)
+    tmp_path = f'{base}.{uuid.uuid4().hex}.tmp{ext}'
+    if max_size is not None:
+        # 缩略图由完整渲染生成，不再重放编辑操作
+        full_path = render_photo(photo)
+        if not generate_thumbnail(full_path, tmp_path, size=max_size):
+            raise ValueError('生成渲染缩略图失败')
+        os.replace(tmp_path, path)
+        return path
+
+    operations = get_edit_operations(photo, version)
+    source_path = storage.local_path(photo.file_path)
+
+    # 只有几何操作时尝试用 jpegtran 无损变换，无需解码和重新压缩，也不占用内存额度
+    if ext == '.jpg' and lossless_render(source_path, tmp_path, operations):
+        os.replace(tmp_path, path)
+        print(f"无损渲染完成: {path}")
+        prune_renders(photo, version, photo.edit_revision)
+        return path
+
+    with Image.open(source_path) as probe:
+        sizes = edit_size_chain(probe.size, operations)
+    required_memory = max(estimate_edit_memory(size) for size in sizes)
+    if not edit_memory_pool.acquire(required_memory, timeout=60):
+        raise TimeoutError('服务器繁忙，请稍后重试')
     try:
-        with Image.open(image_path) as img:
-            exif = img.getexif()
-            if exif:
-                print(f"PIL EXIF包含 {len(exif)} 个字段")
-                # 打印所有EXIF字段（用于调试）
-                if len(exif) > 0:
-                    print(f"PIL EXIF字段示例: {list(exif.items())[:10]}")
-                
-                # 提取拍摄时间
-                date_fields = {
-                    36867: 'EXIF DateTimeOriginal',
-                    36868: 'EXIF DateTimeDigitized',
-                    306: 'DateTime',
-                    36880: 'EXIF SubSecTimeOriginal',
-                    36881: 'EXIF SubSecTimeDigitized'
-                }
-                for field_code, field_name in date_fields.items():
-                    if field_code in exif:
-                        try:
-                            date_str = exif[field_code]
-                            print(f"PIL找到日期字段 {field_name} ({field_code}): {date_str}")
-                            for fmt in ['%Y:%m:%d %H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y/%m/%d %H:%M:%S']:
-                                try:
-                                    taken_at = datetime.strptime(date_str, fmt)
-                                    exif_data['taken_at'] = taken_at
-                                    print(f"PIL成功解析日期: {taken_at}")
-                                    break
-                                except ValueError:
-                                    continue
-                            if 'taken_at' in exif_data:
-                                break
-                        except Exception as e:
-                            print(f"解析PIL EXIF日期字段 {field_name} 失败: {e}")
-                            continue
-                
-                # 提取相机品牌和型号
-                if 271 in exif and not exif_data.get('camera_make'):
-                    exif_data['camera_make'] = str(exif[271]).strip()
-                    print(f"PIL提取相机品牌: {exif_data['camera_make']}")
-                if 272 in exif and not exif_data.get('camera_model'):
-                    exif_data['camera_model'] = str(exif[272]).strip()
-                    print(f"PIL提取相机型号: {exif_data['camera_model']}")
-                
-                # PIL也可以提取GPS信息（通过EXIF GPS IFD）
-                # 尝试从PIL的EXIF中提取GPS
-                try:
-                    from PIL.ExifTags import GPS
-                    gps_info = exif.get_ifd(0x8825)  # GPS IFD
-                    if gps_info:
-                        print(f"PIL找到GPS信息: {gps_info}")
-                        # GPS标签代码
-                        GPS_LAT = 2  # GPSLatitude
-                        GPS_LAT_REF = 1  # GPSLatitudeRef
-                        GPS_LON = 4  # GPSLongitude
-                        GPS_LON_REF = 3  # GPSLongitudeRef
-                        
-                        if GPS_LAT in gps_info and GPS_LON in gps_info:
-                            lat_ref = gps_info.get(GPS_LAT_REF, 'N')
-                            lon_ref = gps_info.get(GPS_LON_REF, 'E')
-                            
-                            # PIL返回的GPS坐标是元组格式 (度, 分, 秒)
-                            lat_tuple = gps_info[GPS_LAT]
-                            lon_tuple = gps_info[GPS_LON]
-                            
-                            # 转换为小数
-                            lat = lat_tuple[0] + lat_tuple[1]/60.0 + lat_tuple[2]/3600.0
-                            lon = lon_tuple[0] + lon_tuple[1]/60.0 + lon_tuple[2]/3600.0
-                            
-                            if lat_ref == 'S':
-                                lat = -lat
-                            if lon_ref == 'W':
-                                lon = -lon
-                            
-                            if 'latitude' not in exif_data:  # 如果exifread没有提取到，使用PIL的结果
-                                exif_data['latitude'] = lat
-                                exif_data['longitude'] = lon
-                                print(f"PIL成功提取GPS坐标: ({lat}, {lon})")
-                except Exception as e:
-                    print(f"PIL提取GPS信息失败: {e}")
-                
-    except Exception as e:
-        print(f"使用PIL提取EXIF数据失败: {e}")
-        import traceback
-        traceback.print_exc()
-    
+        size = render_file(source_path, operations, path, allow_lossless=False)
+        print(f"渲染完成: {path}, 尺寸: {size}")
+    finally:
+        edit_memory_pool.release(required_memory)
+    prune_renders(photo, version, photo.edit_revision)
+    return path
+
+# 预览代理图缓存：(渲染文件路径, 修改时间) -> 已解码的RGB图像，按LRU淘汰
+_preview_proxies = OrderedDict()
+_preview_lock = threading.Lock()
+
+def get_preview_proxy(photo):
+    """获取照片当前编辑版本的预览代理图（长边不超过PREVIEW_SIZE的PIL图像）"""
+    size = app.config['PREVIEW_SIZE']
+    path = render_photo(photo, (size, size))
+    key = (path, os.stat(path).st_mtime_ns)
+    with _preview_lock:
+        proxy = _preview_proxies.get(key)
+        if proxy is not None:
+            _preview_proxies.move_to_end(key)
+            return proxy
+
+    with Image.open(path) as img:
+        proxy = to_rgb(img.copy())
+    with _preview_lock:
+        _preview_proxies[key] = proxy
+        while len(_preview_proxies) > app.config['PREVIEW_CACHE_SIZE']:
+            _preview_proxies.popitem(last=False)
+    return proxy
+
+def extract_exif_data(image_path):
+    """提取EXIF数据（拍摄时间、相机、拍摄参数、GPS坐标），只读取文件中的元数据段"""
     # 注意：如果没有从EXIF提取到拍摄时间，不设置taken_at
     # 因为文件修改时间通常是上传时间，不是拍摄时间
-    # 这样可以避免将上传时间误识别为拍摄时间
-    
-    return exif_data
+    return extract_exif(image_path)
 
 # analyze_image_with_ai 函数已移至 utils/ai_analyzer.py
 # 现在从 utils 模块导入使用
 
+# 每个用户一个内存向量索引，首次语义搜索时从数据库加载
+_vector_indexes = {}
+_vector_index_lock = threading.Lock()
+
+def get_user_vector_index(user_id):
+    """获取用户的向量索引，不存在时从photo_embeddings表构建"""
+    user_id = int(user_id)
+    index = _vector_indexes.get(user_id)
+    if index is not None:
+        return index
+    with _vector_index_lock:
+        index = _vector_indexes.get(user_id)
+        if index is None:
+            encoder = get_encoder()
+            rows = db.session.query(PhotoEmbedding.photo_id, PhotoEmbedding.vector).filter(
+                PhotoEmbedding.user_id == user_id,
+                PhotoEmbedding.model_name == encoder.model_name
+            ).all()
+            index = VectorIndex(encoder.dim)
+            if rows:
+                index.add([row[0] for row in rows], np.stack([from_blob(row[1]) for row in rows]))
+            _vector_indexes[user_id] = index
+    return index
+
+def index_photo_embeddings(photos):
+    """计算照片当前编辑版本的向量，写入数据库并更新已加载的内存索引（调用方负责commit）"""
+    if not photos:
+        return 0
+    encoder = get_encoder()
+    vectors = encoder.encode_images([render_photo(photo) for photo in photos])
+    for photo, vector in zip(photos, vectors):
+        db.session.merge(PhotoEmbedding(
+            photo_id=photo.id,
+            user_id=photo.user_id,
+            model_name=encoder.model_name,
+            dim=len(vector),
+            vector=to_blob(vector)
+        ))
+        index = _vector_indexes.get(int(photo.user_id))
+        if index is not None:
+            index.add([photo.id], vector[None, :])
+    return len(photos)
+
+def remove_photo_embedding(photo):
+    """从内存索引中移除照片（数据库记录随照片级联删除）"""
+    index = _vector_indexes.get(int(photo.user_id))
+    if index is not None:
+        index.remove(photo.id)
+
+def invalidate_photo_embeddings(photos):
+    """照片内容改变（编辑、撤销、重做）：删除已失效的向量（不提交），由 refresh_photo_embeddings 或补算接口重新计算"""
+    if not photos:
+        return
+    PhotoEmbedding.query.filter(PhotoEmbedding.photo_id.in_([photo.id for photo in photos])).delete(
+        synchronize_session=False
+    )
+    for photo in photos:
+        remove_photo_embedding(photo)
+
+def refresh_photo_embeddings(photos):
+    """编辑提交后按新版本重新计算向量（失败不影响编辑，之后可由补算接口重新计算）"""
+    if not photos or not semantic_search_enabled():
+        return
+    try:
+        index_photo_embeddings(photos)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"计算图片向量失败: {e}")
+
 def ensure_tags_for_photo(photo, tag_names, tag_type='auto'):
-    """确保给定标签已创建并与照片关联"""
-    attached = []
+    """确保给定标签已创建并与照片关联，返回新关联的标签ID（调用方负责 update_user_stats 和commit）
+
+    包含顿号的标签按顿号分割成多个标签，
+    例如："夜晚的天空、飞机、深蓝色和白色" -> ["夜晚的天空", "飞机", "深蓝色和白色"]
+    """
+    attached_ids = []
+    for name in split_tag_names(tag_names):
+        tag = Tag.query.filter_by(name=name).first()
+        if not tag:
+            tag = Tag(name=name, type=tag_type)
+            db.session.add(tag)
+            db.session.flush()
+        relation_exists = PhotoTag.query.filter_by(photo_id=photo.id, tag_id=tag.id).first()
+        if not relation_exists:
+            db.session.add(PhotoTag(photo_id=photo.id, tag_id=tag.id))
+            attached_ids.append(tag.id)
+    return attached_ids
+
+def bulk_insert_photos(user_id, results, custom_tag_names=(), tag_ids=None):
+    """批量写入照片及其标签关联（调用方负责commit），返回Photo对象列表
+
+    results 中每项包含 Photo 的字段以及 exif、ai_tags；tag_ids 为 {标签名: ID} 缓存，
+    不传时只查询本批需要的标签，新建的标签会补充到缓存中
+    """
+    photos = []
+    for result in results:
+        exif_data = result['exif']
+        photos.append(Photo(
+            user_id=user_id,
+            filename=result['filename'],
+            original_filename=result['original_filename'],
+            file_path=result['file_path'],
+            thumbnail_path=result['thumbnail_path'],
+            file_size=result['file_size'],
+            mime_type=result['mime_type'],
+            width=result['width'],
+            height=result['height'],
+            content_hash=result['content_hash'],
+            perceptual_hash=result['perceptual_hash'],
+            placeholder=result.get('placeholder'),
+            dominant_color=result.get('dominant_color'),
+            taken_at=exif_data.get('taken_at'),
+            camera_make=exif_data.get('camera_make'),
+            camera_model=exif_data.get('camera_model'),
+            latitude=exif_data.get('latitude'),
+            longitude=exif_data.get('longitude'),
+            location_name=exif_data.get('location_name')
+        ))
+    db.session.add_all(photos)
+    db.session.flush()
+    # 文件在放入存储前已预留（reserve_stored_files），随照片记录一起转为引用
+    settle_stored_files([result['file_path'] for result in results])
+
+    custom_tag_names = split_tag_names(custom_tag_names)
+    photo_tags = []
+    auto_tag_names = set()
+    for photo, result in zip(photos, results):
+        exif_tag_names = generate_exif_tag_names(result['exif'], width=result['width'], height=result['height'])
+        names = split_tag_names(exif_tag_names + list(result['ai_tags']))
+        auto_tag_names.update(names)
+        photo_tags.append((photo.id, list(dict.fromkeys(names + custom_tag_names))))
+
+    needed = {name for _, names in photo_tags for name in names}
+    if tag_ids is None:
+        tag_ids = {}
+    missing = [name for name in needed if name not in tag_ids]
+    if missing:
+        tag_ids.update(db.session.query(Tag.name, Tag.id).filter(Tag.name.in_(missing)).all())
+    new_names = sorted(name for name in needed if name not in tag_ids)
+    if new_names:
+        tags = [Tag(name=name, type='auto' if name in auto_tag_names else 'custom') for name in new_names]
+        db.session.add_all(tags)
+        db.session.flush()
+        tag_ids.update((tag.name, tag.id) for tag in tags)
+
+    rows = [{'photo_id': photo_id, 'tag_id': tag_ids[name]} for photo_id, names in photo_tags for name in names]
+    if rows:
+        db.session.execute(PhotoTag.__table__.insert(), rows)
+    update_user_stats(int(user_id), added=photos, tags_added=[row['tag_id'] for row in rows])
+    return photos
+
+def split_tag_names(tag_names):
+    """清理标签名，包含顿号的标签拆分为多个（与 ensure_tags_for_photo 的规则一致）"""
+    names = []
     for tag_name in tag_names:
         cleaned = (tag_name or '').strip()
         if not cleaned:
             continue
-        
-        # 如果标签包含顿号，按顿号分割成多个标签
-        # 例如："夜晚的天空、飞机、深蓝色和白色" -> ["夜晚的天空", "飞机", "深蓝色和白色"]
         if '、' in cleaned:
-            sub_tags = [sub_tag.strip() for sub_tag in cleaned.split('、') if sub_tag.strip()]
-            # 递归处理分割后的标签
-            attached.extend(ensure_tags_for_photo(photo, sub_tags, tag_type))
+            names.extend(sub_tag.strip() for sub_tag in cleaned.split('、') if sub_tag.strip())
         else:
-            # 单个标签，直接处理
-            tag = Tag.query.filter_by(name=cleaned).first()
-            if not tag:
-                tag = Tag(name=cleaned, type=tag_type)
-                db.session.add(tag)
-                db.session.flush()
-            relation_exists = PhotoTag.query.filter_by(photo_id=photo.id, tag_id=tag.id).first()
-            if not relation_exists:
-                db.session.add(PhotoTag(photo_id=photo.id, tag_id=tag.id))
-                attached.append(cleaned)
-    return attached
+            names.append(cleaned)
+    return list(dict.fromkeys(names))
+
+# 统计行中保留的最近上传照片数
+RECENT_PHOTOS_KEPT = 12
+
+def camera_label(camera_make, camera_model):
+    """统计用的相机名称（型号中已包含厂商名时不重复）"""
+    make = (camera_make or '').strip()
+    model = (camera_model or '').strip()
+    if not model:
+        return make or None
+    if make and not model.lower().startswith(make.split()[0].lower()):
+        return f'{make} {model}'
+    return model
+
+def build_user_stats(user_id):
+    """由现有数据汇总生成统计行（升级前已有的用户第一次用到时汇总一次）"""
+    photo_count, total_size, edited_count, first_taken_at, last_taken_at = db.session.query(
+        func.count(Photo.id),
+        func.coalesce(func.sum(Photo.file_size), 0),
+        func.coalesce(func.sum(case((Photo.edit_version > 0, 1), else_=0)), 0),
+        func.min(Photo.taken_at),
+        func.max(Photo.taken_at)
+    ).filter(Photo.user_id == user_id).one()
+
+    cameras = {}
+    for make, model, count in db.session.query(
+        Photo.camera_make, Photo.camera_model, func.count(Photo.id)
+    ).filter(Photo.user_id == user_id).group_by(Photo.camera_make, Photo.camera_model):
+        label = camera_label(make, model)
+        if label:
+            cameras[label] = cameras.get(label, 0) + count
+
+    tag_counts = {
+        str(tag_id): count for tag_id, count in db.session.query(
+            PhotoTag.tag_id, func.count(PhotoTag.photo_id)
+        ).join(Photo, Photo.id == PhotoTag.photo_id).filter(Photo.user_id == user_id).group_by(PhotoTag.tag_id)
+    }
+    recent = [photo_id for (photo_id,) in db.session.query(Photo.id).filter(
+        Photo.user_id == user_id
+    ).order_by(Photo.id.desc()).limit(RECENT_PHOTOS_KEPT)]
+
+    return UserStats(
+        user_id=user_id,
+        photo_count=photo_count,
+        total_size=int(total_size),
+        edited_count=int(edited_count),
+        tag_counts=json.dumps(tag_counts),
+        camera_counts=json.dumps(cameras, ensure_ascii=False),
+        first_taken_at=first_taken_at,
+        last_taken_at=last_taken_at,
+        date_range_stale=False,
+        recent_photo_ids=json.dumps(recent)
+    )
+
+def update_user_stats(user_id, added=(), removed=(), changed=(), tags_added=(), tags_removed=(), edited=0):
+    """在当前事务中增量更新用户统计（调用方负责commit）
+
+    added/removed: 新增/删除的 Photo 对象（调用时已加入会话）
+    changed: [(原相机名称, 原拍摄时间, Photo)]，EXIF重新读取后相机或拍摄时间变化的照片
+    tags_added/tags_removed: 新增/删除的照片-标签关联，每个关联一个标签ID
+    edited: 处于编辑版本的照片数变化
+    统计行加行锁，同一用户的并发上传/删除依次更新。统计行在注册时（老用户在 upgrade_schema 中）创建；
+    仍不存在时由当前会话中的数据汇总生成（已包含本次变化），并发请求已经插入时改为增量更新
+    """
+    # 不存在时不能先 SELECT ... FOR UPDATE：MySQL 对不存在的行加间隙锁，两个请求随后同时插入会死锁
+    if db.session.query(UserStats.user_id).filter_by(user_id=user_id).first() is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(build_user_stats(user_id))
+            return
+        except IntegrityError:
+            pass
+    stats = UserStats.query.filter_by(user_id=user_id).with_for_update().populate_existing().one()
+
+    cameras = json.loads(stats.camera_counts or '{}')
+    tag_counts = json.loads(stats.tag_counts or '{}')
+    recent = json.loads(stats.recent_photo_ids or '[]')
+
+    def count_camera(label, delta):
+        if label:
+            cameras[label] = cameras.get(label, 0) + delta
+            if cameras[label] <= 0:
+                del cameras[label]
+
+    def add_taken_at(taken_at):
+        if taken_at is None:
+            return
+        if stats.first_taken_at is None or taken_at < stats.first_taken_at:
+            stats.first_taken_at = taken_at
+        if stats.last_taken_at is None or taken_at > stats.last_taken_at:
+            stats.last_taken_at = taken_at
+
+    def remove_taken_at(taken_at):
+        # 删除的是最早或最晚的照片时，范围需要重新查询
+        if taken_at is not None and taken_at in (stats.first_taken_at, stats.last_taken_at):
+            stats.date_range_stale = True
+
+    for photo in added:
+        stats.photo_count += 1
+        stats.total_size += photo.file_size or 0
+        count_camera(camera_label(photo.camera_make, photo.camera_model), 1)
+        add_taken_at(photo.taken_at)
+        recent.insert(0, photo.id)
+    for photo in removed:
+        stats.photo_count -= 1
+        stats.total_size -= photo.file_size or 0
+        if photo.edit_version:
+            stats.edited_count -= 1
+        count_camera(camera_label(photo.camera_make, photo.camera_model), -1)
+        remove_taken_at(photo.taken_at)
+        if photo.id in recent:
+            recent.remove(photo.id)
+    for old_camera, old_taken_at, photo in changed:
+        count_camera(old_camera, -1)
+        count_camera(camera_label(photo.camera_make, photo.camera_model), 1)
+        remove_taken_at(old_taken_at)
+        add_taken_at(photo.taken_at)
+    for tag_id in tags_added:
+        key = str(tag_id)
+        tag_counts[key] = tag_counts.get(key, 0) + 1
+    for tag_id in tags_removed:
+        key = str(tag_id)
+        tag_counts[key] = tag_counts.get(key, 0) - 1
+        if tag_counts[key] <= 0:
+            del tag_counts[key]
+    stats.edited_count += edited
+    if stats.date_range_stale:
+        # 持有行锁时重新查询（会话中的删除已经刷新到数据库）
+        stats.first_taken_at, stats.last_taken_at = db.session.query(
+            func.min(Photo.taken_at), func.max(Photo.taken_at)
+        ).filter(Photo.user_id == user_id).one()
+        stats.date_range_stale = False
+
+    stats.camera_counts = json.dumps(cameras, ensure_ascii=False)
+    stats.tag_counts = json.dumps(tag_counts)
+    stats.recent_photo_ids = json.dumps(recent[:RECENT_PHOTOS_KEPT])
 
 def generate_exif_tag_names(exif_data, width=None, height=None):
     """基于EXIF信息和图片属性生成标签名称"""
@@ -729,6 +1285,8 @@ def register():
     
     try:
         db.session.add(user)
+        db.session.flush()
+        db.session.add(UserStats(user_id=user.id, tag_counts='{}', camera_counts='{}', recent_photo_ids='[]'))
         db.session.commit()
         return jsonify({'message': '注册成功'}), 201
     except Exception as e:
@@ -755,6 +1313,147 @@ def login():
     
     return jsonify({'error': '用户名或密码错误'}), 401
 
+def photo_summary(photo):
+    return {
+        'id': photo.id,
+        'filename': photo.filename,
+        'original_filename': photo.original_filename,
+        'width': photo.width,
+        'height': photo.height,
+        'file_size': photo.file_size,
+        'taken_at': photo.taken_at.isoformat() if photo.taken_at else None,
+        'location': photo.location_name
+    }
+
+def create_photo_from_upload(user_id, incoming_path, original_filename, file_size, content_hash,
+                             custom_tags='', upload_session=None):
+    """上传的文件写完后：去重并移动到内容地址，生成缩略图/EXIF/标签并入库，返回 (响应, 状态码)
+
+    upload_session 为分块上传的会话，与照片记录在同一事务中删除（失败时保留，可以重新提交）
+    """
+    # 完全相同的文件已上传过：直接返回已有照片，跳过缩略图和AI分析
+    existing = Photo.query.filter_by(user_id=user_id, content_hash=content_hash).first()
+    if existing and storage.exists(existing.file_path):
+        if upload_session is not None:
+            db.session.delete(upload_session)
+            db.session.commit()
+        os.remove(incoming_path)
+        return jsonify({
+            'message': '图片已存在',
+            'duplicate': True,
+            'photo': photo_summary(existing)
+        }), 200
+    
+    ext = original_filename.rsplit('.', 1)[1].lower()
+    # 先预留再放入存储：相同内容已存在时丢弃临时文件，预留保证它不会在入库前被删除
+    file_path = storage.original_path(content_hash, ext)
+    thumbnail_path = storage.thumbnail_path(content_hash, ext)
+    reserve_stored_files([file_path])
+    try:
+        storage.put_original(incoming_path, content_hash, ext)
+        return save_uploaded_photo(user_id, file_path, thumbnail_path, original_filename, file_size, content_hash,
+                                   custom_tags, upload_session)
+    except Exception:
+        # 清理本次新建的文件（其他照片引用的相同内容会保留）
+        db.session.rollback()
+        release_photo_files(file_path, thumbnail_path, reserved=True)
+        raise
+
+def save_uploaded_photo(user_id, file_path, thumbnail_path, original_filename, file_size, content_hash,
+                        custom_tags='', upload_session=None):
+    # 本地文件（对象存储时为缓存中的副本）
+    local_path = storage.local_path(file_path)
+    
+    # 获取文件信息
+    mime_type = magic.from_file(local_path, mime=True)
+    
+    # 获取图片尺寸
+    with Image.open(local_path) as img:
+        width, height = img.size
+    
+    # 提取EXIF数据
+    exif_data = extract_exif_data(local_path)
+    
+    # 生成缩略图（相同内容的缩略图已存在时直接共用）
+    if not storage.exists(thumbnail_path):
+        with storage.writing(thumbnail_path) as local_thumbnail_path:
+            generate_thumbnail(local_path, local_thumbnail_path)
+    
+    # 感知哈希（用于近似重复检测）
+    perceptual_hash = phash_file(local_path)
+
+    # 列表中内嵌的低清占位图和主色调（由缩略图生成）
+    placeholder, dominant_color = generate_placeholder(storage.local_path(thumbnail_path))
+    
+    # AI分析图片内容（网络请求，在写入数据库之前完成，避免统计行的行锁在等待期间一直被持有）
+    ai_tags = analyze_image_with_ai(local_path)
+    
+    # 保存到数据库
+    # 只提取Photo模型中存在的字段
+    photo_fields = {
+        'taken_at': exif_data.get('taken_at'),
+        'camera_make': exif_data.get('camera_make'),
+        'camera_model': exif_data.get('camera_model'),
+        'latitude': exif_data.get('latitude'),
+        'longitude': exif_data.get('longitude'),
+        'location_name': exif_data.get('location_name')
+    }
+    # 移除None值
+    photo_fields = {k: v for k, v in photo_fields.items() if v is not None}
+    
+    photo = Photo(
+        user_id=user_id,
+        filename=os.path.basename(file_path),
+        original_filename=original_filename,
+        file_path=file_path,
+        thumbnail_path=thumbnail_path,
+        file_size=file_size,
+        mime_type=mime_type,
+        width=width,
+        height=height,
+        content_hash=content_hash,
+        perceptual_hash=hash_to_hex(perceptual_hash) if perceptual_hash is not None else None,
+        placeholder=placeholder,
+        dominant_color=dominant_color,
+        **photo_fields
+    )
+    
+    db.session.add(photo)
+    db.session.flush()
+    
+    # 基于EXIF的信息生成标签（包含分辨率信息）、AI标签、自定义标签
+    exif_tag_names = generate_exif_tag_names(exif_data, width=width, height=height)
+    tag_ids = ensure_tags_for_photo(photo, exif_tag_names, tag_type='auto')
+    tag_ids += ensure_tags_for_photo(photo, ai_tags, tag_type='auto')
+    if custom_tags:
+        tag_ids += ensure_tags_for_photo(
+            photo,
+            [name.strip() for name in custom_tags.split(',') if name.strip()],
+            tag_type='custom'
+        )
+    
+    # 统计行加锁后立即提交，行锁只持有到本次事务结束
+    if upload_session is not None:
+        db.session.delete(upload_session)
+    settle_stored_files([file_path])
+    update_user_stats(int(user_id), added=[photo], tags_added=tag_ids)
+    db.session.commit()
+    user_data_changed(int(user_id))
+    
+    # 计算语义搜索向量（失败不影响上传）
+    if semantic_search_enabled():
+        try:
+            index_photo_embeddings([photo])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"计算图片向量失败: {e}")
+    
+    return jsonify({
+        'message': '上传成功',
+        'photo': photo_summary(photo)
+    }), 201
+
 @app.route('/api/upload', methods=['POST'])
 @jwt_required()
 def upload_photo():
@@ -769,103 +1468,447 @@ def upload_photo():
         return jsonify({'error': '不支持的文件类型'}), 400
     
     try:
-        # 生成唯一文件名
-        filename = str(uuid.uuid4()) + '.' + file.filename.rsplit('.', 1)[1].lower()
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        
-        # 保存文件
-        file.save(file_path)
-        
-        # 获取文件信息
-        file_size = os.path.getsize(file_path)
-        mime_type = magic.from_file(file_path, mime=True)
-        
-        # 获取图片尺寸
-        with Image.open(file_path) as img:
-            width, height = img.size
-        
-        # 提取EXIF数据
-        exif_data = extract_exif_data(file_path)
-        # 打印提取到的EXIF数据用于调试
-        if exif_data:
-            print(f"提取到EXIF数据: {exif_data}")
-        else:
-            print(f"未提取到EXIF数据，文件: {file.filename}")
-        
-        # 生成缩略图
-        thumbnail_filename = 'thumb_' + filename
-        thumbnail_path = os.path.join(app.config['THUMBNAIL_FOLDER'], thumbnail_filename)
-        generate_thumbnail(file_path, thumbnail_path)
-        
-        # 保存到数据库
+        # 保存到临时位置（写入时同时计算内容哈希）
+        incoming_path = storage.incoming_path(file.filename.rsplit('.', 1)[1].lower())
+        file_size, content_hash = save_upload_stream(file.stream, incoming_path)
         user_id = get_jwt_identity()
-        
-        # 只提取Photo模型中存在的字段
-        photo_fields = {
-            'taken_at': exif_data.get('taken_at'),
-            'camera_make': exif_data.get('camera_make'),
-            'camera_model': exif_data.get('camera_model'),
-            'latitude': exif_data.get('latitude'),
-            'longitude': exif_data.get('longitude'),
-            'location_name': exif_data.get('location_name')
-        }
-        # 移除None值
-        photo_fields = {k: v for k, v in photo_fields.items() if v is not None}
-        
-        photo = Photo(
-            user_id=user_id,
-            filename=filename,
-            original_filename=file.filename,
-            file_path=file_path,
-            thumbnail_path=thumbnail_path,
-            file_size=file_size,
-            mime_type=mime_type,
-            width=width,
-            height=height,
-            **photo_fields
-        )
-        
-        db.session.add(photo)
+        return create_photo_from_upload(user_id, incoming_path, file.filename, file_size, content_hash,
+                                        request.form.get('tags', ''))
+    except Exception as e:
+        return jsonify({'error': f'上传失败: {str(e)}'}), 500
+
+def remove_upload_files(items):
+    """清理未能入库的上传文件：临时文件直接删除，已移动到内容地址的文件撤销预留，没有其他照片引用时才删除"""
+    for item in items:
+        remove_local(item.pop('incoming_path', None))
+        if item.get('file_path'):
+            release_photo_files(item['file_path'], item.get('thumbnail_path'), reserved=True)
+
+@app.route('/api/upload/batch', methods=['POST'])
+@jwt_required()
+def upload_photo_batch():
+    """一个multipart请求上传多个文件（字段名 files，可选字段 tags）
+
+    边接收边写入上传目录并计算哈希，每个文件接收完成后立即交给线程池生成缩略图/EXIF/AI标签，
+    全部处理完后按组批量入库，返回与上传顺序一致的逐文件结果
+    """
+    boundary = request.mimetype_params.get('boundary')
+    if request.mimetype != 'multipart/form-data' or not boundary:
+        return jsonify({'error': '请使用 multipart/form-data 上传'}), 400
+
+    user_id = get_jwt_identity()
+    # 整个请求体使用单独的上限（普通请求仍受 MAX_CONTENT_LENGTH 限制）
+    stream = get_input_stream(request.environ, max_content_length=app.config['MAX_BATCH_UPLOAD_SIZE'])
+    executor = get_upload_executor()
+    manifest = []  # 每个文件一项，顺序与请求中一致
+    pending = []   # (结果项, 处理任务)
+    seen_hashes = {}
+    custom_tags = ''
+    current = None
+    try:
+        for event in iter_multipart(stream, boundary.encode('latin-1')):
+            kind = event[0]
+            if kind == 'field':
+                if event[1] == 'tags':
+                    custom_tags = event[2]
+            elif kind == 'file':
+                original_filename = event[2]
+                item = {'original_filename': original_filename}
+                manifest.append(item)
+                current = None
+                if not original_filename or not allowed_file(original_filename):
+                    item.update(status='error', error='不支持的文件类型')
+                    continue
+                ext = original_filename.rsplit('.', 1)[1].lower()
+                item.update(ext=ext, incoming_path=storage.incoming_path(ext), file_size=0)
+                current = (item, open(item['incoming_path'], 'wb'), hashlib.sha256())
+            elif kind == 'data':
+                if current is None:
+                    continue
+                item, f, digest = current
+                item['file_size'] += len(event[1])
+                if item['file_size'] > app.config['MAX_UPLOAD_SIZE']:
+                    f.close()
+                    remove_upload_files([item])
+                    item.update(status='error', error='文件超过大小上限')
+                    current = None
+                    continue
+                f.write(event[1])
+                digest.update(event[1])
+            elif kind == 'end' and current is not None:
+                item, f, digest = current
+                f.close()
+                current = None
+                item['content_hash'] = content_hash = digest.hexdigest()
+                # 与本次请求中前面的文件或已有照片重复
+                if content_hash in seen_hashes:
+                    existing = {'original_filename': seen_hashes[content_hash]['original_filename']}
+                else:
+                    photo = Photo.query.filter_by(user_id=user_id, content_hash=content_hash).first()
+                    existing = photo_summary(photo) if photo and storage.exists(photo.file_path) else None
+                if existing is not None:
+                    remove_upload_files([item])
+                    item.update(status='duplicate', duplicate_of=existing)
+                    continue
+                seen_hashes[content_hash] = item
+                # 先预留再放入存储：失败时 remove_upload_files 按 file_path 撤销预留
+                item['file_path'] = storage.original_path(content_hash, item['ext'])
+                reserve_stored_files([item['file_path']])
+                storage.put_original(item['incoming_path'], content_hash, item['ext'])
+                item.pop('incoming_path')
+                item['filename'] = os.path.basename(item['file_path'])
+                item['thumbnail_path'] = storage.thumbnail_path(content_hash, item['ext'])
+                pending.append((item, executor.submit(prepare_file, storage, item['file_path'], item['thumbnail_path'],
+                                                      True)))
+    except Exception as e:
+        # 请求体不完整或超过上限：等待已提交的任务结束后清理本次写入的所有文件
+        if current is not None:
+            current[1].close()
+        for _, future in pending:
+            future.cancel()
+        for _, future in pending:
+            if not future.cancelled():
+                try:
+                    future.result()
+                except Exception:
+                    pass
+        remove_upload_files(manifest)
+        status = 413 if getattr(e, 'code', None) == 413 else 400
+        return jsonify({'error': f'上传失败: {str(e)}'}), status
+
+    results = []
+    for item, future in pending:
+        try:
+            item.update(future.result())
+            results.append(item)
+        except Exception as e:
+            remove_upload_files([item])
+            item.update(status='error', error=str(e))
+
+    created = []
+    commit_size = max(1, app.config['UPLOAD_COMMIT_SIZE'])
+    custom_tag_names = [name.strip() for name in custom_tags.split(',') if name.strip()]
+    for start in range(0, len(results), commit_size):
+        group = results[start:start + commit_size]
+        try:
+            photos = bulk_insert_photos(user_id, group, custom_tag_names)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            remove_upload_files(group)
+            for item in group:
+                item.update(status='error', error=f'写入数据库失败: {str(e)}')
+            continue
+        for item, photo in zip(group, photos):
+            item.update(status='created', photo=photo_summary(photo))
+        created.extend(photos)
+
+    if created:
+        user_data_changed(int(user_id))
+
+    # 计算语义搜索向量（失败不影响上传）
+    if created and semantic_search_enabled():
+        try:
+            index_photo_embeddings(created)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"计算图片向量失败: {e}")
+
+    files = []
+    for item in manifest:
+        entry = {'original_filename': item['original_filename'], 'status': item['status']}
+        for key in ('photo', 'duplicate_of', 'error'):
+            if key in item:
+                entry[key] = item[key]
+        files.append(entry)
+    counts = {status: sum(1 for entry in files if entry['status'] == status)
+              for status in ('created', 'duplicate', 'error')}
+    return jsonify({
+        'message': f"上传完成：新增 {counts['created']}，重复 {counts['duplicate']}，失败 {counts['error']}",
+        'created': counts['created'],
+        'duplicates': counts['duplicate'],
+        'failed': counts['error'],
+        'files': files
+    }), 201 if counts['created'] else 200
+
+# 分块上传（类似tus协议）：创建会话 -> 按偏移量PATCH分块 -> 完成
+# 分块直接写入上传目录下的临时文件（完成时只需重命名），同时增量计算SHA-256；哈希状态保存在内存中，服务重启后从已写入的部分重新计算
+_upload_digests = {}  # 上传ID -> (偏移量, sha256对象)
+_upload_busy = set()  # 正在写入的上传ID，同一上传不允许并发PATCH
+_upload_lock = threading.Lock()
+
+def get_upload_session(upload_id):
+    return UploadSession.query.filter_by(id=upload_id, user_id=get_jwt_identity()).first()
+
+def upload_chunk_size():
+    """建议的分块大小，不超过单个请求体上限"""
+    return min(app.config['UPLOAD_CHUNK_SIZE'], app.config['MAX_CONTENT_LENGTH'])
+
+def upload_status(session, status_code=200):
+    response = jsonify({
+        'upload_id': session.id,
+        'offset': session.uploaded_size,
+        'size': session.total_size,
+        'chunk_size': upload_chunk_size()
+    })
+    response.status_code = status_code
+    response.headers['Upload-Offset'] = str(session.uploaded_size)
+    response.headers['Upload-Length'] = str(session.total_size)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def get_upload_digest(session):
+    """取出与会话偏移量一致的哈希状态；内存中没有（如服务重启）时从文件中已写入的部分重新计算"""
+    with _upload_lock:
+        state = _upload_digests.get(session.id)
+    if state and state[0] == session.uploaded_size:
+        return state[1]
+    digest = hashlib.sha256()
+    remaining = session.uploaded_size
+    with open(session.file_path, 'rb') as f:
+        while remaining:
+            chunk = f.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest
+
+def discard_upload(session):
+    with _upload_lock:
+        _upload_digests.pop(session.id, None)
+    remove_local(session.file_path)
+    db.session.delete(session)
+
+def cleanup_expired_uploads():
+    """删除超过保留时间仍未完成的上传会话及其部分文件"""
+    expired = UploadSession.query.filter(
+        UploadSession.updated_at < datetime.utcnow() - app.config['UPLOAD_SESSION_TTL']
+    ).all()
+    for session in expired:
+        if session.id not in _upload_busy:
+            discard_upload(session)
+    if expired:
         db.session.commit()
-        
-        # 基于EXIF的信息生成标签（包含分辨率信息）
-        exif_tag_names = generate_exif_tag_names(exif_data, width=width, height=height)
-        ensure_tags_for_photo(photo, exif_tag_names, tag_type='auto')
 
-        # AI分析图片内容
-        ai_tags = analyze_image_with_ai(file_path)
-        ensure_tags_for_photo(photo, ai_tags, tag_type='auto')
-        
-        # 添加自定义标签
-        custom_tags = request.form.get('tags', '')
-        if custom_tags:
-            ensure_tags_for_photo(
-                photo,
-                [name.strip() for name in custom_tags.split(',') if name.strip()],
-                tag_type='custom'
-            )
-        
+@app.route('/api/uploads', methods=['POST'])
+@jwt_required()
+def create_upload():
+    data = request.get_json(silent=True) or {}
+    original_filename = (data.get('filename') or '').strip()
+    if not original_filename or not allowed_file(original_filename):
+        return jsonify({'error': '不支持的文件类型'}), 400
+    try:
+        total_size = int(data.get('size'))
+    except (TypeError, ValueError):
+        return jsonify({'error': '缺少文件大小'}), 400
+    if total_size <= 0:
+        return jsonify({'error': '文件大小无效'}), 400
+    if total_size > app.config['MAX_UPLOAD_SIZE']:
+        return jsonify({'error': f"文件超过上限 {app.config['MAX_UPLOAD_SIZE'] // 1024 // 1024} MB"}), 413
+
+    cleanup_expired_uploads()
+    file_path = storage.incoming_path(original_filename.rsplit('.', 1)[1].lower())
+    open(file_path, 'wb').close()
+    session = UploadSession(
+        id=str(uuid.uuid4()),
+        user_id=get_jwt_identity(),
+        filename=os.path.basename(file_path),
+        original_filename=original_filename,
+        file_path=file_path,
+        total_size=total_size,
+        uploaded_size=0,
+        tags=(data.get('tags') or '').strip()[:500]
+    )
+    db.session.add(session)
+    db.session.commit()
+    response = upload_status(session, 201)
+    response.headers['Location'] = f'/api/uploads/{session.id}'
+    return response
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+@jwt_required()
+def get_upload(upload_id):
+    """查询已写入的偏移量（断线后从该位置继续），HEAD 请求同样可用"""
+    session = get_upload_session(upload_id)
+    if not session:
+        return jsonify({'error': '上传不存在或已过期'}), 404
+    return upload_status(session)
+
+@app.route('/api/uploads/<upload_id>', methods=['PATCH'])
+@jwt_required()
+def patch_upload(upload_id):
+    """写入一个分块：请求头 Upload-Offset 必须等于服务端已写入的字节数，请求体为原始字节"""
+    session = get_upload_session(upload_id)
+    if not session:
+        return jsonify({'error': '上传不存在或已过期'}), 404
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return jsonify({'error': '缺少 Upload-Offset 请求头'}), 400
+
+    with _upload_lock:
+        if upload_id in _upload_busy:
+            return jsonify({'error': '该上传正在写入其他分块'}), 409
+        _upload_busy.add(upload_id)
+    try:
+        if offset != session.uploaded_size:
+            return upload_status(session, 409)
+        if (request.content_length or 0) > app.config['MAX_CONTENT_LENGTH']:
+            return jsonify({'error': '分块超过单个请求大小上限', 'chunk_size': upload_chunk_size()}), 413
+
+        digest = get_upload_digest(session)
+        remaining = session.total_size - offset
+        written = 0
+        try:
+            with open(session.file_path, 'r+b') as f:
+                f.seek(offset)
+                f.truncate()
+                for chunk in iter(lambda: request.stream.read(1024 * 1024), b''):
+                    if written + len(chunk) > remaining:
+                        raise ValueError('写入的数据超过声明的文件大小')
+                    f.write(chunk)
+                    digest.update(chunk)
+                    written += len(chunk)
+        except ValueError as e:
+            # 丢弃本次写入的部分，保持文件与偏移量一致
+            with open(session.file_path, 'r+b') as f:
+                f.truncate(offset)
+            with _upload_lock:
+                _upload_digests.pop(upload_id, None)
+            return jsonify({'error': str(e)}), 413
+        except Exception as e:
+            # 连接中断：保留已写入的字节，客户端查询偏移量后继续
+            session.uploaded_size = offset + written
+            with _upload_lock:
+                _upload_digests[upload_id] = (session.uploaded_size, digest)
+            db.session.commit()
+            return jsonify({'error': f'分块写入中断: {str(e)}', 'offset': session.uploaded_size}), 400
+
+        session.uploaded_size = offset + written
+        with _upload_lock:
+            _upload_digests[upload_id] = (session.uploaded_size, digest)
         db.session.commit()
-        
-        return jsonify({
-            'message': '上传成功',
-            'photo': {
-                'id': photo.id,
-                'filename': photo.filename,
-                'original_filename': photo.original_filename,
-                'width': photo.width,
-                'height': photo.height,
-                'file_size': photo.file_size,
-                'taken_at': photo.taken_at.isoformat() if photo.taken_at else None,
-                'location': photo.location_name
-            }
-        }), 201
-        
+        return upload_status(session)
+    finally:
+        with _upload_lock:
+            _upload_busy.discard(upload_id)
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+@jwt_required()
+def complete_upload(upload_id):
+    """所有字节写入后创建照片（去重、缩略图、EXIF、标签与普通上传相同）"""
+    session = get_upload_session(upload_id)
+    if not session:
+        return jsonify({'error': '上传不存在或已过期'}), 404
+    if session.uploaded_size != session.total_size:
+        return upload_status(session, 409)
+    with _upload_lock:
+        if upload_id in _upload_busy:
+            return jsonify({'error': '该上传正在写入其他分块'}), 409
+        _upload_busy.add(upload_id)
+    try:
+        content_hash = get_upload_digest(session).hexdigest()
+        user_id, file_path = session.user_id, session.file_path
+        original_filename, file_size, custom_tags = session.original_filename, session.total_size, session.tags
+        # 会话随照片记录一起删除，入库失败时仍然存在
+        response = create_photo_from_upload(user_id, file_path, original_filename, file_size, content_hash,
+                                            custom_tags or '', upload_session=session)
+        with _upload_lock:
+            _upload_digests.pop(upload_id, None)
+        return response
     except Exception as e:
+        db.session.rollback()
+        try:
+            # 暂存文件还在时保留会话，客户端可以重新提交完成请求；
+            # 已被移到存储中（随后入库失败并已清理）时会话无法再完成，连同残留的暂存文件一起删除
+            session = get_upload_session(upload_id)
+            if session is not None and not os.path.exists(session.file_path):
+                discard_upload(session)
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
         return jsonify({'error': f'上传失败: {str(e)}'}), 500
+    finally:
+        with _upload_lock:
+            _upload_busy.discard(upload_id)
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+@jwt_required()
+def cancel_upload(upload_id):
+    session = get_upload_session(upload_id)
+    if not session:
+        return jsonify({'error': '上传不存在或已过期'}), 404
+    if upload_id in _upload_busy:
+        return jsonify({'error': '该上传正在写入其他分块'}), 409
+    discard_upload(session)
+    db.session.commit()
+    return jsonify({'message': '已取消上传'})
+
+# 照片列表只查询这些列：结果是元组行，不构造完整的 Photo 对象，也不触发逐张加载标签
+PHOTO_LIST_COLUMNS = (
+    Photo.id, Photo.filename, Photo.original_filename, Photo.width, Photo.height, Photo.file_size,
+    Photo.taken_at, Photo.location_name, Photo.edit_version, Photo.edit_revision, Photo.thumbnail_path,
+    Photo.placeholder, Photo.dominant_color
+)
+
+def load_photo_tags(photo_ids):
+    """一次查询取出多张照片的标签名，返回 {照片ID: [标签名]}（代替逐张访问 photo.tags）"""
+    tags = {photo_id: [] for photo_id in photo_ids}
+    if tags:
+        rows = (db.session.query(PhotoTag.photo_id, Tag.name)
+                .join(Tag, Tag.id == PhotoTag.tag_id)
+                .filter(PhotoTag.photo_id.in_(list(tags)))
+                .order_by(PhotoTag.id))
+        for photo_id, name in rows:
+            tags[photo_id].append(name)
+    return tags
+
+def photo_list_item(photo, tags):
+    """照片列表中的一项（相册列表、仪表盘最近上传共用）；photo 为 Photo 对象或 PHOTO_LIST_COLUMNS 结果行"""
+    return {
+        'id': photo.id,
+        'filename': photo.filename,
+        'original_filename': photo.original_filename,
+        'width': photo.width,
+        'height': photo.height,
+        'file_size': photo.file_size,
+        'taken_at': photo.taken_at.isoformat() if photo.taken_at else None,
+        'location': photo.location_name,
+        'tags': tags,
+        'edit_version': photo.edit_version or 0,
+        'thumbnail_url': f'/api/thumbnail/{photo.id}',
+        'placeholder': photo.placeholder,
+        'dominant_color': photo.dominant_color
+    }
+
+def photo_list_columns(photos, tags):
+    """列式格式（?format=columns）：{字段名: [每张照片的值]}，字段与 photo_list_item 相同
+
+    字段名只出现一次，per_page 较大时响应体积和序列化时间都明显减少
+    """
+    ids = [photo.id for photo in photos]
+    return {
+        'id': ids,
+        'filename': [photo.filename for photo in photos],
+        'original_filename': [photo.original_filename for photo in photos],
+        'width': [photo.width for photo in photos],
+        'height': [photo.height for photo in photos],
+        'file_size': [photo.file_size for photo in photos],
+        'taken_at': [photo.taken_at.isoformat() if photo.taken_at else None for photo in photos],
+        'location': [photo.location_name for photo in photos],
+        'tags': [tags[photo_id] for photo_id in ids],
+        'edit_version': [photo.edit_version or 0 for photo in photos],
+        'thumbnail_url': [f'/api/thumbnail/{photo_id}' for photo_id in ids],
+        'placeholder': [photo.placeholder for photo in photos],
+        'dominant_color': [photo.dominant_color for photo in photos]
+    }
 
 @app.route('/api/photos', methods=['GET'])
 @jwt_required()
+@read_replica
+@cached_json('photos')
 def get_photos():
     user_id = int(get_jwt_identity())
     page = request.args.get('page', 1, type=int)
@@ -876,8 +1919,9 @@ def get_photos():
     end_date_str = request.args.get('end_date', '').strip()
     sort_by = request.args.get('sort_by', 'created_at')
     order = request.args.get('order', 'desc')
+    columnar = request.args.get('format') == 'columns'
     
-    query = Photo.query.filter_by(user_id=user_id)
+    query = db.session.query(*PHOTO_LIST_COLUMNS).filter(Photo.user_id == user_id)
     
     # 搜索功能
     if search:
@@ -890,7 +1934,7 @@ def get_photos():
     
     # 标签筛选
     if tag:
-        query = query.join(PhotoTag).join(Tag).filter(Tag.name == tag)
+        query = query.join(PhotoTag, PhotoTag.photo_id == Photo.id).join(Tag, Tag.id == PhotoTag.tag_id).filter(Tag.name == tag)
     
     # 日期范围筛选（基于拍摄时间）
     start_date = None
@@ -918,10 +1962,50 @@ def get_photos():
         query = query.order_by(getattr(Photo, sort_by).desc() if order == 'desc' else getattr(Photo, sort_by).asc())
     
     photos = query.paginate(page=page, per_page=per_page, error_out=False)
+    # 升级前上传的照片没有占位图时返回null（前端只显示主色调/空白），由 backfill_photos.py 离线补算
+    items = photos.items
+    tags = load_photo_tags([photo.id for photo in items])
+    
+    result = {
+        'photos': (photo_list_columns(items, tags) if columnar
+                   else [photo_list_item(photo, tags[photo.id]) for photo in items]),
+        'thumbnail_bundle_url': thumbnail_bundle_url(items),
+        'total': photos.total,
+        'page': page,
+        'per_page': per_page,
+        'pages': photos.pages
+    }
+    if columnar:
+        result['format'] = 'columns'
+    return jsonify(result)
+
+@app.route('/api/photos/semantic', methods=['GET'])
+@jwt_required()
+def semantic_search_photos():
+    """以文搜图：按文本与图片向量的相似度排序返回照片"""
+    if not semantic_search_enabled():
+        return jsonify({'error': '语义搜索未启用'}), 503
+    
+    user_id = int(get_jwt_identity())
+    query_text = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+    
+    if not query_text:
+        return jsonify({'error': '查询内容不能为空'}), 400
+    
+    try:
+        index = get_user_vector_index(user_id)
+        hits = index.search(get_encoder().encode_text(query_text), k=limit)
+    except Exception as e:
+        return jsonify({'error': f'语义搜索失败: {str(e)}'}), 500
+    
+    scores = dict(hits)
+    photos = Photo.query.filter(Photo.id.in_(list(scores.keys())), Photo.user_id == user_id).all() if hits else []
+    photos.sort(key=lambda photo: scores[photo.id], reverse=True)
+    photo_tags = load_photo_tags([photo.id for photo in photos])
     
     result = []
-    for photo in photos.items:
-        photo_tags = [tag.name for tag in photo.tags]
+    for photo in photos:
         result.append({
             'id': photo.id,
             'filename': photo.filename,
@@ -931,281 +2015,690 @@ def get_photos():
             'file_size': photo.file_size,
             'taken_at': photo.taken_at.isoformat() if photo.taken_at else None,
             'location': photo.location_name,
-            'tags': photo_tags,
-            'thumbnail_url': f'/api/thumbnail/{photo.id}'
+            'tags': photo_tags[photo.id],
+            'thumbnail_url': f'/api/thumbnail/{photo.id}',
+            'score': round(scores[photo.id], 4)
         })
     
+    return jsonify({'photos': result, 'total': len(result), 'query': query_text})
+
+@app.route('/api/photos/semantic/reindex', methods=['POST'])
+@jwt_required()
+def reindex_semantic_photos():
+    """为当前用户尚未计算向量的照片补算向量"""
+    if not semantic_search_enabled():
+        return jsonify({'error': '语义搜索未启用'}), 503
+    
+    user_id = int(get_jwt_identity())
+    batch_size = 16
+    
+    try:
+        model_name = get_encoder().model_name
+        indexed_ids = db.session.query(PhotoEmbedding.photo_id).filter(
+            PhotoEmbedding.user_id == user_id,
+            PhotoEmbedding.model_name == model_name
+        )
+        photos = Photo.query.filter(Photo.user_id == user_id, ~Photo.id.in_(indexed_ids)).all()
+        photos = [photo for photo in photos if storage.exists(photo.file_path)]
+        
+        indexed = 0
+        for start in range(0, len(photos), batch_size):
+            indexed += index_photo_embeddings(photos[start:start + batch_size])
+            db.session.commit()
+        
+        return jsonify({'message': '向量索引完成', 'indexed': indexed}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'向量索引失败: {str(e)}'}), 500
+
+@app.route('/api/photos/duplicates', methods=['GET'])
+@jwt_required()
+def get_duplicate_photos():
+    """查找重复照片：内容完全相同的分组 + 感知哈希相近的分组
+
+    只读：升级前上传、还没有哈希的照片不参与比较，数量在 pending 中返回，
+    由 backfill_photos.py 离线补算（请求中补算大量照片会超过代理的超时时间）
+    """
+    user_id = int(get_jwt_identity())
+    threshold = min(max(request.args.get('threshold', 6, type=int), 0), 15)
+    
+    rows = db.session.query(Photo.id, Photo.content_hash, Photo.perceptual_hash).filter(
+        Photo.user_id == user_id
+    ).all()
+    pending = sum(1 for _, content_hash, phash in rows if not content_hash or not phash)
+    
+    # 精确重复
+    by_content = {}
+    for photo_id, content_hash, _ in rows:
+        if content_hash:
+            by_content.setdefault(content_hash, []).append(photo_id)
+    exact_groups = [sorted(ids) for ids in by_content.values() if len(ids) > 1]
+    
+    # 近似重复（每组精确重复只保留一个代表参与聚类）
+    exact_ids = {photo_id for group in exact_groups for photo_id in group[1:]}
+    items = [(photo_id, hex_to_hash(phash)) for photo_id, _, phash in rows
+             if phash and photo_id not in exact_ids]
+    near_groups = cluster_near_duplicates(items, threshold)
+    
     return jsonify({
-        'photos': result,
-        'total': photos.total,
-        'page': page,
-        'per_page': per_page,
-        'pages': photos.pages
+        'exact': exact_groups,
+        'near': near_groups,
+        'threshold': threshold,
+        'pending': pending
     })
 
+@app.route('/api/photos/exif/rescan', methods=['POST'])
+@jwt_required()
+def rescan_photo_exif():
+    """批量重新读取已有照片的EXIF，更新拍摄时间、相机、GPS字段并补充EXIF标签"""
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+    
+    query = Photo.query.filter_by(user_id=user_id)
+    if data.get('photo_ids'):
+        try:
+            photo_ids = [int(photo_id) for photo_id in data['photo_ids']]
+        except (TypeError, ValueError):
+            return jsonify({'error': '照片ID无效'}), 400
+        query = query.filter(Photo.id.in_(photo_ids))
+    # 内容相同的照片共用一个文件，每个文件只解析一次
+    photos = query.all()
+    photos_by_path = {}
+    for photo in photos:
+        if storage.exists(photo.file_path):
+            photos_by_path.setdefault(storage.local_path(photo.file_path), []).append(photo)
+    
+    updated = 0
+    stats_changes = []
+    tags_added = []
+    try:
+        for file_path, exif_data in extract_exif_many(photos_by_path):
+            if not exif_data:
+                continue
+            for photo in photos_by_path[file_path]:
+                changed = False
+                old_camera, old_taken_at = camera_label(photo.camera_make, photo.camera_model), photo.taken_at
+                for field in ('taken_at', 'camera_make', 'camera_model', 'latitude', 'longitude'):
+                    value = exif_data.get(field)
+                    if value is not None and getattr(photo, field) != value:
+                        setattr(photo, field, value)
+                        changed = True
+                if changed:
+                    stats_changes.append((old_camera, old_taken_at, photo))
+                tag_names = generate_exif_tag_names(exif_data, width=photo.width, height=photo.height)
+                attached_ids = ensure_tags_for_photo(photo, tag_names, tag_type='auto')
+                if attached_ids:
+                    tags_added += attached_ids
+                    changed = True
+                updated += int(changed)
+        if stats_changes or tags_added:
+            update_user_stats(user_id, changed=stats_changes, tags_added=tags_added)
+        db.session.commit()
+        if updated:
+            user_data_changed(user_id)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'重新扫描失败: {str(e)}'}), 500
+    
+    return jsonify({'scanned': len(photos), 'updated': updated})
+
+# 图片接口的归属校验只需要这几列
+PHOTO_ACCESS_COLUMNS = (Photo.id, Photo.user_id, Photo.file_path, Photo.thumbnail_path, Photo.edit_version,
+                        Photo.edit_revision)
+
+def load_photo_access(photo_ids, user_id):
+    """图片接口的归属校验：返回 {照片ID: PhotoAccess}，不存在或不属于该用户的照片不在结果中
+
+    缓存命中时不查询数据库；未命中的照片一次查询加载。
+    用户自己的照片还要与用户当前代次比较，其他进程提交的编辑、删除（user_data_changed）会使代次变化
+    """
+    # 先读代次再查询数据库：查询之后发生的修改一定会使代次再变化
+    generation, _ = current_user_state(user_id)
+    records = {}
+    missing = []
+    for photo_id in photo_ids:
+        record = photo_access.get(photo_id)
+        # 他人的照片只需要知道归属（不会改变）；自己的照片代次不一致时重新加载
+        if record is None or (record.user_id == user_id and record.generation != generation):
+            missing.append(photo_id)
+        else:
+            records[photo_id] = record
+    if missing:
+        token = photo_access.token()
+        for row in db.session.query(*PHOTO_ACCESS_COLUMNS).filter(Photo.id.in_(missing)):
+            # 代次按用户区分，他人照片的记录不带代次，所有者使用时会重新加载
+            owner_generation = generation if row.user_id == user_id else None
+            records[row.id] = photo_access.put(row, token, owner_generation)
+    return {photo_id: record for photo_id, record in records.items() if record.user_id == user_id}
+
 @app.route('/api/thumbnail/<int:photo_id>')
 @jwt_required()
+@read_replica
 def get_thumbnail(photo_id):
     user_id = int(get_jwt_identity())
-    photo = Photo.query.filter_by(id=photo_id, user_id=user_id).first()
+    photo = load_photo_access([photo_id], user_id).get(photo_id)
     
     if not photo:
         return jsonify({'error': '图片不存在'}), 404
     
-    if not os.path.exists(photo.thumbnail_path):
-        return jsonify({'error': '缩略图不存在'}), 404
+    # 编辑过的照片使用渲染缓存生成的缩略图
+    if photo.edit_version:
+        try:
+            return send_file(render_photo(photo, (300, 300)))
+        except Exception as e:
+            return jsonify({'error': f'渲染失败: {str(e)}'}), 500
     
-    return send_file(photo.thumbnail_path)
+    response = send_stored_file(photo.thumbnail_path) if photo.thumbnail_path else None
+    if response is None:
+        # 文件可能已被迁移，下次请求重新从数据库读取路径
+        photo_access.invalidate([photo_id])
+        return jsonify({'error': '缩略图不存在'}), 404
+    return response
+
+# 缩略图打包缓存：(用户ID, 打包版本) -> 打包结果字节，按LRU淘汰，总大小不超过 THUMBNAIL_BUNDLE_CACHE_SIZE
+_thumbnail_bundles = OrderedDict()
+_thumbnail_bundle_bytes = 0
+_thumbnail_bundle_lock = threading.Lock()
+
+def read_thumbnail_bytes(photo):
+    """读取照片当前版本的缩略图，返回 (MIME类型, 字节)，缩略图不存在时返回None"""
+    if photo.edit_version:
+        path = render_photo(photo, (300, 300))
+    elif photo.thumbnail_path and storage.exists(photo.thumbnail_path):
+        path = storage.local_path(photo.thumbnail_path)
+    else:
+        return None
+    with open(path, 'rb') as f:
+        return mimetypes.guess_type(path)[0] or 'image/jpeg', f.read()
+
+def get_thumbnail_bundle(user_id, photos, version):
+    """按顺序打包一组照片的缩略图；同一用户、同一组照片且缩略图都没有变化时直接返回缓存结果"""
+    global _thumbnail_bundle_bytes
+    key = (user_id, version)
+    with _thumbnail_bundle_lock:
+        body = _thumbnail_bundles.get(key)
+        if body is not None:
+            _thumbnail_bundles.move_to_end(key)
+            return body
+
+    items, missing = [], []
+    for photo in photos:
+        try:
+            thumbnail = read_thumbnail_bytes(photo)
+        except Exception as e:
+            print(f"读取缩略图失败 {photo.id}: {e}")
+            thumbnail = None
+        if thumbnail is None:
+            missing.append(photo.id)
+        else:
+            items.append((photo.id, thumbnail[0], thumbnail[1]))
+    body = pack_bundle(items, version, missing)
+
+    limit = app.config['THUMBNAIL_BUNDLE_CACHE_SIZE']
+    if len(body) <= limit:
+        with _thumbnail_bundle_lock:
+            if key not in _thumbnail_bundles:
+                _thumbnail_bundles[key] = body
+                _thumbnail_bundle_bytes += len(body)
+            while _thumbnail_bundle_bytes > limit:
+                _, evicted = _thumbnail_bundles.popitem(last=False)
+                _thumbnail_bundle_bytes -= len(evicted)
+    return body
+
+def photo_bundle_entries(photos):
+    """bundle_version 的输入：(照片ID, 编辑版本, 编辑修订号, 缩略图路径)"""
+    return ((photo.id, photo.edit_version, photo.edit_revision, photo.thumbnail_path) for photo in photos)
+
+def thumbnail_bundle_url(photos):
+    """列表页的缩略图打包地址（照片ID按列表顺序，v 为打包版本，缩略图变化后地址随之改变）"""
+    if not photos:
+        return None
+    version = bundle_version(photo_bundle_entries(photos))
+    ids = ','.join(str(photo.id) for photo in photos)
+    return f'/api/thumbnails/bundle?ids={ids}&v={version}'
+
+@app.route('/api/thumbnails/bundle')
+@jwt_required()
+@read_replica
+def get_thumbnails_bundle():
+    """一次返回一页照片的缩略图（格式见 utils/thumbnail_bundle.py），代替逐张请求 /api/thumbnail/<id>"""
+    user_id = int(get_jwt_identity())
+    try:
+        photo_ids = [int(value) for value in request.args.get('ids', '').split(',') if value.strip()]
+    except ValueError:
+        return jsonify({'error': 'ids 格式错误'}), 400
+    if not photo_ids:
+        return jsonify({'error': '请指定照片ID'}), 400
+    if len(photo_ids) > app.config['THUMBNAIL_BUNDLE_MAX']:
+        return jsonify({'error': f'单次最多打包 {app.config["THUMBNAIL_BUNDLE_MAX"]} 张照片'}), 400
+
+    # 归属校验（缓存未命中的照片一次查询），不属于当前用户的ID按不存在处理
+    photo_ids = list(dict.fromkeys(photo_ids))
+    owned = load_photo_access(photo_ids, user_id)
+    photos = [owned[photo_id] for photo_id in photo_ids if photo_id in owned]
+    version = bundle_version(photo_bundle_entries(photos))
+    etag = f'"{version}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers={'ETag': etag})
+
+    body = get_thumbnail_bundle(user_id, photos, version)
+    response = Response(body, mimetype='application/octet-stream')
+    response.headers['ETag'] = etag
+    # 地址中的 v 随缩略图变化，浏览器可以放心缓存
+    response.headers['Cache-Control'] = 'private, max-age=86400'
+    return response
 
 @app.route('/api/photo/<int:photo_id>')
 @jwt_required()
+@read_replica
 def get_photo(photo_id):
     user_id = int(get_jwt_identity())
-    photo = Photo.query.filter_by(id=photo_id, user_id=user_id).first()
+    photo = load_photo_access([photo_id], user_id).get(photo_id)
     
     if not photo:
         return jsonify({'error': '图片不存在'}), 404
     
-    if not os.path.exists(photo.file_path):
+    # 编辑过的照片返回当前版本的渲染结果（原图始终保留）
+    if photo.edit_version:
+        if not storage.exists(photo.file_path):
+            photo_access.invalidate([photo_id])
+            return jsonify({'error': '图片文件不存在'}), 404
+        try:
+            return send_file(render_photo(photo))
+        except TimeoutError as e:
+            return jsonify({'error': str(e)}), 503
+        except Exception as e:
+            return jsonify({'error': f'渲染失败: {str(e)}'}), 500
+    
+    response = send_stored_file(photo.file_path)
+    if response is None:
+        photo_access.invalidate([photo_id])
         return jsonify({'error': '图片文件不存在'}), 404
+    return response
+
+@app.route('/api/photo/<int:photo_id>/url')
+@jwt_required()
+def get_photo_url(photo_id):
+    """原图的直接下载地址：对象存储返回预签名URL，本地存储返回图片接口地址"""
+    user_id = int(get_jwt_identity())
+    photo = Photo.query.filter_by(id=photo_id, user_id=user_id).first()
+    if not photo:
+        return jsonify({'error': '图片不存在'}), 404
     
-    return send_file(photo.file_path)
+    expires = app.config['PRESIGNED_URL_EXPIRES']
+    url = None if photo.edit_version else storage.presigned_url(photo.file_path, expires)
+    if url is None:
+        return jsonify({'url': f'/api/photo/{photo.id}', 'presigned': False})
+    return jsonify({'url': url, 'presigned': True, 'expires_in': expires})
+
+def set_edit_version(photo, version):
+    """切换照片的编辑版本，并按原图尺寸和操作列表更新宽高"""
+    with Image.open(storage.local_path(photo.file_path)) as probe:
+        original_size = probe.size
+    edited = int(bool(version)) - int(bool(photo.edit_version))
+    photo.edit_version = version
+    photo.edit_revision = (photo.edit_revision or 0) + 1
+    photo.width, photo.height = edit_size_chain(original_size, get_edit_operations(photo, version))[-1]
+    invalidate_photo_embeddings([photo])
+    if edited:
+        update_user_stats(photo.user_id, edited=edited)
+    db.session.commit()
+    photo_access.invalidate([photo.id])
+    user_data_changed(photo.user_id)
+    refresh_photo_embeddings([photo])
+
+def edit_history_response(photo):
+    edits = PhotoEdit.query.filter_by(photo_id=photo.id).order_by(PhotoEdit.version).all()
+    return {
+        'photo_id': photo.id,
+        'edit_version': photo.edit_version or 0,
+        'latest_version': edits[-1].version if edits else 0,
+        'width': photo.width,
+        'height': photo.height,
+        'edits': [{
+            'version': edit.version,
+            'operation': json.loads(edit.operation),
+            'created_at': edit.created_at.isoformat() if edit.created_at else None
+        } for edit in edits]
+    }
+
+def plan_photo_edit(photo, operation):
+    """在当前版本上追加一个操作，返回 (完整操作列表, 各步骤尺寸)"""
+    operations = get_edit_operations(photo) + [operation]
+    with Image.open(storage.local_path(photo.file_path)) as probe:
+        sizes = edit_size_chain(probe.size, operations)
+    return operations, sizes
+
+def record_photo_edit(photo, operation, size):
+    """记录一次编辑（不提交）：丢弃可重做的后续版本，新增操作并更新版本号和尺寸"""
+    current_version = photo.edit_version or 0
+    PhotoEdit.query.filter(PhotoEdit.photo_id == photo.id, PhotoEdit.version > current_version).delete()
+    db.session.add(PhotoEdit(
+        photo_id=photo.id,
+        version=current_version + 1,
+        operation=json.dumps(operation, ensure_ascii=False)
+    ))
+    photo.edit_version = current_version + 1
+    photo.edit_revision = (photo.edit_revision or 0) + 1
+    photo.width, photo.height = size
+    invalidate_photo_embeddings([photo])
+    if current_version == 0:
+        update_user_stats(photo.user_id, edited=1)
 
 @app.route('/api/photo/<int:photo_id>/edit', methods=['POST'])
 @jwt_required()
 def edit_photo(photo_id):
+    """记录一次编辑操作（非破坏性），渲染在访问照片时按需生成并缓存"""
     user_id = int(get_jwt_identity())
     photo = Photo.query.filter_by(id=photo_id, user_id=user_id).first()
     
     if not photo:
         return jsonify({'error': '图片不存在'}), 404
     
-    data = request.get_json()
+    data = request.get_json() or {}
     
     try:
-        # 打开图片
-        with Image.open(photo.file_path) as img:
-            # 确保图片是RGB模式（对于JPEG格式必须）
-            if img.mode in ('RGBA', 'LA', 'P'):
-                # 如果有透明通道，转换为RGB（白色背景）
-                if img.mode == 'RGBA':
-                    background = Image.new('RGB', img.size, (255, 255, 255))
-                    background.paste(img, mask=img.split()[3])  # 使用alpha通道作为mask
-                    img = background
-                else:
-                    img = img.convert('RGB')
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # 裁剪
-            if 'crop' in data:
-                crop_data = data['crop']
-                try:
-                    # 确保裁剪坐标在图片范围内
-                    x = max(0, int(crop_data.get('x', 0)))
-                    y = max(0, int(crop_data.get('y', 0)))
-                    width = int(crop_data.get('width', 0))
-                    height = int(crop_data.get('height', 0))
-                    
-                    # 确保裁剪区域不超出图片边界
-                    width = min(width, img.width - x)
-                    height = min(height, img.height - y)
-                    
-                    if width > 0 and height > 0 and x < img.width and y < img.height:
-                        img = img.crop((
-                            x,
-                            y,
-                            x + width,
-                            y + height
-                        ))
-                        print(f"裁剪成功: ({x}, {y}) -> ({x+width}, {y+height}), 新尺寸: {img.size}")
-                    else:
-                        print(f"裁剪参数无效: x={x}, y={y}, width={width}, height={height}, 图片尺寸={img.size}")
-                except Exception as e:
-                    print(f"裁剪处理失败: {e}")
-                    import traceback
-                    traceback.print_exc()
-
-            # 旋转（按 90 度步进）
-            rotation_deg = int(data.get('rotation_deg', 0)) % 360
-            if rotation_deg != 0:
-                # PIL 的 rotate 正角度为逆时针，这里保持与前端一致（顺时针为正）
-                img = img.rotate(-rotation_deg, expand=True)
-
-            # 翻转
-            if data.get('flip_horizontal'):
-                img = img.transpose(Image.FLIP_LEFT_RIGHT)
-            if data.get('flip_vertical'):
-                img = img.transpose(Image.FLIP_TOP_BOTTOM)
-
-            # 色调调整前确保图片是RGB模式
-            if img.mode != 'RGB':
-                if img.mode == 'RGBA':
-                    background = Image.new('RGB', img.size, (255, 255, 255))
-                    background.paste(img, mask=img.split()[3] if len(img.split()) > 3 else None)
-                    img = background
-                else:
-                    img = img.convert('RGB')
-            
-            # 使用像素级处理，与前端算法保持一致
-            # 将图片转换为numpy数组进行像素级操作
-            img_array = np.array(img, dtype=np.float32)
-            
-            # 应用亮度调整（与前端算法一致）
-            if 'brightness' in data:
-                brightness_value = float(data['brightness'])
-                if brightness_value != 0:
-                    img_array[:, :, :3] = np.clip(img_array[:, :, :3] + brightness_value, 0, 255)
-            
-            # 应用对比度调整（与前端算法一致）
-            if 'contrast' in data:
-                contrast_value = float(data['contrast'])
-                if contrast_value != 0:
-                    contrast_factor = (contrast_value + 100) / 100.0
-                    img_array[:, :, :3] = np.clip((img_array[:, :, :3] - 128) * contrast_factor + 128, 0, 255)
-            
-            # 应用饱和度调整（与前端算法一致）
-            if 'saturation' in data:
-                saturation_value = float(data['saturation'])
-                if saturation_value != 0:
-                    saturation_factor = (saturation_value + 100) / 100.0
-                    # 计算灰度值（使用与前端相同的权重）
-                    gray = 0.299 * img_array[:, :, 0] + 0.587 * img_array[:, :, 1] + 0.114 * img_array[:, :, 2]
-                    gray = np.stack([gray, gray, gray], axis=2)
-                    # 应用饱和度调整
-                    img_array[:, :, :3] = np.clip(gray + (img_array[:, :, :3] - gray) * saturation_factor, 0, 255)
-            
-            # 应用色相调整（与前端算法一致，使用HSL）
-            if 'hue' in data:
-                hue_shift = float(data['hue'])
-                if hue_shift != 0:
-                    try:
-                        # RGB转HSL（与前端算法一致）
-                        def rgb_to_hsl(rgb_array):
-                            """将RGB数组转换为HSL"""
-                            r, g, b = rgb_array[:, :, 0] / 255.0, rgb_array[:, :, 1] / 255.0, rgb_array[:, :, 2] / 255.0
-                            max_val = np.maximum(np.maximum(r, g), b)
-                            min_val = np.minimum(np.minimum(r, g), b)
-                            delta = max_val - min_val
-                            
-                            l = (max_val + min_val) / 2.0
-                            s = np.zeros_like(l)
-                            h = np.zeros_like(l)
-                            
-                            # 计算饱和度
-                            mask = delta != 0
-                            s[mask] = np.where(l[mask] > 0.5, delta[mask] / (2 - max_val[mask] - min_val[mask]), 
-                                               delta[mask] / (max_val[mask] + min_val[mask]))
-                            
-                            # 计算色相
-                            mask_r = (delta != 0) & (max_val == r)
-                            mask_g = (delta != 0) & (max_val == g)
-                            mask_b = (delta != 0) & (max_val == b)
-                            
-                            h[mask_r] = ((g[mask_r] - b[mask_r]) / delta[mask_r]) % 6
-                            h[mask_g] = ((b[mask_g] - r[mask_g]) / delta[mask_g]) + 2
-                            h[mask_b] = ((r[mask_b] - g[mask_b]) / delta[mask_b]) + 4
-                            
-                            h = h / 6.0
-                            return np.stack([h, s, l], axis=2)
-                        
-                        def hsl_to_rgb(hsl_array):
-                            """将HSL数组转换为RGB"""
-                            h, s, l = hsl_array[:, :, 0], hsl_array[:, :, 1], hsl_array[:, :, 2]
-                            
-                            def hue2rgb(p, q, t):
-                                # 与前端算法完全一致
-                                t = np.where(t < 0, t + 1, t)
-                                t = np.where(t > 1, t - 1, t)
-                                result = np.zeros_like(t)
-                                # 分段处理，与前端hue2rgb函数一致
-                                mask1 = t < 1/6
-                                mask2 = (t >= 1/6) & (t < 1/2)
-                                mask3 = (t >= 1/2) & (t < 2/3)
-                                mask4 = t >= 2/3
-                                result[mask1] = p[mask1] + (q[mask1] - p[mask1]) * 6 * t[mask1]
-                                result[mask2] = q[mask2]
-                                result[mask3] = p[mask3] + (q[mask3] - p[mask3]) * (2/3 - t[mask3]) * 6
-                                result[mask4] = p[mask4]  # t >= 2/3 的情况
-                                return result
-                            
-                            r = np.zeros_like(l)
-                            g = np.zeros_like(l)
-                            b = np.zeros_like(l)
-                            
-                            mask = s != 0
-                            q = np.where(l[mask] < 0.5, l[mask] * (1 + s[mask]), l[mask] + s[mask] - l[mask] * s[mask])
-                            p = 2 * l[mask] - q
-                            
-                            r[mask] = hue2rgb(p, q, h[mask] + 1/3)
-                            g[mask] = hue2rgb(p, q, h[mask])
-                            b[mask] = hue2rgb(p, q, h[mask] - 1/3)
-                            
-                            # 无饱和度的情况
-                            r[~mask] = l[~mask]
-                            g[~mask] = l[~mask]
-                            b[~mask] = l[~mask]
-                            
-                            return np.stack([r * 255, g * 255, b * 255], axis=2)
-                        
-                        # 转换为HSL
-                        hsl_array = rgb_to_hsl(img_array)
-                        
-                        # 应用色相偏移
-                        hsl_array[:, :, 0] = (hsl_array[:, :, 0] + hue_shift / 360.0) % 1.0
-                        
-                        # 转换回RGB
-                        img_array[:, :, :3] = hsl_to_rgb(hsl_array)
-                        
-                    except Exception as e:
-                        print(f"色相调整失败: {e}")
-                        import traceback
-                        traceback.print_exc()
-            
-            # 转换回PIL Image
-            img_array = np.clip(img_array, 0, 255).astype(np.uint8)
-            img = Image.fromarray(img_array, 'RGB')
+        operation = normalize_operation(data)
+        if not operation:
+            # 未知或全部为默认值的参数不产生新版本（否则会丢弃可重做的版本并重新编码）
+            return jsonify({'error': '没有有效的编辑操作'}), 400
+        current_version = photo.edit_version or 0
+        operations, sizes = plan_photo_edit(photo, operation)
+    except Exception as e:
+        return jsonify({'error': f'编辑失败: {str(e)}'}), 400
+    
+    # 按渲染过程中最大的中间尺寸预估内存，超出单次预算直接拒绝
+    if max(estimate_edit_memory(size) for size in sizes) > app.config['EDIT_MEMORY_BUDGET']:
+        return jsonify({'error': '图片过大，超出编辑内存限制'}), 413
+    if sizes[-1][0] <= 0 or sizes[-1][1] <= 0:
+        return jsonify({'error': f'无效的图片尺寸: {sizes[-1]}'}), 400
+    
+    try:
+        # 在撤销后的版本上继续编辑时，丢弃可重做的后续版本
+        remove_renders(photo, current_version + 1)
+        record_photo_edit(photo, operation, sizes[-1])
+        db.session.commit()
+        photo_access.invalidate([photo.id])
+        user_data_changed(photo.user_id)
+        print(f"记录编辑: 照片 {photo.id} 版本 {photo.edit_version}, 操作: {operation}")
+        refresh_photo_embeddings([photo])
+        
+        return jsonify({'message': '编辑成功', **edit_history_response(photo)}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'编辑失败: {str(e)}'}), 500
 
-            # 确保最终图片是RGB模式（在保存前再次确认）
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # 验证图片尺寸有效
-            if img.size[0] <= 0 or img.size[1] <= 0:
-                raise ValueError(f"无效的图片尺寸: {img.size}")
-
-            # 保存编辑后的图片
-            # 根据文件扩展名确定保存格式
-            file_ext = os.path.splitext(photo.file_path)[1].lower()
-            save_kwargs = {}
-            if file_ext in ['.jpg', '.jpeg']:
-                save_kwargs = {'quality': 95, 'optimize': True, 'format': 'JPEG'}
-            elif file_ext == '.png':
-                save_kwargs = {'optimize': True, 'format': 'PNG'}
-            else:
-                # 默认使用JPEG格式
-                save_kwargs = {'quality': 95, 'optimize': True, 'format': 'JPEG'}
-            
+def record_batch_edits(user_id, operation, jobs):
+    """在一个事务中记录批量编辑中渲染成功的照片，返回 (冲突的照片ID列表, 汇总)
+
+    照片加行锁重新读取：渲染期间被单张编辑/撤销修改过的照片（版本或修订号变化）不再记录
+    （按规划时的版本渲染的结果已失效），删除本次的渲染结果并作为失败返回
+    """
+    conflicts = []
+    try:
+        photo_ids = [job['photo_id'] for job in jobs]
+        current = {
+            photo.id: photo for photo in
+            Photo.query.filter(Photo.id.in_(photo_ids)).with_for_update().populate_existing().all()
+        } if photo_ids else {}
+        recorded = []
+        for job in jobs:
+            photo = current.get(job['photo_id'])
+            if photo is None or ((photo.edit_version or 0), (photo.edit_revision or 0)) != job['base']:
+                conflicts.append(job['photo_id'])
+                # 渲染结果的文件名带有规划时的修订号，不会与其他请求的渲染重名
+                if os.path.exists(job['output_path']):
+                    os.remove(job['output_path'])
+                continue
+            record_photo_edit(photo, operation, job['size'])
+            prune_renders(photo, photo.edit_version, photo.edit_revision)
+            recorded.append(photo)
+        db.session.commit()
+        if recorded:
+            photo_access.invalidate([photo.id for photo in recorded])
+            user_data_changed(user_id)
+            # 完整尺寸的渲染已生成，直接按新版本计算向量
+            refresh_photo_embeddings(recorded)
+        return conflicts, {'done': True, 'succeeded': len(recorded)}
+    except Exception as e:
+        db.session.rollback()
+        for job in jobs:
+            if os.path.exists(job['output_path']):
+                os.remove(job['output_path'])
+        return conflicts, {'done': True, 'succeeded': 0, 'error': f'保存失败: {str(e)}'}
+
+@app.route('/api/photos/edit', methods=['POST'])
+@jwt_required()
+def batch_edit_photos():
+    """对多张照片应用同一编辑，渲染分发到进程池并行执行
+
+    返回 application/x-ndjson 流：每张照片完成后输出一行进度，全部完成后在同一事务中
+    记录编辑并更新尺寸，最后输出汇总行。客户端中途断开时仍会等待渲染完成并记录编辑
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+    
+    photo_ids = data.get('photo_ids') or []
+    if not isinstance(photo_ids, list) or not photo_ids:
+        return jsonify({'error': '请提供照片ID列表'}), 400
+    if len(photo_ids) > app.config['BATCH_EDIT_MAX_PHOTOS']:
+        return jsonify({'error': f"一次最多编辑 {app.config['BATCH_EDIT_MAX_PHOTOS']} 张照片"}), 400
+    
+    try:
+        photo_ids = list(dict.fromkeys(int(photo_id) for photo_id in photo_ids))
+        operation = normalize_operation(data)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'参数无效: {str(e)}'}), 400
+    # 所有照片共用同一操作：为空时每张照片都不会产生变化
+    if not operation:
+        return jsonify({'error': '没有有效的编辑操作'}), 400
+    
+    photos = {photo.id: photo for photo in Photo.query.filter(Photo.user_id == user_id, Photo.id.in_(photo_ids)).all()}
+    
+    # 先在请求进程中规划每张照片的渲染任务，无效的照片直接记为失败
+    jobs, failures = [], []
+    for photo_id in photo_ids:
+        photo = photos.get(photo_id)
+        if not photo:
+            failures.append({'photo_id': photo_id, 'status': 'error', 'error': '图片不存在'})
+            continue
+        try:
+            operations, sizes = plan_photo_edit(photo, operation)
+        except Exception as e:
+            failures.append({'photo_id': photo_id, 'status': 'error', 'error': f'编辑失败: {str(e)}'})
+            continue
+        required_memory = max(estimate_edit_memory(size) for size in sizes)
+        if required_memory > app.config['EDIT_MEMORY_BUDGET']:
+            failures.append({'photo_id': photo_id, 'status': 'error', 'error': '图片过大，超出编辑内存限制'})
+            continue
+        version = (photo.edit_version or 0) + 1
+        # 撤销后丢弃的版本不会再被使用，清除其渲染缓存
+        remove_renders(photo, version)
+        os.makedirs(render_dir(photo), exist_ok=True)
+        jobs.append({
+            'photo_id': photo.id,
+            'file_path': photo.file_path,
+            'base': (version - 1, photo.edit_revision or 0),
+            'operations': operations,
+            'size': sizes[-1],
+            'memory': required_memory,
+            # 记录编辑时修订号加一，按记录后的版本和修订号命名
+            'output_path': render_path(photo, version, (photo.edit_revision or 0) + 1)
+        })
+    
+    # 渲染期间不保持数据库事务（记录编辑时重新加锁读取照片）
+    db.session.commit()
+    
+    executor = get_edit_executor()
+    progress = queue.Queue()
+    
+    def submit_jobs():
+        # 按内存额度逐个提交，额度不足时等待先前的任务完成
+        for job in jobs:
+            if not edit_memory_pool.acquire(job['memory'], timeout=60):
+                progress.put((job, None, TimeoutError('服务器繁忙，请稍后重试')))
+                continue
             try:
-                img.save(photo.file_path, **save_kwargs)
-                print(f"图片保存成功: {photo.file_path}, 尺寸: {img.size}, 模式: {img.mode}")
+                # 子进程的工作目录可能不同，传入绝对路径
+                future = executor.submit(render_file, os.path.abspath(storage.local_path(job['file_path'])),
+                                         job['operations'], os.path.abspath(job['output_path']))
             except Exception as e:
-                print(f"保存图片失败: {e}")
-                import traceback
-                traceback.print_exc()
-                raise
+                edit_memory_pool.release(job['memory'])
+                progress.put((job, None, e))
+                continue
+            
+            def on_done(future, job=job):
+                edit_memory_pool.release(job['memory'])
+                progress.put((job, future, None))
+            future.add_done_callback(on_done)
+    
+    threading.Thread(target=submit_jobs, daemon=True).start()
+    total = len(photo_ids)
+    
+    def generate():
+        completed = 0
+        outcomes = []
+        try:
+            for failure in failures:
+                completed += 1
+                yield json.dumps({**failure, 'completed': completed, 'total': total}, ensure_ascii=False) + '\n'
+            
+            while len(outcomes) < len(jobs):
+                job, future, error = progress.get()
+                if error is None:
+                    error = future.exception()
+                outcomes.append((job, error))
+                completed += 1
+                if error is None:
+                    line = {'photo_id': job['photo_id'], 'status': 'done',
+                            'width': job['size'][0], 'height': job['size'][1]}
+                else:
+                    line = {'photo_id': job['photo_id'], 'status': 'error', 'error': f'编辑失败: {str(error)}'}
+                yield json.dumps({**line, 'completed': completed, 'total': total}, ensure_ascii=False) + '\n'
+        finally:
+            # 客户端断开时（生成器被关闭）同样执行：等待剩余渲染完成，记录已完成的编辑
+            while len(outcomes) < len(jobs):
+                job, future, error = progress.get()
+                outcomes.append((job, error if error is not None else future.exception()))
+            conflicts, summary = record_batch_edits(user_id, operation, [job for job, error in outcomes if error is None])
+            summary['failed'] = total - summary['succeeded']
+            print(f"批量编辑完成: {summary}")
+        
+        for photo_id in conflicts:
+            line = {'photo_id': photo_id, 'status': 'error', 'error': '编辑失败: 照片在批量编辑期间已被修改'}
+            yield json.dumps({**line, 'completed': completed, 'total': total}, ensure_ascii=False) + '\n'
+        yield json.dumps(summary, ensure_ascii=False) + '\n'
+    
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    # nginx 默认缓冲代理响应，进度行会积压到结束才一起发出
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/photo/<int:photo_id>/preview', methods=['POST'])
+@jwt_required()
+def preview_photo_edit(photo_id):
+    """在预览代理图上应用编辑参数，返回压缩后的低分辨率JPEG（不记录编辑）"""
+    user_id = int(get_jwt_identity())
+    photo = Photo.query.filter_by(id=photo_id, user_id=user_id).first()
+    
+    if not photo:
+        return jsonify({'error': '图片不存在'}), 404
+    
+    data = request.get_json() or {}
+    try:
+        operation = normalize_operation(data)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'参数无效: {str(e)}'}), 400
+    
+    try:
+        proxy = get_preview_proxy(photo)
+    except TimeoutError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': f'预览失败: {str(e)}'}), 500
+    
+    # 裁剪坐标基于当前版本的完整尺寸，按比例换算到代理图
+    if 'crop' in operation and photo.width:
+        scale = proxy.width / photo.width
+        operation['crop'] = {key: int(round(value * scale)) for key, value in operation['crop'].items()}
+    
+    # 调色在图像上就地进行，使用副本以保持缓存的代理图不变
+    img = apply_operation(proxy.copy(), operation)
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=app.config['PREVIEW_QUALITY'])
+    buffer.seek(0)
+    
+    response = send_file(buffer, mimetype='image/jpeg')
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
-            # 重新生成缩略图
-            generate_thumbnail(photo.file_path, photo.thumbnail_path)
+@app.route('/api/photo/<int:photo_id>/edits', methods=['GET'])
+@jwt_required()
+def get_photo_edits(photo_id):
+    user_id = int(get_jwt_identity())
+    photo = Photo.query.filter_by(id=photo_id, user_id=user_id).first()
+    
+    if not photo:
+        return jsonify({'error': '图片不存在'}), 404
+    
+    return jsonify(edit_history_response(photo))
 
-            # 更新数据库中的尺寸信息
-            photo.width, photo.height = img.size
-            db.session.commit()
+@app.route('/api/photo/<int:photo_id>/undo', methods=['POST'])
+@jwt_required()
+def undo_photo_edit(photo_id):
+    user_id = int(get_jwt_identity())
+    photo = Photo.query.filter_by(id=photo_id, user_id=user_id).first()
+    
+    if not photo:
+        return jsonify({'error': '图片不存在'}), 404
+    
+    if not photo.edit_version:
+        return jsonify({'error': '没有可撤销的编辑'}), 400
+    
+    try:
+        set_edit_version(photo, photo.edit_version - 1)
+        return jsonify({'message': '撤销成功', **edit_history_response(photo)})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'撤销失败: {str(e)}'}), 500
 
-        return jsonify({'message': '编辑成功'}), 200
-        
+@app.route('/api/photo/<int:photo_id>/redo', methods=['POST'])
+@jwt_required()
+def redo_photo_edit(photo_id):
+    user_id = int(get_jwt_identity())
+    photo = Photo.query.filter_by(id=photo_id, user_id=user_id).first()
+    
+    if not photo:
+        return jsonify({'error': '图片不存在'}), 404
+    
+    next_version = (photo.edit_version or 0) + 1
+    if not PhotoEdit.query.filter_by(photo_id=photo.id, version=next_version).first():
+        return jsonify({'error': '没有可重做的编辑'}), 400
+    
+    try:
+        set_edit_version(photo, next_version)
+        return jsonify({'message': '重做成功', **edit_history_response(photo)})
     except Exception as e:
-        return jsonify({'error': f'编辑失败: {str(e)}'}), 500
+        db.session.rollback()
+        return jsonify({'error': f'重做失败: {str(e)}'}), 500
+
+@app.route('/api/photo/<int:photo_id>/revert', methods=['POST'])
+@jwt_required()
+def revert_photo_edit(photo_id):
+    """恢复原图（编辑记录保留，可通过重做恢复）"""
+    user_id = int(get_jwt_identity())
+    photo = Photo.query.filter_by(id=photo_id, user_id=user_id).first()
+    
+    if not photo:
+        return jsonify({'error': '图片不存在'}), 404
+    
+    try:
+        set_edit_version(photo, 0)
+        return jsonify({'message': '已恢复原图', **edit_history_response(photo)})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'恢复失败: {str(e)}'}), 500
 
 @app.route('/api/photo/<int:photo_id>', methods=['DELETE'])
 @jwt_required()
@@ -1217,16 +2710,21 @@ def delete_photo(photo_id):
         return jsonify({'error': '图片不存在'}), 404
     
     try:
-        # 删除文件
-        if os.path.exists(photo.file_path):
-            os.remove(photo.file_path)
-        
-        if os.path.exists(photo.thumbnail_path):
-            os.remove(photo.thumbnail_path)
+        remove_renders(photo)
         
         # 删除数据库记录
+        remove_photo_embedding(photo)
+        PhotoEdit.query.filter_by(photo_id=photo.id).delete()
+        PhotoEmbedding.query.filter_by(photo_id=photo.id).delete()
+        tag_ids = [tag.id for tag in photo.tags]
         db.session.delete(photo)
+        update_user_stats(user_id, removed=[photo], tags_removed=tag_ids)
         db.session.commit()
+        photo_access.invalidate([photo.id])
+        user_data_changed(user_id)
+        
+        # 删除文件（其他照片仍引用相同内容时保留）
+        release_photo_files(photo.file_path, photo.thumbnail_path)
         
         return jsonify({'message': '删除成功'}), 200
         
@@ -1235,6 +2733,8 @@ def delete_photo(photo_id):
 
 @app.route('/api/tags', methods=['GET'])
 @jwt_required()
+@read_replica
+@cached_json('tags')
 def get_tags():
     user_id = get_jwt_identity()
     
@@ -1251,6 +2751,56 @@ def get_tags():
     
     return jsonify({'tags': result})
 
+@app.route('/api/stats', methods=['GET'])
+@jwt_required()
+@cached_json('stats')
+def get_stats():
+    """仪表盘统计：直接读取增量维护的统计行，不在每次请求时汇总照片表"""
+    user_id = int(get_jwt_identity())
+    limit = min(max(request.args.get('recent', 6, type=int), 0), RECENT_PHOTOS_KEPT)
+    
+    # 只读：统计行由写操作维护，这里不创建也不修改（缺失时临时汇总，不加入会话）
+    stats = db.session.get(UserStats, user_id)
+    if stats is None:
+        stats = build_user_stats(user_id)
+    first_taken_at, last_taken_at = stats.first_taken_at, stats.last_taken_at
+    if stats.date_range_stale:
+        first_taken_at, last_taken_at = db.session.query(
+            func.min(Photo.taken_at), func.max(Photo.taken_at)
+        ).filter(Photo.user_id == user_id).one()
+    
+    recent_ids = json.loads(stats.recent_photo_ids or '[]')[:limit]
+    # 删除照片后最近列表可能不足，按ID倒序补齐
+    if len(recent_ids) < min(limit, stats.photo_count):
+        recent_ids = [photo_id for (photo_id,) in db.session.query(Photo.id).filter(
+            Photo.user_id == user_id
+        ).order_by(Photo.id.desc()).limit(limit)]
+    photos_by_id = {
+        photo.id: photo for photo in
+        db.session.query(*PHOTO_LIST_COLUMNS).filter(Photo.id.in_(recent_ids)).all()
+    } if recent_ids else {}
+    recent_tags = load_photo_tags(list(photos_by_id))
+    
+    cameras = json.loads(stats.camera_counts or '{}')
+    return jsonify({
+        'photo_count': stats.photo_count,
+        'total_size': stats.total_size,
+        'tag_count': len(json.loads(stats.tag_counts or '{}')),
+        'edited_count': stats.edited_count,
+        'cameras': [
+            {'camera': camera, 'count': count}
+            for camera, count in sorted(cameras.items(), key=lambda item: (-item[1], item[0]))
+        ],
+        'date_range': {
+            'first_taken_at': first_taken_at.isoformat() if first_taken_at else None,
+            'last_taken_at': last_taken_at.isoformat() if last_taken_at else None
+        },
+        'recent_photos': [
+            photo_list_item(photos_by_id[photo_id], recent_tags[photo_id])
+            for photo_id in recent_ids if photo_id in photos_by_id
+        ]
+    })
+
 @app.route('/api/photo/<int:photo_id>/tags', methods=['POST', 'DELETE'])
 @jwt_required()
 def manage_photo_tags(photo_id):
@@ -1269,6 +2819,7 @@ def manage_photo_tags(photo_id):
         return jsonify({'error': '标签不能为空'}), 400
 
     try:
+        added_ids, removed_ids = [], []
         if request.method == 'POST':
             # 添加标签（自定义）
             for tag_name in tags:
@@ -1281,15 +2832,19 @@ def manage_photo_tags(photo_id):
                 exists = PhotoTag.query.filter_by(photo_id=photo.id, tag_id=tag.id).first()
                 if not exists:
                     db.session.add(PhotoTag(photo_id=photo.id, tag_id=tag.id))
+                    added_ids.append(tag.id)
 
         elif request.method == 'DELETE':
             # 删除与该图片的标签关系（不删除全局标签）
             for tag_name in tags:
                 tag = Tag.query.filter_by(name=tag_name).first()
-                if tag:
-                    PhotoTag.query.filter_by(photo_id=photo.id, tag_id=tag.id).delete()
+                if tag and PhotoTag.query.filter_by(photo_id=photo.id, tag_id=tag.id).delete():
+                    removed_ids.append(tag.id)
 
+        if added_ids or removed_ids:
+            update_user_stats(user_id, tags_added=added_ids, tags_removed=removed_ids)
         db.session.commit()
+        user_data_changed(photo.user_id)
 
         # 返回最新标签
         return jsonify({
@@ -1341,9 +2896,10 @@ def analyze_photo(photo_id):
     
     try:
         # 使用AI分析图片
-        ai_tags = analyze_image_with_ai(photo.file_path)
+        ai_tags = analyze_image_with_ai(storage.local_path(photo.file_path))
         
         # 添加AI标签到数据库
+        added_ids = []
         for tag_name in ai_tags:
             tag = Tag.query.filter_by(name=tag_name).first()
             if not tag:
@@ -1360,8 +2916,12 @@ def analyze_photo(photo_id):
             if not existing_relation:
                 photo_tag = PhotoTag(photo_id=photo.id, tag_id=tag.id)
                 db.session.add(photo_tag)
+                added_ids.append(tag.id)
         
+        if added_ids:
+            update_user_stats(photo.user_id, tags_added=added_ids)
         db.session.commit()
+        user_data_changed(photo.user_id)
         
         return jsonify({
             'message': 'AI分析完成',
@@ -1379,6 +2939,8 @@ def analyze_photo(photo_id):
 
 @app.route('/api/user', methods=['GET'])
 @jwt_required()
+@read_replica
+@cached_json('user')
 def get_user():
     user_id = int(get_jwt_identity())
     user = User.query.get(user_id)
@@ -1394,7 +2956,14 @@ def get_user():
         }
     })
 
+@app.route('/api/cache/stats', methods=['GET'])
+@jwt_required()
+def get_cache_stats():
+    """响应缓存的命中率统计（按接口）"""
+    return jsonify(response_cache.stats())
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        upgrade_schema()
     app.run(debug=True, host='0.0.0.0', port=BACKEND_PORT)
@@ -8,7 +8,9 @@ const PhotoItem = ({
   onSelect, 
   onClick, 
   onEdit, 
-  viewMode = 'grid' 
+  viewMode = 'grid',
+  thumbnailSrc,
+  thumbnailPending = false
 }) => {
   const formatFileSize = (bytes) => {
     if (bytes === 0) return '0 B';
@@ -43,6 +45,17 @@ const PhotoItem = ({
     return t ? `?token=${t}` : '';
   })();
 
+  // 缩略图优先使用列表页打包获取的结果，等待打包结果期间不单独请求
+  const imageSrc = thumbnailSrc || (thumbnailPending ? undefined : `/api/thumbnail/${photo.id}${tokenParam}`);
+
+  // 缩略图加载完成前显示列表接口内嵌的低清占位图和主色调
+  const placeholderStyle = {
+    backgroundColor: photo.dominant_color || undefined,
+    backgroundImage: photo.placeholder ? `url(${photo.placeholder})` : undefined,
+    backgroundSize: 'cover',
+    backgroundPosition: 'center'
+  };
+
   if (viewMode === 'list') {
     return (
       <div className={`photo-item list ${isSelected ? 'selected' : ''}`}>
@@ -55,9 +68,9 @@ const PhotoItem = ({
           />
         </div>
         
-        <div className="photo-thumbnail" onClick={handleClick}>
+        <div className="photo-thumbnail" onClick={handleClick} style={placeholderStyle}>
           <img 
-            src={`/api/thumbnail/${photo.id}${tokenParam}`} 
+            src={imageSrc} 
             alt={photo.original_filename}
             loading="lazy"
           />
@@ -140,9 +153,9 @@ const PhotoItem = ({
         />
       </div>
       
-      <div className="photo-thumbnail" onClick={handleClick}>
+      <div className="photo-thumbnail" onClick={handleClick} style={placeholderStyle}>
         <img 
-          src={`/api/thumbnail/${photo.id}${tokenParam}`} 
+          src={imageSrc} 
           alt={photo.original_filename}
           loading="lazy"
         />
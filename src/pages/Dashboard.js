@@ -25,22 +25,16 @@ const Dashboard = () => {
     try {
       setLoading(true);
       
-      // 获取统计数据
+      // 统计数据和最近上传的照片（服务端增量维护，一次请求）
       const commonHeaders = { headers: { 'Authorization': `Bearer ${localStorage.getItem('token') || ''}` } };
-      const statsResponse = await axios.get('/api/photos?page=1&per_page=1', commonHeaders);
-      const photosResponse = await axios.get('/api/photos?page=1&per_page=6', commonHeaders);
-      const tagsResponse = await axios.get('/api/tags', commonHeaders);
-      
-      const totalPhotos = statsResponse.data.total;
-      const totalSize = statsResponse.data.photos.reduce((sum, photo) => sum + photo.file_size, 0);
-      const recentPhotos = photosResponse.data.photos;
-      const totalTags = tagsResponse.data.tags.length;
+      const statsResponse = await axios.get('/api/stats?recent=6', commonHeaders);
+      const recentPhotos = statsResponse.data.recent_photos;
       
       setStats({
-        totalPhotos,
-        totalSize,
+        totalPhotos: statsResponse.data.photo_count,
+        totalSize: statsResponse.data.total_size,
         recentPhotos: recentPhotos.length,
-        totalTags
+        totalTags: statsResponse.data.tag_count
       });
       
       setRecentPhotos(recentPhotos);
@@ -178,7 +172,15 @@ const Dashboard = () => {
             <div className="photos-grid">
               {recentPhotos.map((photo) => (
                 <div key={photo.id} className="photo-item">
-                  <div className="photo-thumbnail">
+                  <div
+                    className="photo-thumbnail"
+                    style={{
+                      backgroundColor: photo.dominant_color || undefined,
+                      backgroundImage: photo.placeholder ? `url(${photo.placeholder})` : undefined,
+                      backgroundSize: 'cover',
+                      backgroundPosition: 'center'
+                    }}
+                  >
                     <img 
                       src={getThumbnailSrc(photo.id)} 
                       alt={photo.original_filename}
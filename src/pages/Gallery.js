@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { FiSearch, FiFilter, FiGrid, FiList, FiPlay, FiTrash2, FiEdit3, FiEye } from 'react-icons/fi';
 import axios from 'axios';
@@ -7,6 +7,19 @@ import ImageGallery from '../components/ImageGallery';
 import Slideshow from '../components/Slideshow';
 import './Gallery.css';
 
+// 解析 /api/thumbnails/bundle 的响应：4字节头部长度 + JSON头部 + 依次拼接的缩略图
+const parseThumbnailBundle = (buffer) => {
+  const headerLength = new DataView(buffer).getUint32(0);
+  const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength)));
+  const dataStart = 4 + headerLength;
+  const urls = {};
+  header.items.forEach((item) => {
+    const blob = new Blob([buffer.slice(dataStart + item.offset, dataStart + item.offset + item.length)], { type: item.mime });
+    urls[item.id] = URL.createObjectURL(blob);
+  });
+  return urls;
+};
+
 const Gallery = () => {
   const [photos, setPhotos] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -27,9 +40,38 @@ const Gallery = () => {
   const [totalPhotos, setTotalPhotos] = useState(0);
   const [startDate, setStartDate] = useState('');
   const [endDate, setEndDate] = useState('');
+  // 打包获取的缩略图：照片ID -> blob URL；pendingThumbnails 中的照片等待打包结果，不单独请求
+  const [thumbnailUrls, setThumbnailUrls] = useState({});
+  const [pendingThumbnails, setPendingThumbnails] = useState([]);
+  const thumbnailUrlsRef = useRef({});
 
   const navigate = useNavigate();
 
+  // 一页的缩略图一次请求获取；失败时回退到逐张加载 /api/thumbnail/<id>
+  const fetchThumbnailBundle = async (bundleUrl, photoIds) => {
+    if (!bundleUrl) return;
+    setPendingThumbnails(prev => [...prev, ...photoIds]);
+    try {
+      const response = await axios.get(bundleUrl, {
+        responseType: 'arraybuffer',
+        headers: {
+          'Authorization': `Bearer ${localStorage.getItem('token') || ''}`
+        }
+      });
+      const urls = parseThumbnailBundle(response.data);
+      thumbnailUrlsRef.current = { ...thumbnailUrlsRef.current, ...urls };
+      setThumbnailUrls(prev => ({ ...prev, ...urls }));
+    } catch (error) {
+      console.error('获取缩略图失败:', error);
+    } finally {
+      setPendingThumbnails(prev => prev.filter(id => !photoIds.includes(id)));
+    }
+  };
+
+  useEffect(() => () => {
+    Object.values(thumbnailUrlsRef.current).forEach(url => URL.revokeObjectURL(url));
+  }, []);
+
   const fetchPhotos = useCallback(async (pageNum = 1, reset = false) => {
     try {
       setLoading(true);
@@ -57,10 +99,14 @@ const Gallery = () => {
       });
       
       if (reset) {
+        Object.values(thumbnailUrlsRef.current).forEach(url => URL.revokeObjectURL(url));
+        thumbnailUrlsRef.current = {};
+        setThumbnailUrls({});
         setPhotos(response.data.photos);
       } else {
         setPhotos(prev => [...prev, ...response.data.photos]);
       }
+      fetchThumbnailBundle(response.data.thumbnail_bundle_url, response.data.photos.map(photo => photo.id));
       
       setTotalPhotos(response.data.total);
       setHasMore(response.data.page < response.data.pages);
@@ -371,6 +417,8 @@ const Gallery = () => {
                 onClick={() => handlePhotoClick(photo, index)}
                 onEdit={() => handleEditPhoto(photo.id)}
                 viewMode={viewMode}
+                thumbnailSrc={thumbnailUrls[photo.id]}
+                thumbnailPending={pendingThumbnails.includes(photo.id)}
               />
             ))}
           </div>
@@ -3,6 +3,7 @@ import { useParams, useNavigate } from 'react-router-dom';
 import { FiArrowLeft, FiEdit3, FiTrash2, FiDownload, FiShare2, FiCalendar, FiMapPin, FiTag, FiCamera, FiPlus } from 'react-icons/fi';
 import axios from 'axios';
 import { toast } from 'react-toastify';
+import { findPhotoInColumns } from '../utils/photoColumns';
 import './PhotoDetail.css';
 
 const PhotoDetail = () => {
@@ -21,10 +22,10 @@ const PhotoDetail = () => {
   const fetchPhoto = async () => {
     try {
       setLoading(true);
-      const response = await axios.get(`/api/photos?page=1&per_page=1000`, {
+      const response = await axios.get(`/api/photos?page=1&per_page=1000&format=columns`, {
         headers: { 'Authorization': `Bearer ${localStorage.getItem('token') || ''}` }
       });
-      const foundPhoto = response.data.photos.find(p => p.id === parseInt(id));
+      const foundPhoto = findPhotoInColumns(response.data.photos, parseInt(id));
       
       if (foundPhoto) {
         setPhoto(foundPhoto);
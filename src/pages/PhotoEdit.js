@@ -5,71 +5,9 @@ import ReactCrop from 'react-image-crop';
 import 'react-image-crop/dist/ReactCrop.css';
 import axios from 'axios';
 import { toast } from 'react-toastify';
+import { findPhotoInColumns } from '../utils/photoColumns';
 import './PhotoEdit.css';
 
-const clampChannel = (value) => Math.max(0, Math.min(255, value));
-
-const rgbToHsl = (r, g, b) => {
-  r /= 255;
-  g /= 255;
-  b /= 255;
-  const max = Math.max(r, g, b);
-  const min = Math.min(r, g, b);
-  let h;
-  let s;
-  const l = (max + min) / 2;
-
-  if (max === min) {
-    h = 0;
-    s = 0;
-  } else {
-    const d = max - min;
-    s = l > 0.5 ? d / (2 - max - min) : d / (max + min);
-    switch (max) {
-      case r:
-        h = (g - b) / d + (g < b ? 6 : 0);
-        break;
-      case g:
-        h = (b - r) / d + 2;
-        break;
-      default:
-        h = (r - g) / d + 4;
-        break;
-    }
-    h /= 6;
-  }
-
-  return [h, s, l];
-};
-
-const hslToRgb = (h, s, l) => {
-  let r;
-  let g;
-  let b;
-
-  if (s === 0) {
-    r = g = b = l; // achromatic
-  } else {
-    const hue2rgb = (p, q, t) => {
-      let tempT = t;
-      if (tempT < 0) tempT += 1;
-      if (tempT > 1) tempT -= 1;
-      if (tempT < 1 / 6) return p + (q - p) * 6 * tempT;
-      if (tempT < 1 / 2) return q;
-      if (tempT < 2 / 3) return p + (q - p) * (2 / 3 - tempT) * 6;
-      return p;
-    };
-
-    const q = l < 0.5 ? l * (1 + s) : l + s - l * s;
-    const p = 2 * l - q;
-    r = hue2rgb(p, q, h + 1 / 3);
-    g = hue2rgb(p, q, h);
-    b = hue2rgb(p, q, h - 1 / 3);
-  }
-
-  return [Math.round(r * 255), Math.round(g * 255), Math.round(b * 255)];
-};
-
 const PhotoEdit = () => {
   const { id } = useParams();
   const navigate = useNavigate();
@@ -77,7 +15,6 @@ const PhotoEdit = () => {
   const [photo, setPhoto] = useState(null);
   const [loading, setLoading] = useState(true);
   const [saving, setSaving] = useState(false);
-  const [image, setImage] = useState(null);
   const [adjustments, setAdjustments] = useState({
     brightness: 0,
     contrast: 0,
@@ -89,16 +26,24 @@ const PhotoEdit = () => {
   const [naturalSize, setNaturalSize] = useState({ width: 0, height: 0 });
   const [displayedImageSize, setDisplayedImageSize] = useState({ width: 0, height: 0 });
   const cropImageRef = useRef(null);
+  const previewRequestRef = useRef(0);
 
   useEffect(() => {
     fetchPhoto();
   }, [id]);
 
+  // 调整参数变化后稍作延迟再请求预览，拖动滑块时合并请求
+  useEffect(() => {
+    if (!photo || cropEnabled) return undefined;
+    const timer = setTimeout(() => requestPreview(adjustments), 80);
+    return () => clearTimeout(timer);
+  }, [photo, adjustments, cropEnabled]);
+
   const fetchPhoto = async () => {
     try {
       setLoading(true);
-      const response = await axios.get(`/api/photos?page=1&per_page=1000`);
-      const foundPhoto = response.data.photos.find(p => p.id === parseInt(id));
+      const response = await axios.get(`/api/photos?page=1&per_page=1000&format=columns`);
+      const foundPhoto = findPhotoInColumns(response.data.photos, parseInt(id));
       
       if (foundPhoto) {
         setPhoto(foundPhoto);
@@ -107,7 +52,6 @@ const PhotoEdit = () => {
           width: foundPhoto.width || 0, 
           height: foundPhoto.height || 0 
         });
-        loadImage(foundPhoto);
       } else {
         toast.error('照片不存在');
         navigate('/gallery');
@@ -121,15 +65,28 @@ const PhotoEdit = () => {
     }
   };
 
-  const loadImage = (photoData) => {
-    const img = new Image();
-    img.crossOrigin = 'anonymous';
-    img.onload = () => {
-      setImage(img);
-      setNaturalSize({ width: img.naturalWidth || img.width, height: img.naturalHeight || img.height });
-      drawImage(img);
-    };
-    img.src = `/api/photo/${photoData.id}?token=${localStorage.getItem('token') || ''}`;
+  const requestPreview = async (params) => {
+    // 预览由服务端在约1200px的代理图上渲染，与保存结果使用同一套算法
+    const requestId = ++previewRequestRef.current;
+    try {
+      const response = await axios.post(`/api/photo/${id}/preview`, params, {
+        responseType: 'blob',
+        headers: { 'Authorization': `Bearer ${localStorage.getItem('token') || ''}` }
+      });
+      if (requestId !== previewRequestRef.current) return;
+      const url = URL.createObjectURL(response.data);
+      const img = new Image();
+      img.onload = () => {
+        URL.revokeObjectURL(url);
+        // 只绘制最新一次请求的结果
+        if (requestId === previewRequestRef.current) {
+          drawImage(img);
+        }
+      };
+      img.src = url;
+    } catch (error) {
+      console.error('获取预览失败:', error);
+    }
   };
 
   const drawImage = (img) => {
@@ -142,68 +99,6 @@ const PhotoEdit = () => {
 
     ctx.clearRect(0, 0, canvas.width, canvas.height);
     ctx.drawImage(img, 0, 0);
-
-    // 应用调整
-    applyAdjustments(ctx, canvas.width, canvas.height);
-  };
-
-  const applyAdjustments = (ctx, width, height) => {
-    if (!image) return;
-
-    const imageData = ctx.getImageData(0, 0, width, height);
-    const data = imageData.data;
-
-    // 应用亮度调整
-    if (adjustments.brightness !== 0) {
-      const brightness = adjustments.brightness;
-      for (let i = 0; i < data.length; i += 4) {
-        data[i] = clampChannel(data[i] + brightness);
-        data[i + 1] = clampChannel(data[i + 1] + brightness);
-        data[i + 2] = clampChannel(data[i + 2] + brightness);
-      }
-    }
-
-    // 应用对比度调整
-    if (adjustments.contrast !== 0) {
-      const contrast = (adjustments.contrast + 100) / 100;
-      for (let i = 0; i < data.length; i += 4) {
-        data[i] = clampChannel((data[i] - 128) * contrast + 128);
-        data[i + 1] = clampChannel((data[i + 1] - 128) * contrast + 128);
-        data[i + 2] = clampChannel((data[i + 2] - 128) * contrast + 128);
-      }
-    }
-
-    // 应用饱和度调整
-    if (adjustments.saturation !== 0) {
-      const saturation = (adjustments.saturation + 100) / 100;
-      for (let i = 0; i < data.length; i += 4) {
-        const r = data[i];
-        const g = data[i + 1];
-        const b = data[i + 2];
-        const gray = 0.299 * r + 0.587 * g + 0.114 * b;
-
-        data[i] = clampChannel(gray + (r - gray) * saturation);
-        data[i + 1] = clampChannel(gray + (g - gray) * saturation);
-        data[i + 2] = clampChannel(gray + (b - gray) * saturation);
-      }
-    }
-
-    // 应用色相调整
-    if (adjustments.hue !== 0) {
-      const hueShift = adjustments.hue;
-      for (let i = 0; i < data.length; i += 4) {
-        const [h, s, l] = rgbToHsl(data[i], data[i + 1], data[i + 2]);
-        let newHue = h + hueShift / 360;
-        if (newHue < 0) newHue += 1;
-        if (newHue > 1) newHue -= 1;
-        const [nr, ng, nb] = hslToRgb(newHue, s, l);
-        data[i] = nr;
-        data[i + 1] = ng;
-        data[i + 2] = nb;
-      }
-    }
-
-    ctx.putImageData(imageData, 0, 0);
   };
 
   const handleAdjustmentChange = (type, value) => {
@@ -211,13 +106,6 @@ const PhotoEdit = () => {
       ...prev,
       [type]: value
     }));
-    
-    // 重新绘制图片
-    setTimeout(() => {
-      if (image) {
-        drawImage(image);
-      }
-    }, 100);
   };
 
   const handleSave = async () => {
@@ -284,12 +172,25 @@ const PhotoEdit = () => {
       
     } catch (error) {
       console.error('保存失败:', error);
-      toast.error('保存失败');
+      toast.error(error.response?.data?.error || '保存失败');
     } finally {
       setSaving(false);
     }
   };
 
+  const handleRevert = async () => {
+    try {
+      await axios.post(`/api/photo/${id}/revert`, {}, {
+        headers: { 'Authorization': `Bearer ${localStorage.getItem('token') || ''}` }
+      });
+      toast.success('已恢复原图');
+      navigate(`/photo/${id}`);
+    } catch (error) {
+      console.error('恢复原图失败:', error);
+      toast.error('恢复原图失败');
+    }
+  };
+
   const handleReset = () => {
     setAdjustments({
       brightness: 0,
@@ -297,10 +198,6 @@ const PhotoEdit = () => {
       saturation: 0,
       hue: 0
     });
-    
-    if (image) {
-      drawImage(image);
-    }
   };
 
   if (loading) {
@@ -346,6 +243,11 @@ const PhotoEdit = () => {
             <button onClick={handleReset} className="action-btn">
               重置
             </button>
+            {photo.edit_version > 0 && (
+              <button onClick={handleRevert} className="action-btn">
+                恢复原图
+              </button>
+            )}
             <button 
               onClick={handleSave} 
               className="btn btn-primary"
@@ -5,6 +5,67 @@ import { FiUpload, FiX, FiImage, FiTag } from 'react-icons/fi';
 import axios from 'axios';
 import './Upload.css';
 
+// 超过该大小的文件使用分块上传（/api/uploads），断线后从服务端记录的偏移量继续
+const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+const MAX_UPLOAD_SIZE = 2 * 1024 * 1024 * 1024;
+const CHUNK_RETRIES = 3;
+// 多文件上传：每个请求最多包含的文件数和总字节数
+const BATCH_MAX_FILES = 50;
+const BATCH_MAX_BYTES = 256 * 1024 * 1024;
+
+const groupForBatchUpload = (fileItems) => {
+  const groups = [];
+  let group = [];
+  let bytes = 0;
+  fileItems.forEach(fileItem => {
+    if (group.length && (group.length >= BATCH_MAX_FILES || bytes + fileItem.file.size > BATCH_MAX_BYTES)) {
+      groups.push(group);
+      group = [];
+      bytes = 0;
+    }
+    group.push(fileItem);
+    bytes += fileItem.file.size;
+  });
+  if (group.length) {
+    groups.push(group);
+  }
+  return groups;
+};
+
+const uploadInChunks = async (file, tags, headers) => {
+  const { data: session } = await axios.post('/api/uploads', {
+    filename: file.name,
+    size: file.size,
+    tags
+  }, { headers });
+
+  let offset = session.offset;
+  let retries = 0;
+  while (offset < file.size) {
+    const chunk = file.slice(offset, offset + session.chunk_size);
+    try {
+      const { data } = await axios.patch(`/api/uploads/${session.upload_id}`, chunk, {
+        headers: {
+          ...headers,
+          'Content-Type': 'application/offset+octet-stream',
+          'Upload-Offset': String(offset)
+        }
+      });
+      offset = data.offset;
+      retries = 0;
+    } catch (error) {
+      if (retries >= CHUNK_RETRIES) {
+        throw error;
+      }
+      retries++;
+      // 查询服务端已写入的字节数后继续
+      const { data } = await axios.get(`/api/uploads/${session.upload_id}`, { headers });
+      offset = data.offset;
+    }
+  }
+  return axios.post(`/api/uploads/${session.upload_id}/complete`, null, { headers });
+};
+
 const Upload = () => {
   const [files, setFiles] = useState([]);
   const [uploading, setUploading] = useState(false);
@@ -27,7 +88,7 @@ const Upload = () => {
     accept: {
       'image/*': ['.jpeg', '.jpg', '.png', '.gif', '.bmp', '.tiff', '.webp']
     },
-    maxSize: 16 * 1024 * 1024, // 16MB
+    maxSize: MAX_UPLOAD_SIZE,
     multiple: true
   });
 
@@ -53,31 +114,54 @@ const Upload = () => {
     let successCount = 0;
     let errorCount = 0;
 
+    // 显式带上令牌，避免 401/422
+    const headers = { 'Authorization': `Bearer ${localStorage.getItem('token') || ''}` };
+    const tags = customTags.trim();
+
     try {
-      for (const fileItem of files) {
-        if (fileItem.status === 'pending') {
-          const formData = new FormData();
-          formData.append('file', fileItem.file);
-          if (customTags.trim()) {
-            formData.append('tags', customTags.trim());
-          }
+      const pending = files.filter(fileItem => fileItem.status === 'pending');
 
-          try {
-            await axios.post('/api/upload', formData, {
-              headers: {
-                'Content-Type': 'multipart/form-data',
-                // 显式带上令牌，避免 401/422
-                'Authorization': `Bearer ${localStorage.getItem('token') || ''}`
-              }
-            });
-            
-            fileItem.status = 'success';
-            successCount++;
-          } catch (error) {
+      // 大文件逐个分块上传
+      for (const fileItem of pending.filter(item => item.file.size > CHUNKED_UPLOAD_THRESHOLD)) {
+        try {
+          await uploadInChunks(fileItem.file, tags, headers);
+          fileItem.status = 'success';
+          successCount++;
+        } catch (error) {
+          fileItem.status = 'error';
+          errorCount++;
+          console.error('上传失败:', error);
+        }
+      }
+
+      // 其余文件按组放在同一个请求中上传，服务端并行处理
+      const smallFiles = pending.filter(item => item.file.size <= CHUNKED_UPLOAD_THRESHOLD);
+      for (const group of groupForBatchUpload(smallFiles)) {
+        const formData = new FormData();
+        group.forEach(fileItem => formData.append('files', fileItem.file));
+        if (tags) {
+          formData.append('tags', tags);
+        }
+        try {
+          const { data } = await axios.post('/api/upload/batch', formData, {
+            headers: { ...headers, 'Content-Type': 'multipart/form-data' }
+          });
+          data.files.forEach((result, index) => {
+            if (result.status === 'error') {
+              group[index].status = 'error';
+              errorCount++;
+              console.error('上传失败:', result.original_filename, result.error);
+            } else {
+              group[index].status = 'success';
+              successCount++;
+            }
+          });
+        } catch (error) {
+          group.forEach(fileItem => {
             fileItem.status = 'error';
-            errorCount++;
-            console.error('上传失败:', error);
-          }
+          });
+          errorCount += group.length;
+          console.error('上传失败:', error);
         }
       }
 
@@ -161,7 +245,7 @@ const Upload = () => {
               {isDragActive ? '释放文件以上传' : '点击上传或拖拽文件到此处'}
             </div>
             <div className="upload-hint">
-              支持 PNG, JPG, GIF 等格式，单个文件最大 16MB
+              支持 PNG, JPG, GIF 等格式，单个文件最大 2GB
             </div>
             <button type="button" className="btn btn-primary upload-btn">
               选择文件
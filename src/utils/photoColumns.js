@@ -0,0 +1,12 @@
+// /api/photos?format=columns 的列式响应：{ 字段名: [每张照片的值] }
+
+// 从列式结果中取出一张照片，还原为与普通列表相同的对象；找不到时返回 null
+export const findPhotoInColumns = (columns, photoId) => {
+  const index = columns.id.indexOf(photoId);
+  if (index === -1) return null;
+  const photo = {};
+  Object.keys(columns).forEach((field) => {
+    photo[field] = columns[field][index];
+  });
+  return photo;
+};
@@ -29,10 +29,11 @@ def check_dependencies():
 def check_database():
     """检查数据库连接"""
     try:
-        from server import app, db
+        from server import app, db, upgrade_schema
         print("SQLAlchemy URI =", app.config['SQLALCHEMY_DATABASE_URI'])
         with app.app_context():
             db.create_all()
+            upgrade_schema()
         print("✅ 数据库连接正常")
         return True
     except Exception as e:
@@ -42,7 +43,7 @@ def check_database():
 
 def create_directories():
     """创建必要的目录"""
-    directories = ['uploads', 'thumbnails']
+    directories = ['uploads', 'thumbnails', 'renders']
     for directory in directories:
         Path(directory).mkdir(exist_ok=True)
         print(f"✅ 创建目录: {directory}")
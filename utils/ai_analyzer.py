@@ -6,8 +6,10 @@ import os
 import sys
 import base64
 import requests
+import threading
 import time
-from typing import List, Dict, Optional
+from typing import Any, Callable, List, Dict, Optional
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -26,12 +28,71 @@ class AIAnalyzer:
         # 兼容旧代码
         self.api_key = self.zhipu_api_key or self.gemini_api_key or self.openai_api_key
         
+        # 代理只作用于分析器自己的客户端，不再修改进程级环境变量
+        self.http_proxy = os.getenv('AI_HTTP_PROXY') or None
+        self.gemini_proxy = os.getenv('GEMINI_PROXY') or self.http_proxy
+        
+        # 长连接HTTP会话（连接池 + keep-alive），所有基于requests的服务共用
+        self.http_session = self._build_http_session()
+        # 各服务的SDK客户端，首次使用时创建一次后复用
+        self._clients: Dict[str, Any] = {}
+        self._client_lock = threading.Lock()
+        
         # 打印当前配置信息（仅在调试时）
         if os.getenv('DEBUG_AI_ANALYZER', '').lower() == 'true':
             print(f"[AI分析器] Provider: {self.provider}")
             print(f"[AI分析器] 检测到的API Keys: Zhipu={bool(self.zhipu_api_key)}, "
                   f"OpenAI={bool(self.openai_api_key)}, DeepSeek={bool(self.deepseek_api_key)}, "
                   f"Gemini={bool(self.gemini_api_key)}, Google={bool(self.google_api_key)}")
+    
+    def _build_http_session(self) -> requests.Session:
+        """创建带连接池的HTTP会话，避免每次分析都重新建立TCP+TLS连接"""
+        pool_size = int(os.getenv('AI_HTTP_POOL_SIZE', '10'))
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if self.http_proxy:
+            session.proxies.update({'http': self.http_proxy, 'https': self.http_proxy})
+        return session
+    
+    def _get_client(self, name: str, factory: Callable[[], Any]) -> Any:
+        """获取指定服务的客户端，不存在时通过factory创建（线程安全，只创建一次）"""
+        client = self._clients.get(name)
+        if client is not None:
+            return client
+        with self._client_lock:
+            client = self._clients.get(name)
+            if client is None:
+                client = factory()
+                self._clients[name] = client
+        return client
+    
+    def _create_gemini_model(self):
+        """配置Gemini SDK并创建模型实例（只在首次使用时执行一次）"""
+        import google.generativeai as genai
+        
+        api_key = self.gemini_api_key
+        if not api_key:
+            raise RuntimeError('GEMINI_API_KEY 未配置')
+        
+        model_name = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
+        if not self.gemini_proxy:
+            genai.configure(api_key=api_key)
+            return genai.GenerativeModel(model_name)
+        
+        # 配置了代理时使用REST传输，把代理设置在SDK内部的requests会话上。
+        # SDK没有公开的代理参数（只能读取进程级环境变量），这里依赖 google-generativeai 0.8.x 的
+        # REST传输结构（版本已在 requirements.txt 中固定）；结构变化时明确报错，不静默忽略代理
+        from google.generativeai import client as genai_client
+        genai.configure(api_key=api_key, transport='rest')
+        service_client = genai_client.get_default_generative_client()
+        session = getattr(getattr(service_client, '_transport', None), '_session', None)
+        if not isinstance(session, requests.Session):
+            raise RuntimeError('当前版本的 Gemini SDK 不支持为客户端单独设置代理，请使用 requirements.txt 中固定的版本')
+        session.proxies.update({'http': self.gemini_proxy, 'https': self.gemini_proxy})
+        # GenerativeModel 首次调用时取 configure 创建的同一个默认客户端，代理随之生效
+        return genai.GenerativeModel(model_name)
         
     def analyze(self, image_path: str) -> List[str]:
         """
@@ -87,7 +148,7 @@ class AIAnalyzer:
         try:
             from openai import OpenAI
             
-            client = OpenAI(api_key=self.openai_api_key)
+            client = self._get_client('openai', lambda: OpenAI(api_key=self.openai_api_key))
             
             # 读取图片并转换为base64
             with open(image_path, 'rb') as image_file:
@@ -139,7 +200,7 @@ class AIAnalyzer:
         try:
             from google.cloud import vision
             
-            client = vision.ImageAnnotatorClient()
+            client = self._get_client('google_vision', vision.ImageAnnotatorClient)
             
             with open(image_path, 'rb') as image_file:
                 content = image_file.read()
@@ -236,7 +297,7 @@ class AIAnalyzer:
                 ]
             }
 
-            response = requests.post(api_url, json=payload, headers=headers, timeout=timeout)
+            response = self.http_session.post(api_url, json=payload, headers=headers, timeout=timeout)
             response.raise_for_status()
             data = response.json()
 
@@ -270,8 +331,8 @@ class AIAnalyzer:
             if not api_key:
                 raise RuntimeError('ZHIPU_API_KEY 未配置')
             
-            # 初始化客户端
-            client = ZhipuAI(api_key=api_key)
+            # 客户端只创建一次，复用其内部连接池
+            client = self._get_client('zhipu', lambda: ZhipuAI(api_key=api_key))
             
             # 读取图片并转换为base64
             with open(image_path, 'rb') as image_file:
@@ -382,29 +443,16 @@ class AIAnalyzer:
         """使用 Google Gemini (Stable SDK: google-generativeai) 分析图片，带重试和容错机制"""
         try:
             # 【改动1】使用更稳定的旧版导入方式
-            import google.generativeai as genai
-            import os
             import PIL.Image
             from google.api_core import exceptions as google_exceptions
             
-            os.environ["HTTP_PROXY"] = "http://127.0.0.1:20171"
-            os.environ["HTTPS_PROXY"] = "http://127.0.0.1:20171"
-            # 获取配置
-            api_key = self.gemini_api_key
-            if not api_key:
-                raise RuntimeError('GEMINI_API_KEY 未配置')
-            
-            # 【改动2】配置 API Key
-            genai.configure(api_key=api_key)
+            # 【改动2】SDK配置与模型实例只创建一次，代理只作用于Gemini客户端
+            model = self._get_client('gemini', self._create_gemini_model)
             
             # 【改动3】使用 PIL 读取图片 (比手动转 Base64 更安全)
             img = PIL.Image.open(image_path)
 
             prompt = "请分析这张图片，生成5-10个中文标签，覆盖场景、主体、颜色或情绪等信息，只输出逗号分隔的标签，不要额外文字。"
-
-            # 【改动4】旧版 SDK 的调用方式
-            # 使用 gemini-2.0-flash 模型，因为它免费且快
-            model = genai.GenerativeModel('gemini-2.0-flash')
             
             # 【改动5】添加重试机制
             max_retries = 3
@@ -482,15 +530,10 @@ class AIAnalyzer:
     def _analyze_with_local_model(self, image_path: str) -> List[str]:
         """使用本地AI模型分析（如使用transformers库）"""
         try:
-            from transformers import pipeline
-            from PIL import Image
-            
-            # 使用预训练的图片分类模型
-            classifier = pipeline("image-classification", 
-                                model="microsoft/resnet-50")
+            from .local_model import get_local_model
             
-            image = Image.open(image_path)
-            results = classifier(image)
+            # 模型常驻内存，并发请求会被合并成批推理
+            results = get_local_model().classify(image_path, top_k=5)
             
             # 转换为中文标签
             tags = []
@@ -534,10 +577,6 @@ class AIAnalyzer:
     
     def _fallback_analysis(self, image_path: str) -> List[str]:
         """回退方案：基于文件名和OpenCV的简单分析"""
-        import os
-        import cv2
-        import numpy as np
-        
         filename = os.path.basename(image_path).lower()
         ai_tags = []
         
@@ -557,35 +596,13 @@ class AIAnalyzer:
         else:
             ai_tags.extend(['图片', '照片'])
         
-        # 使用OpenCV进行颜色和亮度分析
+        # 使用OpenCV进行颜色和亮度分析（缩小尺寸解码，一次完成）
         try:
-            img = cv2.imread(image_path)
-            if img is not None:
-                hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-                
-                # 检测主要颜色
-                hue_mean = np.mean(hsv[:,:,0])
-                if hue_mean < 30:
-                    ai_tags.append('红色')
-                elif 30 <= hue_mean < 60:
-                    ai_tags.append('黄色')
-                elif 60 <= hue_mean < 90:
-                    ai_tags.append('绿色')
-                elif 90 <= hue_mean < 120:
-                    ai_tags.append('青色')
-                elif 120 <= hue_mean < 150:
-                    ai_tags.append('蓝色')
-                else:
-                    ai_tags.append('紫色')
-                
-                # 亮度分析
-                brightness = np.mean(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
-                if brightness > 200:
-                    ai_tags.append('明亮')
-                elif brightness < 50:
-                    ai_tags.append('昏暗')
-                else:
-                    ai_tags.append('中等亮度')
+            from .color_analysis import analyze_image_colors, color_tags_from_stats
+            
+            stats = analyze_image_colors(image_path)
+            if stats is not None:
+                ai_tags.extend(color_tags_from_stats(stats))
         except Exception:
             pass  # OpenCV不可用，跳过
         
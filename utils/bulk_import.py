@@ -0,0 +1,141 @@
+"""
+批量导入：遍历目录、计算内容哈希去重，并在进程池中完成复制、尺寸、EXIF、缩略图、占位图、感知哈希和标签分析
+本模块不访问数据库，worker函数只接收路径和配置，可以在spawn启动的子进程中执行；
+入库和断点记录由 import_photos.py 负责，批量上传接口（/api/upload/batch）同样使用 prepare_file
+"""
+import os
+from typing import Dict, Iterator, Optional, Set
+
+from utils.exif_reader import extract_exif
+from utils.image_hash import hash_to_hex, phash_file, sha256_file
+from utils.storage import Storage
+from utils.thumbnail import generate_placeholder, generate_thumbnail
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff', 'webp'}
+
+
+def iter_image_files(root: str) -> Iterator[str]:
+    """递归遍历目录中的图片文件（按路径排序，保证每次运行顺序一致，便于断点续传）"""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"无法读取目录 {directory}: {e}")
+            continue
+        directories, files = [], []
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                directories.append(entry.path)
+            elif entry.is_file() and entry.name.rsplit('.', 1)[-1].lower() in ALLOWED_EXTENSIONS:
+                files.append(entry.path)
+        yield from files
+        stack.extend(reversed(directories))
+
+
+class Checkpoint:
+    """断点记录：每个提交成功的批次追加一行一个源文件路径，重新运行时跳过已处理的文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.done = {line.rstrip('\n') for line in f if line.strip()}
+
+    def __contains__(self, source_path: str) -> bool:
+        return source_path in self.done
+
+    def __len__(self):
+        return len(self.done)
+
+    def mark(self, source_paths):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for source_path in source_paths:
+                f.write(source_path + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update(source_paths)
+
+
+def hash_file(source_path: str) -> Dict:
+    """第一阶段：计算内容哈希（用于与已有照片和本次导入的其他文件去重）"""
+    try:
+        return {'source_path': source_path, 'content_hash': sha256_file(source_path)}
+    except OSError as e:
+        return {'source_path': source_path, 'error': str(e)}
+
+
+def analyze_file(file_path: str, ai: bool = False) -> Dict:
+    """提取本地图片文件的尺寸、MIME类型、EXIF、感知哈希（以及可选的AI标签）
+
+    不访问数据库，可在线程池或进程池中执行；出错时抛出异常
+    """
+    import magic
+    from PIL import Image
+
+    with Image.open(file_path) as img:
+        width, height = img.size
+    perceptual_hash: Optional[int] = phash_file(file_path)
+    result = {
+        'mime_type': magic.from_file(file_path, mime=True),
+        'width': width,
+        'height': height,
+        'perceptual_hash': hash_to_hex(perceptual_hash) if perceptual_hash is not None else None,
+        'exif': extract_exif(file_path),
+        'ai_tags': [],
+    }
+    if ai:
+        from utils.ai_analyzer import analyze_image_with_ai
+        result['ai_tags'] = analyze_image_with_ai(file_path)
+    return result
+
+
+def prepare_file(storage: Storage, file_key: str, thumbnail_key: str, ai: bool = False) -> Dict:
+    """原图已保存到存储中：生成缩略图（相同内容的缩略图已存在时直接共用）和占位图，再分析原图"""
+    file_path = storage.local_path(file_key)
+    if not storage.exists(thumbnail_key):
+        with storage.writing(thumbnail_key) as thumbnail_path:
+            generate_thumbnail(file_path, thumbnail_path)
+    result = analyze_file(file_path, ai=ai)
+    result['placeholder'], result['dominant_color'] = generate_placeholder(storage.local_path(thumbnail_key))
+    return result
+
+
+def process_file(source_path: str, content_hash: str, storage: Storage, link: bool = False,
+                 ai: bool = False) -> Dict:
+    """第二阶段：把文件放入存储并生成缩略图、EXIF、感知哈希（以及可选的AI标签）
+
+    返回创建 Photo 记录所需的字段；出错时返回包含 error 的字典。文件已由主进程预留，
+    出错时由主进程撤销预留并清理（相同内容可能正在被其他上传使用，这里不删除）
+    """
+    from PIL import Image
+
+    ext = source_path.rsplit('.', 1)[-1].lower()
+    file_key = storage.original_path(content_hash, ext)
+    thumbnail_key = storage.thumbnail_path(content_hash, ext)
+    try:
+        # 先确认能解码，避免复制无法识别的文件
+        with Image.open(source_path):
+            pass
+
+        # 按内容地址存放：其他用户已有相同内容时共用同一个文件
+        storage.import_original(source_path, content_hash, ext, link=link)
+
+        result = {
+            'source_path': source_path,
+            'filename': os.path.basename(file_key),
+            'original_filename': os.path.basename(source_path),
+            'file_path': file_key,
+            'thumbnail_path': thumbnail_key,
+            'file_size': os.path.getsize(source_path),
+            'content_hash': content_hash,
+        }
+        result.update(prepare_file(storage, file_key, thumbnail_key, ai=ai))
+        return result
+    except Exception as e:
+        return {'source_path': source_path, 'file_path': file_key, 'thumbnail_path': thumbnail_key,
+                'error': str(e)}
@@ -0,0 +1,170 @@
+"""
+图片颜色/亮度快速分析
+以缩小尺寸解码图片，一次性计算色相直方图、主色调色板、亮度、对比度和清晰度
+"""
+import os
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+# 分析用的最大边长，解码后超过该尺寸会再缩小
+ANALYSIS_MAX_SIDE = 256
+# 参与k-means聚类的最大像素数
+PALETTE_SAMPLE_SIZE = 2000
+PALETTE_SIZE = 4
+
+# OpenCV色相范围为0-179（半度），红色跨越0点，需要分两段统计
+HUE_BUCKETS = [
+    ('红色', ((0, 10), (165, 180))),
+    ('橙色', ((10, 22),)),
+    ('黄色', ((22, 35),)),
+    ('绿色', ((35, 80),)),
+    ('青色', ((80, 100),)),
+    ('蓝色', ((100, 130),)),
+    ('紫色', ((130, 165),)),
+]
+
+# 饱和度/明度低于该值的像素视为无彩色，不参与色相统计
+MIN_CHROMA_SATURATION = 40
+MIN_CHROMA_VALUE = 40
+
+
+def load_reduced(image_path: str, max_side: int = ANALYSIS_MAX_SIDE) -> Optional[np.ndarray]:
+    """以缩小比例解码图片（JPEG在解码阶段直接缩放），返回BGR数组"""
+    try:
+        size = os.path.getsize(image_path)
+    except OSError:
+        return None
+
+    # 大文件用1/8解码，其余1/4解码
+    flag = cv2.IMREAD_REDUCED_COLOR_8 if size > 4 * 1024 * 1024 else cv2.IMREAD_REDUCED_COLOR_4
+    img = cv2.imread(image_path, flag)
+    if img is None:
+        # 部分格式（如GIF）OpenCV无法解码，使用PIL读取
+        try:
+            from PIL import Image
+            with Image.open(image_path) as pil_img:
+                pil_img.draft('RGB', (max_side, max_side))
+                pil_img = pil_img.convert('RGB')
+                pil_img.thumbnail((max_side, max_side))
+                img = cv2.cvtColor(np.asarray(pil_img), cv2.COLOR_RGB2BGR)
+        except Exception:
+            return None
+
+    height, width = img.shape[:2]
+    scale = max_side / float(max(height, width))
+    if scale < 1:
+        img = cv2.resize(img, (max(1, int(width * scale)), max(1, int(height * scale))),
+                         interpolation=cv2.INTER_AREA)
+    return img
+
+
+def analyze_image_colors(image_path: str) -> Optional[Dict]:
+    """分析图片颜色与亮度信息，无法解码时返回None
+
+    返回字段：
+        hue_histogram  各色相区间的彩色像素占比
+        dominant_hue   占比最高的色相名称（无彩色图片为None）
+        colorfulness   彩色像素占比
+        palette        主色调列表（#rrggbb），按像素占比降序
+        brightness     平均亮度（0-255）
+        contrast       亮度标准差
+        sharpness      拉普拉斯方差（缩小尺寸下计算）
+    """
+    img = load_reduced(image_path)
+    if img is None:
+        return None
+    return analyze_bgr(img)
+
+
+def analyze_bgr(img: np.ndarray) -> Dict:
+    """对已解码的（小尺寸）BGR数组进行分析"""
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+    # 色相直方图：只统计有足够饱和度和明度的像素
+    chroma_mask = ((hsv[:, :, 1] >= MIN_CHROMA_SATURATION) &
+                   (hsv[:, :, 2] >= MIN_CHROMA_VALUE)).astype(np.uint8)
+    hist = cv2.calcHist([hsv], [0], chroma_mask, [180], [0, 180]).ravel()
+    total_pixels = float(gray.size)
+    chroma_pixels = float(hist.sum())
+
+    hue_histogram = {}
+    for name, ranges in HUE_BUCKETS:
+        count = sum(float(hist[lo:hi].sum()) for lo, hi in ranges)
+        hue_histogram[name] = count / chroma_pixels if chroma_pixels else 0.0
+
+    colorfulness = chroma_pixels / total_pixels if total_pixels else 0.0
+    dominant_hue = max(hue_histogram, key=hue_histogram.get) if chroma_pixels else None
+
+    # 亮度/对比度/清晰度
+    mean, std = cv2.meanStdDev(gray)
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_32F).var())
+
+    return {
+        'hue_histogram': hue_histogram,
+        'dominant_hue': dominant_hue,
+        'colorfulness': colorfulness,
+        'palette': extract_palette(img),
+        'brightness': float(mean[0][0]),
+        'contrast': float(std[0][0]),
+        'sharpness': sharpness,
+    }
+
+
+def extract_palette(img: np.ndarray, k: int = PALETTE_SIZE) -> List[str]:
+    """对少量采样像素做k-means聚类，返回主色调（#rrggbb，按占比降序）"""
+    pixels = img.reshape(-1, 3)
+    if len(pixels) > PALETTE_SAMPLE_SIZE:
+        rng = np.random.default_rng(0)
+        pixels = pixels[rng.choice(len(pixels), PALETTE_SAMPLE_SIZE, replace=False)]
+    pixels = np.float32(pixels)
+    k = min(k, len(pixels))
+    if k == 0:
+        return []
+
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 1.0)
+    _, labels, centers = cv2.kmeans(pixels, k, None, criteria, 1, cv2.KMEANS_PP_CENTERS)
+    counts = np.bincount(labels.ravel(), minlength=k)
+
+    palette = []
+    for index in np.argsort(-counts):
+        b, g, r = (int(round(c)) for c in centers[index])
+        palette.append(f'#{r:02x}{g:02x}{b:02x}')
+    return palette
+
+
+def color_tags_from_stats(stats: Dict) -> List[str]:
+    """根据分析结果生成中文标签"""
+    tags = []
+
+    if stats['colorfulness'] < 0.05:
+        tags.append('黑白')
+    else:
+        tags.append(stats['dominant_hue'])
+        # 第二种颜色占比足够高时也作为标签
+        ranked = sorted(stats['hue_histogram'].items(), key=lambda item: item[1], reverse=True)
+        if len(ranked) > 1 and ranked[1][1] >= 0.25:
+            tags.append(ranked[1][0])
+        if stats['colorfulness'] > 0.6:
+            tags.append('色彩鲜艳')
+
+    brightness = stats['brightness']
+    if brightness > 200:
+        tags.append('明亮')
+    elif brightness < 50:
+        tags.append('昏暗')
+    else:
+        tags.append('中等亮度')
+
+    contrast = stats['contrast']
+    if contrast > 70:
+        tags.append('高对比度')
+    elif contrast < 25:
+        tags.append('低对比度')
+
+    if stats['sharpness'] < 30:
+        tags.append('模糊')
+
+    return tags
@@ -0,0 +1,53 @@
+"""
+数据库连接池配置与读写分离
+
+- engine_options：按环境变量生成连接池参数（连接数、溢出、等待超时、回收时间、使用前探活），
+  避免 MySQL wait_timeout 断开空闲连接后取到失效连接
+- RoutingSession：在标记为只读的请求中，把普通 SELECT 发往只读副本；写入、flush 以及
+  SELECT ... FOR UPDATE 始终发往主库
+"""
+import os
+from typing import Dict
+
+from flask import g, has_request_context
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = 'replica'
+
+
+def engine_options(url: str) -> Dict:
+    """连接池参数；SQLite（本地测试）只启用探活"""
+    options = {'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'}
+    if url.startswith('sqlite'):
+        return options
+    options.update(
+        pool_size=int(os.getenv('DB_POOL_SIZE', '10')),
+        max_overflow=int(os.getenv('DB_MAX_OVERFLOW', '20')),
+        pool_timeout=int(os.getenv('DB_POOL_TIMEOUT', '30')),
+        # 小于 MySQL 的 wait_timeout（以及中间代理的空闲超时），连接在被服务端断开前主动重建
+        pool_recycle=int(os.getenv('DB_POOL_RECYCLE', '1800')),
+    )
+    return options
+
+
+def use_replica_for_request():
+    """当前请求的读操作改为读取只读副本（由 server.py 中的 read_replica 装饰器调用）"""
+    g.use_replica = True
+
+
+class RoutingSession(Session):
+    """按语句类型选择主库或只读副本的会话"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and has_request_context()
+            and g.get('use_replica', False)
+            and getattr(clause, 'is_select', False)
+            and getattr(clause, '_for_update_arg', None) is None
+        ):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,41 @@
+"""
+编辑渲染：从原图依次应用编辑操作并写入渲染文件
+只依赖文件路径和操作列表（不访问数据库），可以直接提交到进程池中执行
+"""
+import os
+import uuid
+from typing import Dict, List, Tuple
+
+from utils.image_edit import apply_operation, to_rgb
+from utils.jpeg_lossless import lossless_render
+
+
+def render_file(source_path: str, operations: List[Dict], output_path: str,
+                allow_lossless: bool = True) -> Tuple[int, int]:
+    """渲染到output_path（先写临时文件再替换），返回结果尺寸
+
+    输出为JPEG且只有几何操作时优先用 jpegtran 无损变换，否则解码后重新编码
+    """
+    from PIL import Image
+
+    base, ext = os.path.splitext(output_path)
+    tmp_path = f'{base}.{uuid.uuid4().hex}.tmp{ext}'
+    try:
+        if allow_lossless and ext.lower() in ('.jpg', '.jpeg') and lossless_render(source_path, tmp_path, operations):
+            with Image.open(tmp_path) as img:
+                size = img.size
+        else:
+            with Image.open(source_path) as img:
+                img = to_rgb(img)
+                for operation in operations:
+                    img = apply_operation(img, operation)
+                if ext.lower() == '.png':
+                    img.save(tmp_path, format='PNG', optimize=True)
+                else:
+                    img.save(tmp_path, format='JPEG', quality=95, optimize=True)
+                size = img.size
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return size
@@ -0,0 +1,114 @@
+"""
+图片/文本向量编码（CLIP类模型，CPU推理）
+图片与文本编码到同一向量空间，用于以文搜图
+"""
+import os
+import threading
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+
+# 默认使用中文CLIP，查询语句通常为中文（如“海边日落”）
+DEFAULT_EMBEDDING_MODEL = 'OFA-Sys/chinese-clip-vit-base-patch16'
+
+
+def semantic_search_enabled() -> bool:
+    """是否启用语义搜索（需要安装 transformers 和 torch）"""
+    return os.getenv('SEMANTIC_SEARCH_ENABLED', 'false').lower() == 'true'
+
+
+def to_blob(vector: np.ndarray) -> bytes:
+    """向量压缩为float16字节串存储"""
+    return np.asarray(vector, dtype='<f2').tobytes()
+
+
+def from_blob(blob: bytes) -> np.ndarray:
+    """从float16字节串恢复向量"""
+    return np.frombuffer(blob, dtype='<f2')
+
+
+class ClipEncoder:
+    """CLIP图片/文本编码器，模型在首次使用时加载，输出已归一化的向量"""
+
+    def __init__(self, model_name: str = None):
+        self.model_name = model_name or os.getenv('EMBEDDING_MODEL', DEFAULT_EMBEDDING_MODEL)
+        self._model = None
+        self._processor = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._model is not None:
+            return
+        with self._lock:
+            if self._model is not None:
+                return
+            import torch
+            from transformers import AutoModel, AutoProcessor
+
+            threads = int(os.getenv('EMBEDDING_THREADS', '0'))
+            if threads:
+                torch.set_num_threads(threads)
+            processor = AutoProcessor.from_pretrained(self.model_name)
+            model = AutoModel.from_pretrained(self.model_name)
+            model.eval()
+            print(f"[向量编码] 已加载 {self.model_name}")
+            self._processor = processor
+            self._model = model
+
+    @property
+    def dim(self) -> int:
+        self._load()
+        return int(self._model.config.projection_dim)
+
+    @staticmethod
+    def _normalize(features) -> np.ndarray:
+        vectors = features.detach().cpu().numpy().astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def encode_images(self, image_paths: List[str]) -> np.ndarray:
+        """编码多张图片，返回 (n, dim) 的归一化向量"""
+        import torch
+        from PIL import Image
+
+        self._load()
+        images = []
+        for path in image_paths:
+            with Image.open(path) as img:
+                # 模型输入只有224px，先用draft让JPEG以缩小尺寸解码
+                img.draft('RGB', (448, 448))
+                images.append(img.convert('RGB'))
+        inputs = self._processor(images=images, return_tensors='pt')
+        with torch.no_grad():
+            features = self._model.get_image_features(**inputs)
+        return self._normalize(features)
+
+    def encode_image(self, image_path: str) -> np.ndarray:
+        return self.encode_images([image_path])[0]
+
+    @lru_cache(maxsize=256)
+    def encode_text(self, text: str) -> np.ndarray:
+        """编码查询文本，返回 (dim,) 的归一化向量（相同查询会被缓存）"""
+        import torch
+
+        self._load()
+        inputs = self._processor(text=[text], return_tensors='pt', padding=True)
+        with torch.no_grad():
+            features = self._model.get_text_features(**inputs)
+        return self._normalize(features)[0]
+
+
+# 全局编码器实例
+_encoder = None
+_encoder_lock = threading.Lock()
+
+def get_encoder() -> ClipEncoder:
+    """获取向量编码器单例"""
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                _encoder = ClipEncoder()
+    return _encoder
@@ -0,0 +1,420 @@
+"""
+轻量EXIF读取：只读取文件中的元数据段，直接解析需要的IFD条目
+- JPEG：依次跳过各段，只读取 APP1 Exif 段（遇到图像数据 SOS 即停止）
+- HEIC/HEIF/AVIF：解析 meta 盒中的 iinf/iloc，只读取 Exif 数据项
+- PNG：eXIf 块；WebP：EXIF 块；TIFF：按需随机读取
+单个文件的读取量上限为 MAX_METADATA_BYTES，不解码像素，也不需要第二个解析器
+"""
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from exifread.tags import EXIF_TAGS
+
+# 单个元数据段的读取上限（APP1段本身最大64KB，HEIC的meta/Exif项通常也只有几十KB）
+MAX_METADATA_BYTES = 1024 * 1024
+# HEIC等容器格式最多遍历的顶层盒子数
+MAX_TOP_LEVEL_BOXES = 64
+
+# IFD0
+TAG_MAKE = 0x010F
+TAG_MODEL = 0x0110
+TAG_DATETIME = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_GPS_IFD = 0x8825
+# Exif IFD
+TAG_EXPOSURE_TIME = 0x829A
+TAG_FNUMBER = 0x829D
+TAG_ISO = 0x8827
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_DATETIME_DIGITIZED = 0x9004
+TAG_METERING_MODE = 0x9207
+TAG_FLASH = 0x9209
+TAG_FOCAL_LENGTH = 0x920A
+TAG_EXPOSURE_MODE = 0xA402
+TAG_WHITE_BALANCE = 0xA403
+# GPS IFD
+TAG_GPS_LATITUDE_REF = 1
+TAG_GPS_LATITUDE = 2
+TAG_GPS_LONGITUDE_REF = 3
+TAG_GPS_LONGITUDE = 4
+
+IFD0_TAGS = {TAG_MAKE, TAG_MODEL, TAG_DATETIME, TAG_EXIF_IFD, TAG_GPS_IFD}
+EXIF_IFD_TAGS = {TAG_EXPOSURE_TIME, TAG_FNUMBER, TAG_ISO, TAG_DATETIME_ORIGINAL, TAG_DATETIME_DIGITIZED,
+                 TAG_METERING_MODE, TAG_FLASH, TAG_FOCAL_LENGTH, TAG_EXPOSURE_MODE, TAG_WHITE_BALANCE}
+GPS_IFD_TAGS = {TAG_GPS_LATITUDE_REF, TAG_GPS_LATITUDE, TAG_GPS_LONGITUDE_REF, TAG_GPS_LONGITUDE}
+
+# 字段类型 -> (单个值字节数, struct格式)
+FIELD_TYPES = {
+    1: (1, 'B'), 2: (1, 's'), 3: (2, 'H'), 4: (4, 'L'), 5: (8, 'LL'),
+    6: (1, 'b'), 7: (1, 'B'), 8: (2, 'h'), 9: (4, 'l'), 10: (8, 'll'),
+}
+# 单个IFD最多解析的条目数，防止损坏文件导致长时间循环
+MAX_IFD_ENTRIES = 512
+
+DATE_FORMATS = ['%Y:%m:%d %H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y/%m/%d %H:%M:%S', '%Y-%m-%d %H:%M:%S.%f']
+
+
+# ---------------------------------------------------------------------------
+# 定位元数据段：返回TIFF结构的读取函数 read(offset, size)，offset相对TIFF头
+# ---------------------------------------------------------------------------
+
+def _buffer_reader(data: bytes) -> Callable[[int, int], bytes]:
+    return lambda offset, size: data[offset:offset + size]
+
+
+def _file_reader(f, base: int) -> Callable[[int, int], bytes]:
+    def read(offset, size):
+        f.seek(base + offset)
+        return f.read(min(size, MAX_METADATA_BYTES))
+    return read
+
+
+def _exif_payload(data: bytes) -> Optional[bytes]:
+    """去掉 'Exif\\0\\0' 前缀，返回以 II/MM 开头的TIFF数据"""
+    if data.startswith(b'Exif\x00\x00'):
+        data = data[6:]
+    if data[:4] in (b'II*\x00', b'MM\x00*'):
+        return data
+    return None
+
+
+def _jpeg_exif(f) -> Optional[bytes]:
+    f.seek(2)
+    while True:
+        header = f.read(4)
+        if len(header) < 4 or header[0] != 0xFF:
+            return None
+        marker = header[1]
+        if marker == 0xFF:
+            # 填充字节
+            f.seek(-3, os.SEEK_CUR)
+            continue
+        if marker in (0xDA, 0xD9):
+            # 图像数据开始，元数据段已经结束
+            return None
+        length = struct.unpack('>H', header[2:])[0]
+        if length < 2:
+            return None
+        if marker == 0xE1:
+            payload = _exif_payload(f.read(length - 2))
+            if payload is not None:
+                return payload
+        else:
+            f.seek(length - 2, os.SEEK_CUR)
+
+
+def _png_exif(f) -> Optional[bytes]:
+    f.seek(8)
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        length, chunk_type = struct.unpack('>I4s', header)
+        if chunk_type == b'eXIf':
+            return _exif_payload(f.read(min(length, MAX_METADATA_BYTES)))
+        if chunk_type in (b'IDAT', b'IEND'):
+            return None
+        f.seek(length + 4, os.SEEK_CUR)
+
+
+def _webp_exif(f) -> Optional[bytes]:
+    f.seek(12)
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        chunk_type, length = struct.unpack('<4sI', header)
+        if chunk_type == b'EXIF':
+            return _exif_payload(f.read(min(length, MAX_METADATA_BYTES)))
+        f.seek(length + (length & 1), os.SEEK_CUR)
+
+
+def _iter_boxes(data: bytes, start: int = 0, end: int = None) -> Iterator[Tuple[bytes, int, int]]:
+    """遍历ISO BMFF盒子，返回 (类型, 内容起始, 内容结束)"""
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack('>I4s', data[offset:offset + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', data[offset + 8:offset + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield box_type, offset + header, min(offset + size, end)
+        offset += size
+
+
+def _read_uint(data: bytes, offset: int, size: int) -> Tuple[int, int]:
+    if size == 0:
+        return 0, offset
+    return int.from_bytes(data[offset:offset + size], 'big'), offset + size
+
+
+def _heif_exif_location(meta: bytes) -> Optional[Tuple[int, int]]:
+    """在meta盒内容中查找Exif数据项，返回其在文件中的 (偏移, 长度)"""
+    exif_item = None
+    iloc = None
+    # meta 是FullBox，跳过4字节的版本/标志
+    for box_type, start, end in _iter_boxes(meta, 4):
+        if box_type == b'iinf':
+            version = meta[start]
+            offset = start + 4 + (2 if version == 0 else 4)
+            for entry_type, entry_start, _ in _iter_boxes(meta, offset, end):
+                if entry_type != b'infe' or meta[entry_start] < 2:
+                    continue
+                id_size = 2 if meta[entry_start] == 2 else 4
+                item_id, pos = _read_uint(meta, entry_start + 4, id_size)
+                if meta[pos + 2:pos + 6] == b'Exif':
+                    exif_item = item_id
+                    break
+        elif box_type == b'iloc':
+            iloc = (start, end)
+    if exif_item is None or iloc is None:
+        return None
+
+    start, _ = iloc
+    version = meta[start]
+    offset_size, length_size = meta[start + 4] >> 4, meta[start + 4] & 0x0F
+    base_offset_size = meta[start + 5] >> 4
+    index_size = meta[start + 5] & 0x0F if version in (1, 2) else 0
+    pos = start + 6
+    item_count, pos = _read_uint(meta, pos, 2 if version < 2 else 4)
+    for _ in range(item_count):
+        item_id, pos = _read_uint(meta, pos, 2 if version < 2 else 4)
+        if version in (1, 2):
+            pos += 2  # construction_method
+        pos += 2  # data_reference_index
+        base_offset, pos = _read_uint(meta, pos, base_offset_size)
+        extent_count, pos = _read_uint(meta, pos, 2)
+        extents = []
+        for _ in range(extent_count):
+            pos += index_size
+            extent_offset, pos = _read_uint(meta, pos, offset_size)
+            extent_length, pos = _read_uint(meta, pos, length_size)
+            extents.append((base_offset + extent_offset, extent_length))
+        if item_id == exif_item and extents:
+            return extents[0]
+    return None
+
+
+def _heif_exif(f) -> Optional[bytes]:
+    f.seek(0)
+    position = 0
+    for _ in range(MAX_TOP_LEVEL_BOXES):
+        f.seek(position)
+        header = f.read(16)
+        if len(header) < 8:
+            return None
+        size, box_type = struct.unpack('>I4s', header[:8])
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', header[8:16])[0]
+            header_size = 16
+        if size < header_size:
+            return None
+        if box_type == b'meta':
+            if size > MAX_METADATA_BYTES:
+                return None
+            f.seek(position + header_size)
+            location = _heif_exif_location(f.read(size - header_size))
+            if location is None:
+                return None
+            offset, length = location
+            f.seek(offset)
+            item = f.read(min(length, MAX_METADATA_BYTES))
+            # Exif数据项以4字节的TIFF头偏移开头
+            if len(item) < 4:
+                return None
+            skip = struct.unpack('>I', item[:4])[0]
+            return _exif_payload(item[4 + skip:])
+        position += size
+    return None
+
+
+HEIF_BRANDS = {b'heic', b'heix', b'hevc', b'hevx', b'heim', b'heis', b'mif1', b'msf1', b'avif', b'avis'}
+
+
+def _open_tiff(f) -> Optional[Callable[[int, int], bytes]]:
+    """识别文件格式并返回TIFF结构的读取函数，没有EXIF时返回None"""
+    head = f.read(16)
+    if head[:2] == b'\xff\xd8':
+        payload = _jpeg_exif(f)
+    elif head[:8] == b'\x89PNG\r\n\x1a\n':
+        payload = _png_exif(f)
+    elif head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        payload = _webp_exif(f)
+    elif head[4:8] == b'ftyp' and head[8:12] in HEIF_BRANDS:
+        payload = _heif_exif(f)
+    elif head[:4] in (b'II*\x00', b'MM\x00*'):
+        # TIFF文件本身就是TIFF结构，IFD可能位于文件任意位置，按需读取
+        return _file_reader(f, 0)
+    else:
+        return None
+    return _buffer_reader(payload) if payload else None
+
+
+# ---------------------------------------------------------------------------
+# TIFF/IFD解析
+# ---------------------------------------------------------------------------
+
+def _read_ifd(read, offset: int, endian: str, wanted: set) -> Dict[int, object]:
+    """解析一个IFD中需要的条目，返回 {标签: 值}；多个值的字段返回元组"""
+    count_data = read(offset, 2)
+    if len(count_data) < 2:
+        return {}
+    count = min(struct.unpack(endian + 'H', count_data)[0], MAX_IFD_ENTRIES)
+    entries = read(offset + 2, count * 12)
+    values = {}
+    for index in range(len(entries) // 12):
+        tag, field_type, value_count, value_offset = struct.unpack(
+            endian + 'HHI4s', entries[index * 12:index * 12 + 12])
+        if tag not in wanted or field_type not in FIELD_TYPES:
+            continue
+        unit, fmt = FIELD_TYPES[field_type]
+        size = unit * value_count
+        if size <= 4:
+            raw = value_offset[:size]
+        else:
+            if size > MAX_METADATA_BYTES:
+                continue
+            raw = read(struct.unpack(endian + 'I', value_offset)[0], size)
+            if len(raw) < size:
+                continue
+        if field_type == 2:
+            values[tag] = raw.split(b'\x00', 1)[0].decode('utf-8', 'replace').strip()
+        elif field_type in (5, 10):
+            numbers = struct.unpack(endian + fmt[0] * (2 * value_count), raw)
+            values[tag] = tuple(zip(numbers[0::2], numbers[1::2]))
+        else:
+            values[tag] = struct.unpack(endian + fmt * value_count, raw)
+    return values
+
+
+def read_exif_tags(path: str) -> Dict[str, Dict[int, object]]:
+    """读取文件中的IFD0/Exif/GPS条目（只包含本模块需要的标签）"""
+    with open(path, 'rb') as f:
+        read = _open_tiff(f)
+        if read is None:
+            return {}
+        header = read(0, 8)
+        if len(header) < 8:
+            return {}
+        endian = '<' if header[:2] == b'II' else '>'
+        ifd0_offset = struct.unpack(endian + 'I', header[4:8])[0]
+        result = {'ifd0': _read_ifd(read, ifd0_offset, endian, IFD0_TAGS)}
+        if TAG_EXIF_IFD in result['ifd0']:
+            result['exif'] = _read_ifd(read, result['ifd0'][TAG_EXIF_IFD][0], endian, EXIF_IFD_TAGS)
+        if TAG_GPS_IFD in result['ifd0']:
+            result['gps'] = _read_ifd(read, result['ifd0'][TAG_GPS_IFD][0], endian, GPS_IFD_TAGS)
+        return result
+
+
+# ---------------------------------------------------------------------------
+# 转换为业务字段（与原 exifread 实现的取值一致）
+# ---------------------------------------------------------------------------
+
+def _ratio(value) -> Optional[float]:
+    """有理数 (分子, 分母) 转换为小数；非有理数类型的字段按数值处理"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, tuple) or len(value) != 2:
+        return None
+    numerator, denominator = value
+    if denominator == 0:
+        return None
+    return numerator / denominator
+
+
+def _gps_degrees(value) -> Optional[float]:
+    if not value or len(value) < 3:
+        return None
+    parts = [_ratio(part) for part in value[:3]]
+    if any(part is None for part in parts):
+        return None
+    return parts[0] + parts[1] / 60.0 + parts[2] / 3600.0
+
+
+def _printable(tag: int, value) -> str:
+    """枚举值转换为 exifread 的可读文本（如白平衡 0 -> 'Auto'），保证生成的标签不变"""
+    if isinstance(value, str):
+        return value
+    number = value[0]
+    definition = EXIF_TAGS.get(tag)
+    if definition and len(definition) > 1 and isinstance(definition[1], dict):
+        return definition[1].get(number, str(number))
+    return str(number)
+
+
+def _parse_datetime(value: str) -> Optional[datetime]:
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def extract_exif(path: str) -> Dict:
+    """提取拍摄时间、相机、拍摄参数和GPS坐标，字段与 server.extract_exif_data 相同"""
+    try:
+        tags = read_exif_tags(path)
+    except (OSError, struct.error, ValueError, IndexError) as e:
+        print(f"读取EXIF失败: {path}, {e}")
+        return {}
+    if not tags:
+        return {}
+
+    ifd0 = tags.get('ifd0', {})
+    exif = tags.get('exif', {})
+    gps = tags.get('gps', {})
+    exif_data = {}
+
+    for value in (exif.get(TAG_DATETIME_ORIGINAL), exif.get(TAG_DATETIME_DIGITIZED), ifd0.get(TAG_DATETIME)):
+        if isinstance(value, str) and value:
+            taken_at = _parse_datetime(value)
+            if taken_at:
+                exif_data['taken_at'] = taken_at
+                break
+
+    if isinstance(exif.get(TAG_ISO), tuple) and exif[TAG_ISO]:
+        exif_data['iso'] = int(exif[TAG_ISO][0])
+    for key, tag in (('f_number', TAG_FNUMBER), ('exposure_time', TAG_EXPOSURE_TIME),
+                     ('focal_length', TAG_FOCAL_LENGTH)):
+        if isinstance(exif.get(tag), tuple) and exif[tag]:
+            value = _ratio(exif[tag][0])
+            if value is not None:
+                exif_data[key] = value
+    for key, tag in (('white_balance', TAG_WHITE_BALANCE), ('flash', TAG_FLASH),
+                     ('exposure_mode', TAG_EXPOSURE_MODE), ('metering_mode', TAG_METERING_MODE)):
+        if exif.get(tag):
+            exif_data[key] = _printable(tag, exif[tag])
+
+    for key, tag in (('camera_make', TAG_MAKE), ('camera_model', TAG_MODEL)):
+        if isinstance(ifd0.get(tag), str) and ifd0[tag]:
+            exif_data[key] = ifd0[tag]
+
+    lat = _gps_degrees(gps.get(TAG_GPS_LATITUDE))
+    lon = _gps_degrees(gps.get(TAG_GPS_LONGITUDE))
+    if lat is not None and lon is not None:
+        if str(gps.get(TAG_GPS_LATITUDE_REF, 'N')).upper() == 'S':
+            lat = -lat
+        if str(gps.get(TAG_GPS_LONGITUDE_REF, 'E')).upper() == 'W':
+            lon = -lon
+        exif_data['latitude'] = lat
+        exif_data['longitude'] = lon
+
+    return exif_data
+
+
+def extract_exif_many(paths: Iterable[str], workers: int = 8) -> Iterator[Tuple[str, Dict]]:
+    """批量提取（重新扫描已有图库），每个文件只读取少量元数据，用线程池并发I/O"""
+    paths = list(paths)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for path, exif_data in zip(paths, executor.map(extract_exif, paths)):
+            yield path, exif_data
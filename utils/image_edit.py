@@ -0,0 +1,255 @@
+"""
+图片调色引擎
+亮度/对比度合并为一张256项查找表，饱和度为一次3x3颜色矩阵变换，色相在HLS空间旋转；
+按行带逐块处理，整个流程只遍历一次图片，结果与前端算法一致（误差不超过1个色阶）
+
+大图编辑时直接在PIL图像上逐行带读取、调整、写回，额外内存只与行带大小有关；
+MemoryPool 按每次编辑的预估内存限制并发，避免小内存容器中同时编辑多张大图时OOM
+"""
+import math
+import threading
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# 每个行带处理的像素数，控制临时数组大小（约3MB float32）
+STRIP_PIXELS = 1 << 18
+
+GRAY_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+ADJUSTMENT_KEYS = ('brightness', 'contrast', 'saturation', 'hue')
+
+
+def parse_adjustments(data: Dict) -> Dict[str, float]:
+    """从请求数据中读取调色参数，缺省为0"""
+    return {
+        name: float(data.get(name) or 0)
+        for name in ADJUSTMENT_KEYS
+    }
+
+
+def has_adjustments(adjustments: Dict[str, float]) -> bool:
+    return any(value != 0 for value in adjustments.values())
+
+
+def build_tone_lut(brightness: float = 0, contrast: float = 0) -> np.ndarray:
+    """亮度 + 对比度查找表（float32，每步都截断到0-255，与逐像素计算一致）"""
+    lut = np.arange(256, dtype=np.float32)
+    if brightness != 0:
+        lut = np.clip(lut + brightness, 0, 255)
+    if contrast != 0:
+        contrast_factor = (contrast + 100) / 100.0
+        lut = np.clip((lut - 128) * contrast_factor + 128, 0, 255)
+    return lut.astype(np.float32)
+
+
+def saturation_matrix(saturation_factor: float) -> np.ndarray:
+    """饱和度调整的3x3颜色矩阵：out = gray + (x - gray) * factor"""
+    return (saturation_factor * np.eye(3, dtype=np.float32) +
+            (1 - saturation_factor) * np.tile(GRAY_WEIGHTS, (3, 1))).astype(np.float32)
+
+
+def _rotate_hue(strip: np.ndarray, hue_shift: float):
+    """HSL色相旋转（就地，数值范围0-255），L和S保持不变"""
+    strip *= 1 / 255.0
+    hls = cv2.cvtColor(strip, cv2.COLOR_RGB2HLS)
+    hue = hls[:, :, 0]
+    hue += hue_shift
+    np.mod(hue, 360, out=hue)
+    cv2.cvtColor(hls, cv2.COLOR_HLS2RGB, dst=strip)
+    strip *= 255.0
+
+
+def adjust_pixels(pixels: np.ndarray, brightness: float = 0, contrast: float = 0,
+                  saturation: float = 0, hue: float = 0) -> np.ndarray:
+    """对RGB uint8数组就地应用亮度、对比度、饱和度、色相调整并返回该数组"""
+    if pixels.dtype != np.uint8 or pixels.ndim != 3 or pixels.shape[2] != 3:
+        raise ValueError('需要RGB uint8图像数组')
+
+    tone_lut = build_tone_lut(brightness, contrast)
+
+    if saturation == 0 and hue == 0:
+        # 只有亮度/对比度时，整张图就是一次查表
+        if brightness != 0 or contrast != 0:
+            cv2.LUT(pixels, tone_lut.astype(np.uint8), dst=pixels)
+        return pixels
+
+    color_matrix = saturation_matrix((saturation + 100) / 100.0) if saturation != 0 else None
+    lut = tone_lut.reshape(1, 256)
+    height, width = pixels.shape[:2]
+    rows = max(1, STRIP_PIXELS // max(width, 1))
+    for top in range(0, height, rows):
+        target = pixels[top:top + rows]
+        strip = cv2.LUT(target, lut)
+        if color_matrix is not None:
+            strip = cv2.transform(strip, color_matrix)
+            np.clip(strip, 0, 255, out=strip)
+        if hue != 0:
+            _rotate_hue(strip, hue)
+            np.clip(strip, 0, 255, out=strip)
+        # 赋值时float截断为uint8，与原先的 astype(np.uint8) 一致
+        target[...] = strip
+    return pixels
+
+
+def adjust_image(img, adjustments: Dict[str, float], strip_pixels: int = STRIP_PIXELS):
+    """对RGB模式的PIL图像逐行带就地调色，不生成整图大小的NumPy副本"""
+    from PIL import Image
+
+    if not has_adjustments(adjustments):
+        return img
+    width, height = img.size
+    rows = max(1, strip_pixels // max(width, 1))
+    for top in range(0, height, rows):
+        box = (0, top, width, min(top + rows, height))
+        strip = np.array(img.crop(box))
+        adjust_pixels(strip, **adjustments)
+        img.paste(Image.fromarray(strip, 'RGB'), box)
+    return img
+
+
+def estimate_edit_memory(size: Tuple[int, int]) -> int:
+    """预估一次编辑的峰值内存（字节）
+
+    PIL的RGB图像每像素占4字节；旋转/翻转/模式转换时新旧两份图像会同时存在，
+    另加调色行带的临时数组
+    """
+    width, height = size
+    return width * height * 4 * 2 + STRIP_PIXELS * 3 * 4 * 4
+
+
+class MemoryPool:
+    """按字节计数的信号量，限制并发编辑占用的总内存"""
+
+    def __init__(self, capacity_bytes: int):
+        self.capacity = capacity_bytes
+        self.in_use = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, nbytes: int, timeout: float = None) -> bool:
+        """申请nbytes内存额度，超时返回False；单次申请超过总容量时按总容量计"""
+        nbytes = min(nbytes, self.capacity)
+        with self._condition:
+            acquired = self._condition.wait_for(lambda: self.in_use + nbytes <= self.capacity, timeout)
+            if acquired:
+                self.in_use += nbytes
+            return acquired
+
+    def release(self, nbytes: int):
+        nbytes = min(nbytes, self.capacity)
+        with self._condition:
+            self.in_use = max(0, self.in_use - nbytes)
+            self._condition.notify_all()
+
+
+# ---------------------------------------------------------------------------
+# 编辑操作：一次编辑请求记录为一个操作（裁剪 -> 旋转 -> 翻转 -> 调色），
+# 照片的某个编辑版本 = 从原图依次应用该版本及之前的所有操作
+# ---------------------------------------------------------------------------
+
+def normalize_operation(data: Dict) -> Dict:
+    """从编辑请求中提取有效的操作参数（去掉无效果的默认值）"""
+    operation = {}
+
+    crop = data.get('crop')
+    if isinstance(crop, dict):
+        operation['crop'] = {key: int(crop.get(key, 0) or 0) for key in ('x', 'y', 'width', 'height')}
+
+    rotation_deg = int(data.get('rotation_deg') or 0) % 360
+    if rotation_deg:
+        operation['rotation_deg'] = rotation_deg
+    if data.get('flip_horizontal'):
+        operation['flip_horizontal'] = True
+    if data.get('flip_vertical'):
+        operation['flip_vertical'] = True
+
+    for name, value in parse_adjustments(data).items():
+        if value != 0:
+            operation[name] = value
+    return operation
+
+
+def crop_box(size: Tuple[int, int], crop: Dict) -> Optional[Tuple[int, int, int, int]]:
+    """把裁剪参数限制在图片范围内，返回裁剪框；参数无效时返回None"""
+    image_width, image_height = size
+    x = max(0, int(crop.get('x', 0)))
+    y = max(0, int(crop.get('y', 0)))
+    width = min(int(crop.get('width', 0)), image_width - x)
+    height = min(int(crop.get('height', 0)), image_height - y)
+    if width > 0 and height > 0 and x < image_width and y < image_height:
+        return (x, y, x + width, y + height)
+    return None
+
+
+def rotated_size(size: Tuple[int, int], rotation_deg: float) -> Tuple[int, int]:
+    """顺时针旋转rotation_deg（expand=True）后的尺寸，与PIL的计算方式一致"""
+    width, height = size
+    angle = rotation_deg % 360
+    if angle in (0, 180):
+        return size
+    if angle in (90, 270):
+        return (height, width)
+
+    radians = math.radians(angle)  # PIL内部使用 -(-angle)
+    a, b = round(math.cos(radians), 15), round(math.sin(radians), 15)
+    d, e = round(-math.sin(radians), 15), round(math.cos(radians), 15)
+    cx, cy = width / 2, height / 2
+    c = a * -cx + b * -cy + cx
+    f = d * -cx + e * -cy + cy
+    corners = ((0, 0), (width, 0), (width, height), (0, height))
+    xs = [a * x + b * y + c for x, y in corners]
+    ys = [d * x + e * y + f for x, y in corners]
+    return (math.ceil(max(xs)) - math.floor(min(xs)), math.ceil(max(ys)) - math.floor(min(ys)))
+
+
+def operation_size(size: Tuple[int, int], operation: Dict) -> Tuple[int, int]:
+    """不解码图片，计算应用操作后的图片尺寸"""
+    if 'crop' in operation:
+        box = crop_box(size, operation['crop'])
+        if box:
+            size = (box[2] - box[0], box[3] - box[1])
+    if operation.get('rotation_deg'):
+        size = rotated_size(size, operation['rotation_deg'])
+    return size
+
+
+def to_rgb(img):
+    """转换为RGB模式，透明通道以白色背景合成"""
+    from PIL import Image
+
+    if img.mode == 'RGB':
+        return img
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[3])
+        return background
+    return img.convert('RGB')
+
+
+def apply_operation(img, operation: Dict):
+    """对RGB图像应用一个编辑操作，返回结果图像"""
+    from PIL import Image
+
+    if 'crop' in operation:
+        box = crop_box(img.size, operation['crop'])
+        if box:
+            img = img.crop(box)
+        else:
+            print(f"裁剪参数无效: {operation['crop']}, 图片尺寸={img.size}")
+
+    # 旋转（与前端一致，顺时针为正；PIL 的 rotate 正角度为逆时针）
+    rotation_deg = operation.get('rotation_deg', 0)
+    if rotation_deg:
+        img = img.rotate(-rotation_deg, expand=True)
+
+    if operation.get('flip_horizontal'):
+        img = img.transpose(Image.FLIP_LEFT_RIGHT)
+    if operation.get('flip_vertical'):
+        img = img.transpose(Image.FLIP_TOP_BOTTOM)
+
+    img = to_rgb(img)
+    adjust_image(img, parse_adjustments(operation))
+    return img
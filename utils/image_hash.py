@@ -0,0 +1,146 @@
+"""
+图片哈希：内容SHA-256（精确去重）与感知哈希pHash（近似重复检测）
+近似查找使用多索引哈希：64位哈希分成4段，按鸽巢原理在各段内召回候选
+"""
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+HASH_BITS = 64
+CHUNK_COUNT = 4
+CHUNK_BITS = HASH_BITS // CHUNK_COUNT
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def sha256_file(path: str) -> str:
+    """分块计算文件的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def phash_image(img) -> int:
+    """计算PIL图片的64位pHash（32x32灰度图DCT低频8x8与中位数比较）"""
+    import cv2
+    from PIL import Image
+
+    # JPEG以缩小尺寸解码，避免为了32x32的结果解码全图
+    img.draft('L', (128, 128))
+    gray = img.convert('L').resize((32, 32), Image.Resampling.BOX)
+    dct = cv2.dct(np.asarray(gray, dtype=np.float32))
+    low = dct[:8, :8].ravel()
+    # 直流分量不参与中位数计算
+    median = np.median(low[1:])
+    bits = low > median
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def phash_file(path: str) -> Optional[int]:
+    """计算图片文件的pHash，无法解码时返回None"""
+    from PIL import Image
+    try:
+        with Image.open(path) as img:
+            return phash_image(img)
+    except Exception:
+        return None
+
+
+def hash_to_hex(value: int) -> str:
+    return f'{value:016x}'
+
+
+def hex_to_hash(value: str) -> int:
+    return int(value, 16)
+
+
+# 每个字节中1的个数，用于向量化计算汉明距离
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def hamming_array(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """逐元素计算两个uint64数组的汉明距离"""
+    xor = np.ascontiguousarray(np.bitwise_xor(a, b))
+    return _POPCOUNT_TABLE[xor.view(np.uint8).reshape(-1, 8)].sum(axis=1)
+
+
+def _chunk_flips(radius: int) -> List[int]:
+    """列出汉明重量不超过radius的所有16位掩码"""
+    result = [0]
+    frontier = [(0, -1)]
+    for _ in range(radius):
+        next_frontier = []
+        for value, last_bit in frontier:
+            for bit in range(last_bit + 1, CHUNK_BITS):
+                flipped = value | (1 << bit)
+                result.append(flipped)
+                next_frontier.append((flipped, bit))
+        frontier = next_frontier
+    return result
+
+
+def near_duplicate_pairs(hashes: np.ndarray, radius: int) -> np.ndarray:
+    """返回汉明距离不超过radius的下标对 (i, j)，i < j
+
+    多索引哈希：距离不超过radius时，4段中至少有一段的距离不超过 radius // 4，
+    因此只需在每段内按“翻转不超过该位数”的键做连接，再用完整哈希过滤候选
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    flips = _chunk_flips(radius // CHUNK_COUNT)
+    found = []
+    for chunk_index in range(CHUNK_COUNT):
+        chunks = ((hashes >> np.uint64(CHUNK_BITS * chunk_index)) & np.uint64(CHUNK_MASK)).astype(np.int64)
+        order = np.argsort(chunks, kind='stable')
+        sorted_chunks = chunks[order]
+        for flip in flips:
+            keys = chunks ^ flip
+            left = np.searchsorted(sorted_chunks, keys, side='left')
+            right = np.searchsorted(sorted_chunks, keys, side='right')
+            counts = right - left
+            if not counts.any():
+                continue
+            a = np.repeat(np.arange(len(hashes)), counts)
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            b = order[np.repeat(left, counts) + offsets]
+            keep = a < b
+            a, b = a[keep], b[keep]
+            keep = hamming_array(hashes[a], hashes[b]) <= radius
+            if keep.any():
+                found.append(np.stack([a[keep], b[keep]], axis=1))
+    if not found:
+        return np.zeros((0, 2), dtype=np.int64)
+    return np.unique(np.concatenate(found), axis=0)
+
+
+def cluster_near_duplicates(items: Iterable[Tuple[int, int]], radius: int) -> List[List[int]]:
+    """按pHash汉明距离聚类（并查集），返回包含2个及以上成员的分组"""
+    items = list(items)
+    if not items:
+        return []
+    keys = [key for key, _ in items]
+    hashes = np.array([value for _, value in items], dtype=np.uint64)
+
+    parent = list(range(len(items)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in near_duplicate_pairs(hashes, radius):
+        root_a, root_b = find(int(i)), find(int(j))
+        if root_a != root_b:
+            parent[root_b] = root_a
+
+    groups: Dict[int, List[int]] = {}
+    for i, key in enumerate(keys):
+        groups.setdefault(find(i), []).append(key)
+    return [sorted(members) for members in groups.values() if len(members) > 1]
@@ -0,0 +1,106 @@
+"""
+JPEG无损几何变换：调用 jpegtran 直接在DCT系数上旋转/翻转/裁剪，不经过解码和重新压缩
+只有所有编辑操作都是几何操作（90°倍数旋转、翻转、起点对齐MCU的裁剪）时才能使用，
+其余情况（调色、任意角度旋转、边缘MCU不完整等）由调用方回退到解码-重新编码
+"""
+import os
+import shutil
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+from utils.image_edit import ADJUSTMENT_KEYS, crop_box
+
+JPEGTRAN_TIMEOUT = 30
+
+
+def jpegtran_path() -> Optional[str]:
+    """jpegtran 可执行文件路径（可用 JPEGTRAN_PATH 指定），未安装时返回None"""
+    return os.getenv('JPEGTRAN_PATH') or shutil.which('jpegtran')
+
+
+def mcu_size(img) -> Tuple[int, int]:
+    """JPEG的MCU尺寸（由最大采样因子决定，如4:2:0为16x16，4:4:4和灰度图为8x8）"""
+    layers = getattr(img, 'layer', None) or []
+    if not layers:
+        return (8, 8)
+    return (8 * max(layer[1] for layer in layers), 8 * max(layer[2] for layer in layers))
+
+
+def is_geometry_only(operation: Dict) -> bool:
+    """操作是否只包含裁剪、90°倍数旋转和翻转"""
+    if any(operation.get(name) for name in ADJUSTMENT_KEYS):
+        return False
+    return operation.get('rotation_deg', 0) % 90 == 0
+
+
+def plan_transforms(size: Tuple[int, int], mcu: Tuple[int, int], operations: List[Dict]) -> Optional[List[List[str]]]:
+    """把编辑操作转换为依次执行的 jpegtran 参数列表，无法无损完成时返回None
+
+    jpegtran 会把不对齐的裁剪起点向左上移动到MCU边界，因此起点必须对齐；
+    旋转/翻转时边缘不完整的MCU由 -perfect 检查，失败时同样回退
+    """
+    steps = []
+    for operation in operations:
+        if not is_geometry_only(operation):
+            return None
+
+        if 'crop' in operation:
+            box = crop_box(size, operation['crop'])
+            if box:
+                if box[0] % mcu[0] or box[1] % mcu[1]:
+                    return None
+                width, height = box[2] - box[0], box[3] - box[1]
+                steps.append(['-crop', f'{width}x{height}+{box[0]}+{box[1]}'])
+                size = (width, height)
+
+        rotation_deg = operation.get('rotation_deg', 0) % 360
+        if rotation_deg:
+            steps.append(['-rotate', str(rotation_deg)])
+            if rotation_deg in (90, 270):
+                size = (size[1], size[0])
+                mcu = (mcu[1], mcu[0])
+
+        if operation.get('flip_horizontal'):
+            steps.append(['-flip', 'horizontal'])
+        if operation.get('flip_vertical'):
+            steps.append(['-flip', 'vertical'])
+    return steps
+
+
+def lossless_render(source_path: str, output_path: str, operations: List[Dict]) -> bool:
+    """尝试无损地把编辑操作应用到JPEG原图并写入output_path，成功返回True"""
+    from PIL import Image
+
+    jpegtran = jpegtran_path()
+    if not jpegtran or not operations:
+        return False
+    try:
+        with Image.open(source_path) as img:
+            # CMYK等模式在重新编码路径中会转换为RGB，这里只处理无需转换的图片
+            if img.format != 'JPEG' or img.mode not in ('RGB', 'L'):
+                return False
+            steps = plan_transforms(img.size, mcu_size(img), operations)
+    except Exception:
+        return False
+    if steps is None:
+        return False
+
+    with open(source_path, 'rb') as f:
+        data = f.read()
+    for args in steps:
+        # 元数据不复制，与重新编码的渲染结果一致（避免EXIF方向被重复应用）
+        command = [jpegtran, '-copy', 'none', '-optimize', *args]
+        if args[0] != '-crop':
+            command.insert(1, '-perfect')
+        try:
+            result = subprocess.run(command, input=data, capture_output=True, timeout=JPEGTRAN_TIMEOUT)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f"jpegtran 执行失败: {e}")
+            return False
+        if result.returncode != 0 or not result.stdout:
+            return False
+        data = result.stdout
+
+    with open(output_path, 'wb') as f:
+        f.write(data)
+    return True
@@ -0,0 +1,158 @@
+"""
+本地图片分类模型服务
+模型常驻内存（首次使用时加载），后台线程把排队的图片合并成小批量推理
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+DEFAULT_MODEL = 'microsoft/resnet-50'
+
+
+class LocalModelServer:
+    """常驻的本地分类模型，支持微批处理推理
+
+    配置（环境变量）：
+        LOCAL_MODEL_NAME       模型名称或本地路径，默认 microsoft/resnet-50
+        LOCAL_MODEL_BACKEND    torch（默认）或 onnx（需要 optimum[onnxruntime]）
+        LOCAL_MODEL_BATCH_SIZE 每批最多图片数，默认 8
+        LOCAL_MODEL_BATCH_WAIT_MS 凑批最长等待时间（毫秒），默认 20
+        LOCAL_MODEL_THREADS    CPU推理线程数，默认为CPU核数
+    """
+
+    def __init__(self, model_name: Optional[str] = None, backend: Optional[str] = None,
+                 batch_size: Optional[int] = None, batch_wait_ms: Optional[float] = None,
+                 num_threads: Optional[int] = None):
+        self.model_name = model_name or os.getenv('LOCAL_MODEL_NAME', DEFAULT_MODEL)
+        self.backend = (backend or os.getenv('LOCAL_MODEL_BACKEND', 'torch')).lower()
+        self.batch_size = max(1, batch_size or int(os.getenv('LOCAL_MODEL_BATCH_SIZE', '8')))
+        wait_ms = batch_wait_ms if batch_wait_ms is not None else float(os.getenv('LOCAL_MODEL_BATCH_WAIT_MS', '20'))
+        self.batch_wait = max(0.0, wait_ms / 1000.0)
+        self.num_threads = num_threads or int(os.getenv('LOCAL_MODEL_THREADS', '0')) or (os.cpu_count() or 1)
+
+        self._classifier = None
+        self._load_lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+
+    def _load(self):
+        """加载模型（只执行一次）"""
+        if self._classifier is not None:
+            return self._classifier
+        with self._load_lock:
+            if self._classifier is not None:
+                return self._classifier
+
+            from transformers import pipeline
+
+            try:
+                import torch
+                torch.set_num_threads(self.num_threads)
+            except ImportError:
+                pass
+
+            if self.backend == 'onnx':
+                # ONNX Runtime 推理；如需INT8，可将 LOCAL_MODEL_NAME 指向已量化导出的模型目录
+                from optimum.onnxruntime import ORTModelForImageClassification
+                from transformers import AutoImageProcessor
+
+                export = not os.path.isdir(self.model_name)
+                model = ORTModelForImageClassification.from_pretrained(self.model_name, export=export)
+                processor = AutoImageProcessor.from_pretrained(self.model_name)
+                classifier = pipeline('image-classification', model=model, image_processor=processor)
+            else:
+                classifier = pipeline('image-classification', model=self.model_name, device=-1)
+
+            print(f"[本地模型] 已加载 {self.model_name} (backend={self.backend}, threads={self.num_threads})")
+            self._classifier = classifier
+        return self._classifier
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._load_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='local-model-worker', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        """后台线程：取出排队请求，凑满批量或等待超时后统一推理"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._infer_batch(batch)
+
+    def _infer_batch(self, batch):
+        from PIL import Image
+
+        futures = []
+        images = []
+        for image_path, top_k, future in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with Image.open(image_path) as img:
+                    images.append(img.convert('RGB'))
+                futures.append((future, top_k))
+            except Exception as e:
+                future.set_exception(e)
+
+        if not images:
+            return
+
+        try:
+            classifier = self._load()
+            max_k = max(top_k for _, top_k in futures)
+            results = classifier(images, top_k=max_k, batch_size=len(images))
+            for (future, top_k), result in zip(futures, results):
+                future.set_result(result[:top_k])
+        except Exception as e:
+            for future, _ in futures:
+                if not future.done():
+                    future.set_exception(e)
+
+    def submit(self, image_path: str, top_k: int = 5) -> Future:
+        """提交一张图片，返回Future，结果为 [{'label':..., 'score':...}, ...]"""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((image_path, top_k, future))
+        return future
+
+    def classify(self, image_path: str, top_k: int = 5, timeout: Optional[float] = None) -> List[Dict]:
+        """同步分类单张图片（与其他并发请求合并成批）"""
+        return self.submit(image_path, top_k).result(timeout=timeout)
+
+    def classify_many(self, image_paths: List[str], top_k: int = 5) -> List[List[Dict]]:
+        """批量分类多张图片"""
+        futures = [self.submit(path, top_k) for path in image_paths]
+        return [future.result() for future in futures]
+
+    def warmup(self):
+        """预加载模型并启动后台线程"""
+        self._load()
+        self._ensure_worker()
+
+
+# 全局模型服务实例
+_server = None
+_server_lock = threading.Lock()
+
+def get_local_model() -> LocalModelServer:
+    """获取本地模型服务单例"""
+    global _server
+    if _server is None:
+        with _server_lock:
+            if _server is None:
+                _server = LocalModelServer()
+    return _server
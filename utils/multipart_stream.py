@@ -0,0 +1,54 @@
+"""
+流式解析 multipart/form-data 请求体
+边读取请求流边产生事件，文件内容按块交给调用方写入，不经过 Werkzeug 的临时文件
+"""
+from typing import BinaryIO, Iterator, Tuple
+
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+READ_CHUNK_SIZE = 64 * 1024
+MAX_FIELD_SIZE = 64 * 1024
+
+
+def iter_multipart(stream: BinaryIO, boundary: bytes, max_parts: int = 10000) -> Iterator[Tuple]:
+    """按顺序产生事件：
+
+    ('field', 名称, 值)       普通表单字段（值为字符串）
+    ('file', 名称, 文件名)    一个文件开始
+    ('data', 字节)            当前文件的一块内容
+    ('end',)                  当前文件结束
+
+    请求体不完整或格式错误时抛出 ValueError
+    """
+    decoder = MultipartDecoder(boundary, max_form_memory_size=MAX_FIELD_SIZE, max_parts=max_parts)
+    field_name = None
+    field_value = []
+    in_file = False
+    finished = False
+    while not finished:
+        chunk = stream.read(READ_CHUNK_SIZE)
+        decoder.receive_data(chunk or None)
+        event = decoder.next_event()
+        while not isinstance(event, NeedData):
+            if isinstance(event, File):
+                in_file = True
+                yield ('file', event.name, event.filename or '')
+            elif isinstance(event, Field):
+                field_name, field_value = event.name, []
+            elif isinstance(event, Data):
+                if in_file:
+                    if event.data:
+                        yield ('data', event.data)
+                    if not event.more_data:
+                        in_file = False
+                        yield ('end',)
+                else:
+                    field_value.append(event.data)
+                    if not event.more_data:
+                        yield ('field', field_name, b''.join(field_value).decode('utf-8', 'replace'))
+            elif isinstance(event, Epilogue):
+                finished = True
+                break
+            event = decoder.next_event()
+        if not chunk and not finished:
+            raise ValueError('请求体不完整')
@@ -0,0 +1,82 @@
+"""
+图片接口（/api/thumbnail、/api/photo、缩略图打包）的照片归属缓存
+
+照片ID -> PhotoAccess（所有者、原图路径、缩略图路径、编辑版本和修订号），第一次访问时从数据库加载，
+之后同一张照片的图片请求不再查询数据库。编辑、删除提交后调用 invalidate，只对当前进程生效。
+
+多进程/多节点部署时，每条记录还保存加载时所有者在响应缓存中的代次（user_data_changed 会把它加一），
+使用前与当前代次比较，不一致就重新加载。代次只有配置了 RESPONSE_CACHE_REDIS_URL 时才在进程间共享；
+使用进程内响应缓存（或关闭响应缓存、Redis 暂时不可用）时，其他进程的修改只能由过期时间兜底，
+这种部署只适合单进程，多进程时应配置 Redis 或设置 PHOTO_ACCESS_CACHE_ENABLED=false。
+
+加载与失效并发时（读到旧数据的请求在失效之后才写入），用失效计数判断并丢弃这次写入。
+"""
+import threading
+import time
+from typing import Iterable, Optional
+
+
+class PhotoAccess:
+    """图片接口需要的照片字段；属性名与 Photo 相同，可以直接传给 render_photo 等函数"""
+
+    __slots__ = ('id', 'user_id', 'file_path', 'thumbnail_path', 'edit_version', 'edit_revision', 'generation',
+                 'expires')
+
+    def __init__(self, photo, expires: float, generation: Optional[int] = None):
+        self.id = photo.id
+        self.user_id = photo.user_id
+        self.file_path = photo.file_path
+        self.thumbnail_path = photo.thumbnail_path
+        self.edit_version = photo.edit_version or 0
+        self.edit_revision = photo.edit_revision or 0
+        self.generation = generation
+        self.expires = expires
+
+
+class PhotoAccessCache:
+    """照片ID -> PhotoAccess；超过 max_entries 时淘汰最早加入的记录"""
+
+    def __init__(self, max_entries: int = 100000, ttl: int = 300, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries = {}
+        self._invalidations = 0
+        self._lock = threading.Lock()
+
+    def get(self, photo_id: int) -> Optional[PhotoAccess]:
+        record = self._entries.get(photo_id)
+        if record is None or record.expires < time.monotonic():
+            return None
+        return record
+
+    def token(self) -> int:
+        """查询数据库之前取得，随后传给 put"""
+        return self._invalidations
+
+    def put(self, photo, token: int, generation: Optional[int] = None) -> PhotoAccess:
+        """由 Photo 对象（或包含相同列的结果行）生成记录；token 之后发生过失效时只返回记录、不缓存
+
+        generation 为查询数据库之前读取的所有者代次
+        """
+        record = PhotoAccess(photo, time.monotonic() + self.ttl, generation)
+        if not self.enabled:
+            return record
+        with self._lock:
+            if token != self._invalidations:
+                return record
+            self._entries.pop(record.id, None)
+            self._entries[record.id] = record
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+        return record
+
+    def invalidate(self, photo_ids: Iterable[int]):
+        """照片的编辑版本、文件路径变化或照片被删除后（提交之后）调用"""
+        with self._lock:
+            self._invalidations += 1
+            for photo_id in photo_ids:
+                self._entries.pop(photo_id, None)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,218 @@
+"""
+读多写少的JSON接口的按用户响应缓存
+
+缓存键 = 接口名 + 用户ID + 用户的代次 + 规范化后的查询参数。上传、编辑、删除、标签变化时把该用户的代次加一，
+旧代次的缓存不再被命中（随后按LRU/过期淘汰），因此不需要逐个找出受影响的缓存项。
+
+代次与“最近写入”标记（读写分离时，写入后一段时间内改读主库）保存在同一后端，加一和标记在一次操作中完成，
+读取时也一次取得两者：读到新代次的请求一定能看到写入标记，不会从尚未同步的副本读取旧数据并缓存到新代次下。
+
+两种后端：
+- 内存（默认）：进程内LRU，按总字节数淘汰，只适合单进程部署
+- Redis（配置 RESPONSE_CACHE_REDIS_URL，需要安装 redis）：多个进程/节点共用缓存、代次和写入标记
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+# 不参与缓存键的查询参数（JWT令牌、前端防缓存的时间戳）
+IGNORED_PARAMS = {'token', '_'}
+
+
+def normalize_params(items: Iterable[Tuple[str, str]]) -> str:
+    """查询参数按名称排序，去掉空值和不影响结果的参数"""
+    pairs = sorted((key, value) for key, value in items if key not in IGNORED_PARAMS and value != '')
+    return '&'.join(f'{key}={value}' for key, value in pairs)
+
+
+class MemoryBackend:
+    """进程内LRU：值为 (过期时间, 响应字节)，总大小超过 max_bytes 时淘汰最久未使用的项"""
+
+    name = 'memory'
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._generations = {}
+        self._writes = {}  # 用户ID -> 写入标记的过期时间
+        self._lock = threading.Lock()
+
+    def state(self, user_id) -> Tuple[int, bool]:
+        with self._lock:
+            return self._generations.get(user_id, 0), self._writes.get(user_id, 0) > time.monotonic()
+
+    def bump(self, user_id, sticky: float = 0):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            if sticky > 0:
+                now = time.monotonic()
+                self._writes[user_id] = now + sticky
+                if len(self._writes) > 10000:
+                    for key in [key for key, expires in self._writes.items() if expires < now]:
+                        del self._writes[key]
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._bytes -= len(entry[1])
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: bytes, ttl: int):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._bytes += len(value)
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def size(self) -> Tuple[int, int]:
+        with self._lock:
+            return len(self._entries), self._bytes
+
+
+class RedisBackend:
+    """Redis（或兼容服务）：缓存项用SETEX保存，代次用INCR维护，淘汰交给 Redis 的 maxmemory 策略"""
+
+    name = 'redis'
+
+    def __init__(self, url: str, prefix: str = 'photo:resp:'):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.prefix = prefix
+
+    def state(self, user_id) -> Tuple[int, bool]:
+        generation, written = self.client.mget([f'{self.prefix}gen:{user_id}', f'{self.prefix}write:{user_id}'])
+        return (int(generation) if generation else 0), written is not None
+
+    def bump(self, user_id, sticky: float = 0):
+        pipe = self.client.pipeline()
+        if sticky > 0:
+            pipe.set(f'{self.prefix}write:{user_id}', 1, px=int(sticky * 1000))
+        pipe.incr(f'{self.prefix}gen:{user_id}')
+        pipe.execute()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: int):
+        self.client.setex(self.prefix + key, ttl, value)
+
+    def size(self) -> Tuple[int, int]:
+        return -1, -1
+
+
+class ResponseCache:
+    """记录命中率的响应缓存；后端出错时按未命中处理，不影响接口本身"""
+
+    def __init__(self, backend, ttl: int = 300, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self._stats_lock = threading.Lock()
+        self._hits = {}
+        self._misses = {}
+        self._errors = 0
+        self._invalidations = 0
+
+    def key(self, endpoint: str, user_id, generation: Optional[int], params: str) -> Optional[str]:
+        """由 user_state 读到的代次生成缓存键；代次不可用时返回None"""
+        if generation is None:
+            return None
+        return f'{endpoint}:{user_id}:{generation}:{params}'
+
+    def user_state(self, user_id) -> Tuple[Optional[int], bool]:
+        """一次读取 (用户当前代次, 最近是否有写入)；Redis 后端时各进程共用
+
+        缓存关闭时代次为None；后端不可用时返回 (None, True)：不使用缓存，并按刚有写入处理（读主库）
+        """
+        try:
+            generation, written = self.backend.state(user_id)
+        except Exception as e:
+            self._record_error(e)
+            return None, True
+        return (generation if self.enabled else None), written
+
+    def get(self, endpoint: str, key: str) -> Optional[bytes]:
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            self._record_error(e)
+            value = None
+        with self._stats_lock:
+            counter = self._hits if value is not None else self._misses
+            counter[endpoint] = counter.get(endpoint, 0) + 1
+        return value
+
+    def set(self, key: str, value: bytes):
+        try:
+            self.backend.set(key, value, self.ttl)
+        except Exception as e:
+            self._record_error(e)
+
+    def invalidate(self, user_id, sticky: float = 0):
+        """用户的照片、标签或编辑版本变化后调用；sticky > 0 时同时设置这么多秒的写入标记
+
+        缓存关闭时也要设置写入标记（读写分离仍然依赖它）
+        """
+        if not self.enabled and sticky <= 0:
+            return
+        try:
+            self.backend.bump(user_id, sticky)
+        except Exception as e:
+            self._record_error(e)
+        with self._stats_lock:
+            self._invalidations += 1
+
+    def _record_error(self, error):
+        with self._stats_lock:
+            self._errors += 1
+        print(f"响应缓存不可用: {error}")
+
+    def stats(self):
+        with self._stats_lock:
+            endpoints = {}
+            for endpoint in set(self._hits) | set(self._misses):
+                hits = self._hits.get(endpoint, 0)
+                misses = self._misses.get(endpoint, 0)
+                endpoints[endpoint] = {
+                    'hits': hits,
+                    'misses': misses,
+                    'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0
+                }
+            hits = sum(self._hits.values())
+            misses = sum(self._misses.values())
+            result = {
+                'backend': self.backend.name,
+                'enabled': self.enabled,
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                'invalidations': self._invalidations,
+                'errors': self._errors,
+                'endpoints': endpoints
+            }
+        entries, size = self.backend.size()
+        if entries >= 0:
+            result.update(entries=entries, bytes=size)
+        return result
+
+
+def create_response_cache(config) -> ResponseCache:
+    """根据配置（app.config）创建响应缓存"""
+    redis_url = config.get('RESPONSE_CACHE_REDIS_URL')
+    backend = RedisBackend(redis_url) if redis_url else MemoryBackend(config['RESPONSE_CACHE_SIZE'])
+    return ResponseCache(backend, ttl=config['RESPONSE_CACHE_TTL'], enabled=config['RESPONSE_CACHE_ENABLED'])
@@ -0,0 +1,367 @@
+"""
+照片文件存储：按内容SHA-256分片的目录布局
+
+    uploads/ab/cd/<sha256>.<ext>       原图
+    thumbnails/ab/cd/<sha256>.<ext>    缩略图
+
+数据库中的 file_path/thumbnail_path 保存的是上面的相对路径（存储键），由存储驱动解释：
+- LocalStorage：键就是本地路径
+- S3Storage：键是对象名，对象存储在 S3 兼容服务（AWS S3、MinIO 等）中；需要本地处理时下载到缓存目录，
+  客户端可以通过预签名URL直接下载
+
+相同内容只保存一份（不同用户上传同一文件时共享），是否还有照片引用由调用方根据数据库判断后再删除。
+上传过程中的文件先写入本地的 .incoming/ 目录，内容哈希确定后再放到最终位置
+"""
+import mimetypes
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+INCOMING_DIR = '.incoming'
+# 对象存储缓存淘汰时跳过最近这段时间内使用过的文件（可能正在被缩略图/EXIF/渲染处理读取）
+CACHE_MIN_AGE = 300
+# 超过上限后淘汰到上限的这个比例，避免每次新增文件都扫描缓存目录
+CACHE_LOW_WATERMARK = 0.8
+
+
+def remove_local(path: Optional[str]):
+    """删除本地文件（临时文件、缓存文件）"""
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def link_or_copy(source_path: str, target_path: str, link: bool = True):
+    """先写临时文件再替换，目标位置不会出现写了一半的文件"""
+    os.makedirs(os.path.dirname(target_path) or '.', exist_ok=True)
+    tmp_path = f'{target_path}.{uuid.uuid4().hex}.tmp'
+    try:
+        if link:
+            try:
+                os.link(source_path, tmp_path)
+            except OSError:
+                shutil.copyfile(source_path, tmp_path)
+        else:
+            shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, target_path)
+    finally:
+        remove_local(tmp_path)
+
+
+class Storage:
+    """存储驱动的公共部分：存储键布局和本地临时目录"""
+
+    name = ''
+
+    def __init__(self, upload_folder: str, thumbnail_folder: str, local_root: str = ''):
+        self.upload_folder = upload_folder
+        self.thumbnail_folder = thumbnail_folder
+        # 本地文件（上传临时文件、对象存储的缓存）的根目录
+        self.local_root = local_root
+        self.incoming_folder = os.path.join(local_root, upload_folder, INCOMING_DIR)
+
+    @staticmethod
+    def shard_path(root: str, content_hash: str, ext: str) -> str:
+        return os.path.join(root, content_hash[:2], content_hash[2:4], f'{content_hash}.{ext}')
+
+    def original_path(self, content_hash: str, ext: str) -> str:
+        return self.shard_path(self.upload_folder, content_hash, ext)
+
+    def thumbnail_path(self, content_hash: str, ext: str) -> str:
+        return self.shard_path(self.thumbnail_folder, content_hash, ext)
+
+    def incoming_path(self, ext: str) -> str:
+        """上传中文件的临时位置（本地磁盘）"""
+        os.makedirs(self.incoming_folder, exist_ok=True)
+        return os.path.join(self.incoming_folder, f'{uuid.uuid4()}.{ext}')
+
+    def put_original(self, incoming_path: str, content_hash: str, ext: str) -> str:
+        """把已写完的临时文件放到内容地址；相同内容已存在时丢弃临时文件，返回存储键"""
+        key = self.original_path(content_hash, ext)
+        if self.exists(key):
+            os.remove(incoming_path)
+        else:
+            self.put_file(incoming_path, key, move=True)
+        return key
+
+    def import_original(self, source_path: str, content_hash: str, ext: str, link: bool = False) -> Optional[str]:
+        """把外部文件复制（或硬链接）到内容地址；返回新建的存储键，相同内容已存在时返回None"""
+        return self.import_file(source_path, self.original_path(content_hash, ext), link=link)
+
+    def import_file(self, source_path: str, key: str, link: bool = False) -> Optional[str]:
+        if self.exists(key):
+            return None
+        self.put_file(source_path, key, move=False, link=link)
+        return key
+
+    @contextmanager
+    def writing(self, key: str) -> Iterator[str]:
+        """生成文件：产出一个本地路径供写入，退出时保存到存储键"""
+        local_path = self.local_path(key, fetch=False)
+        os.makedirs(os.path.dirname(local_path) or '.', exist_ok=True)
+        yield local_path
+        if os.path.exists(local_path):
+            self.save_local(key)
+
+    # 以下由具体驱动实现
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def put_file(self, source_path: str, key: str, move: bool = False, link: bool = False):
+        raise NotImplementedError
+
+    def save_local(self, key: str):
+        """writing() 写好本地文件后调用"""
+        raise NotImplementedError
+
+    def local_path(self, key: str, fetch: bool = True) -> str:
+        """返回可以直接用 PIL/OpenCV 打开的本地路径（对象存储会先下载到缓存目录）"""
+        raise NotImplementedError
+
+    def delete(self, key: Optional[str]):
+        raise NotImplementedError
+
+    def open(self, key: str) -> Tuple[BinaryIO, Optional[int]]:
+        """流式读取，返回 (可读对象, 字节数)"""
+        raise NotImplementedError
+
+    def presigned_url(self, key: str, expires: int = 3600) -> Optional[str]:
+        """客户端直接下载的临时URL；不支持时返回None"""
+        return None
+
+
+class LocalStorage(Storage):
+    """本地磁盘存储：存储键就是相对于工作目录的路径"""
+
+    name = 'local'
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(key)
+
+    def put_file(self, source_path: str, key: str, move: bool = False, link: bool = False):
+        os.makedirs(os.path.dirname(key), exist_ok=True)
+        if move:
+            os.replace(source_path, key)
+        else:
+            link_or_copy(source_path, key, link=link)
+
+    def save_local(self, key: str):
+        pass
+
+    def local_path(self, key: str, fetch: bool = True) -> str:
+        return key
+
+    def delete(self, key: Optional[str]):
+        remove_local(key)
+
+    def open(self, key: str) -> Tuple[BinaryIO, Optional[int]]:
+        return open(key, 'rb'), os.path.getsize(key)
+
+
+class S3Storage(Storage):
+    """S3 兼容对象存储（需要安装 boto3）
+
+    大文件由 boto3 的传输管理器自动分段（multipart）上传和下载；本地缓存目录只是加速，可以随时清空，
+    因此多个后端节点可以共用同一个存储桶而不需要共享磁盘。
+    缓存总大小超过 cache_max_bytes 时按最近使用时间（文件修改时间，命中时更新）淘汰，0 表示不限制
+    """
+
+    name = 's3'
+
+    def __init__(self, bucket: str, upload_folder: str, thumbnail_folder: str, cache_folder: str,
+                 endpoint_url: Optional[str] = None, region: Optional[str] = None,
+                 access_key: Optional[str] = None, secret_key: Optional[str] = None,
+                 multipart_threshold: int = 8 * 1024 * 1024, cache_max_bytes: int = 0):
+        super().__init__(upload_folder, thumbnail_folder, local_root=cache_folder)
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url or None
+        self.region = region or None
+        self.access_key = access_key or None
+        self.secret_key = secret_key or None
+        self.multipart_threshold = multipart_threshold
+        self.cache_max_bytes = cache_max_bytes
+        self._client = None
+        # 缓存目录的总大小，首次有文件进入缓存时扫描统计
+        self._cache_bytes = None
+        self._cache_lock = threading.Lock()
+
+    def __getstate__(self):
+        # 客户端和锁不能跨进程传递，子进程中重新创建（缓存大小在子进程中重新统计）
+        state = self.__dict__.copy()
+        state['_client'] = None
+        state['_cache_bytes'] = None
+        del state['_cache_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cache_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            from botocore.config import Config
+
+            self._client = boto3.client(
+                's3',
+                endpoint_url=self.endpoint_url,
+                region_name=self.region,
+                aws_access_key_id=self.access_key,
+                aws_secret_access_key=self.secret_key,
+                # MinIO 等自建服务通常只支持路径风格的地址
+                config=Config(signature_version='s3v4', s3={'addressing_style': 'path'},
+                              retries={'max_attempts': 5, 'mode': 'standard'})
+            )
+        return self._client
+
+    def _transfer_config(self):
+        from boto3.s3.transfer import TransferConfig
+        return TransferConfig(multipart_threshold=self.multipart_threshold,
+                              multipart_chunksize=self.multipart_threshold)
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.local_root, key)
+
+    def _cache_files(self):
+        """缓存目录中的文件 (路径, 大小, 最近使用时间)，跳过上传临时目录和写入中的临时文件"""
+        incoming = os.path.abspath(self.incoming_folder)
+        for root, dirs, files in os.walk(self.local_root):
+            dirs[:] = [name for name in dirs if os.path.abspath(os.path.join(root, name)) != incoming]
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _cache_added(self, path: str):
+        """文件进入缓存后调用：总大小超过上限时淘汰最久未使用的文件"""
+        if not self.cache_max_bytes:
+            return
+        with self._cache_lock:
+            if self._cache_bytes is None:
+                self._cache_bytes = sum(size for _, size, _ in self._cache_files())
+            elif os.path.exists(path):
+                self._cache_bytes += os.path.getsize(path)
+            if self._cache_bytes > self.cache_max_bytes:
+                self._evict_cache()
+
+    def _evict_cache(self):
+        files = sorted(self._cache_files(), key=lambda item: item[2])
+        total = sum(size for _, size, _ in files)
+        target = self.cache_max_bytes * CACHE_LOW_WATERMARK
+        cutoff = time.time() - CACHE_MIN_AGE
+        evicted = 0
+        for path, size, used_at in files:
+            if total <= target or used_at > cutoff:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        self._cache_bytes = total
+        if evicted:
+            print(f"对象存储缓存淘汰 {evicted} 个文件，当前 {total / 1024 / 1024:.1f}MB")
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def _upload(self, source_path: str, key: str):
+        content_type = mimetypes.guess_type(key)[0] or 'application/octet-stream'
+        self.client.upload_file(source_path, self.bucket, key, ExtraArgs={'ContentType': content_type},
+                                Config=self._transfer_config())
+
+    def put_file(self, source_path: str, key: str, move: bool = False, link: bool = False):
+        self._upload(source_path, key)
+        if move:
+            # 刚上传的文件留在缓存中，后续的缩略图/EXIF处理不需要再下载
+            cache_path = self._cache_path(key)
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            os.replace(source_path, cache_path)
+            self._cache_added(cache_path)
+
+    def save_local(self, key: str):
+        cache_path = self._cache_path(key)
+        self._upload(cache_path, key)
+        self._cache_added(cache_path)
+
+    def local_path(self, key: str, fetch: bool = True) -> str:
+        cache_path = self._cache_path(key)
+        if not fetch:
+            return cache_path
+        if os.path.exists(cache_path):
+            # 更新修改时间作为最近使用时间，淘汰时优先保留
+            try:
+                os.utime(cache_path)
+            except OSError:
+                pass
+            return cache_path
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f'{cache_path}.{uuid.uuid4().hex}.tmp'
+        try:
+            self.client.download_file(self.bucket, key, tmp_path, Config=self._transfer_config())
+            os.replace(tmp_path, cache_path)
+        finally:
+            remove_local(tmp_path)
+        self._cache_added(cache_path)
+        return cache_path
+
+    def delete(self, key: Optional[str]):
+        if not key:
+            return
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+        cache_path = self._cache_path(key)
+        if os.path.exists(cache_path):
+            size = os.path.getsize(cache_path)
+            remove_local(cache_path)
+            with self._cache_lock:
+                if self._cache_bytes is not None:
+                    self._cache_bytes -= size
+
+    def open(self, key: str) -> Tuple[BinaryIO, Optional[int]]:
+        response = self.client.get_object(Bucket=self.bucket, Key=key)
+        return response['Body'], response.get('ContentLength')
+
+    def presigned_url(self, key: str, expires: int = 3600) -> Optional[str]:
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': key}, ExpiresIn=expires
+        )
+
+
+def create_storage(config) -> Storage:
+    """根据配置（app.config）创建存储驱动"""
+    backend = (config.get('STORAGE_BACKEND') or 'local').lower()
+    if backend == 'local':
+        return LocalStorage(config['UPLOAD_FOLDER'], config['THUMBNAIL_FOLDER'])
+    if backend == 's3':
+        if not config.get('S3_BUCKET'):
+            raise ValueError('STORAGE_BACKEND=s3 需要配置 S3_BUCKET')
+        return S3Storage(
+            bucket=config['S3_BUCKET'],
+            upload_folder=config['UPLOAD_FOLDER'],
+            thumbnail_folder=config['THUMBNAIL_FOLDER'],
+            cache_folder=config.get('STORAGE_CACHE_FOLDER') or 'storage_cache',
+            endpoint_url=config.get('S3_ENDPOINT_URL'),
+            region=config.get('S3_REGION'),
+            access_key=config.get('S3_ACCESS_KEY'),
+            secret_key=config.get('S3_SECRET_KEY'),
+            multipart_threshold=config.get('S3_MULTIPART_THRESHOLD') or 8 * 1024 * 1024,
+            cache_max_bytes=config.get('STORAGE_CACHE_MAX_SIZE') or 0
+        )
+    raise ValueError(f'未知的存储后端: {backend}')
@@ -0,0 +1,77 @@
+"""
+缩略图生成（上传、渲染缓存和批量导入共用），以及列表中内嵌的低清占位图
+"""
+import base64
+import io
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from utils.color_analysis import extract_palette
+
+# 占位图长边像素与WebP质量：约100-300字节，base64后直接放在列表响应中
+PLACEHOLDER_SIZE = 16
+PLACEHOLDER_QUALITY = 40
+
+
+def generate_thumbnail(image_path, thumbnail_path, size=(300, 300)):
+    """生成缩略图"""
+    try:
+        with Image.open(image_path) as img:
+            # JPEG按接近目标的尺寸解码，避免为缩略图解码全图
+            img.draft('RGB', size)
+            # 确保图片是RGB模式
+            if img.mode in ('RGBA', 'LA', 'P'):
+                # 如果有透明通道，转换为RGB（白色背景）
+                if img.mode == 'RGBA':
+                    background = Image.new('RGB', img.size, (255, 255, 255))
+                    background.paste(img, mask=img.split()[3])  # 使用alpha通道作为mask
+                    img = background
+                else:
+                    img = img.convert('RGB')
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+            
+            # 生成缩略图
+            img.thumbnail(size, Image.Resampling.LANCZOS)
+            
+            # 根据缩略图文件扩展名确定保存格式
+            thumb_ext = os.path.splitext(thumbnail_path)[1].lower()
+            save_kwargs = {'optimize': True}
+            if thumb_ext in ['.jpg', '.jpeg']:
+                save_kwargs['quality'] = 85
+            
+            img.save(thumbnail_path, **save_kwargs)
+        return True
+    except Exception as e:
+        print(f"生成缩略图失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def generate_placeholder(image_path) -> Tuple[Optional[str], Optional[str]]:
+    """由缩略图生成占位图（长边16px的WebP data URI）和主色调（#rrggbb），失败时返回 (None, None)
+
+    前端在真正的缩略图加载前先显示放大模糊的占位图和主色调背景
+    """
+    try:
+        with Image.open(image_path) as img:
+            img.draft('RGB', (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+            small = img.convert('RGB')
+            small.thumbnail((PLACEHOLDER_SIZE * 2, PLACEHOLDER_SIZE * 2), Image.Resampling.BOX)
+
+        # 在32px图像上聚类取占比最高的颜色（extract_palette 使用BGR顺序）
+        palette = extract_palette(np.asarray(small)[:, :, ::-1].copy(), k=3)
+        dominant_color = palette[0] if palette else None
+
+        small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.Resampling.BOX)
+        buffer = io.BytesIO()
+        small.save(buffer, 'WEBP', quality=PLACEHOLDER_QUALITY, method=6)
+        placeholder = 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+        return placeholder, dominant_color
+    except Exception as e:
+        print(f"生成占位图失败: {e}")
+        return None, None
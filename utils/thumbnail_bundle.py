@@ -0,0 +1,56 @@
+"""
+缩略图打包：把一页照片的缩略图合并成一个响应，画廊页只需要一次请求
+
+格式（字节序为大端）：
+
+    4字节   头部长度 N
+    N字节   UTF-8 JSON 头部：{"version": 版本号, "format": 格式版本, "items": [{"id", "offset", "length", "mime"}, ...], "missing": [...]}
+    之后    各缩略图的原始字节依次拼接，offset 相对于数据区开头
+
+缩略图本身已经是压缩过的JPEG/PNG，直接拼接，不重新编码
+"""
+import hashlib
+import json
+import struct
+from typing import Iterable, List, Optional, Tuple
+
+BUNDLE_FORMAT_VERSION = 1
+
+
+def bundle_version(entries: Iterable[Tuple]) -> str:
+    """由 (照片ID, 编辑版本, 编辑修订号, 缩略图路径) 序列计算打包版本：任何一张缩略图变化时版本都会改变
+
+    撤销后再编辑会复用编辑版本号，修订号每次变化都递增、不会重复
+    """
+    digest = hashlib.sha1()
+    for photo_id, edit_version, edit_revision, thumbnail_path in entries:
+        digest.update(f'{photo_id}:{edit_version or 0}:{edit_revision or 0}:{thumbnail_path or ""};'.encode('utf-8'))
+    return digest.hexdigest()[:20]
+
+
+def pack_bundle(items: List[Tuple[int, str, bytes]], version: str, missing: Optional[List[int]] = None) -> bytes:
+    """items 为 [(照片ID, MIME类型, 缩略图字节)]，按顺序打包"""
+    entries = []
+    offset = 0
+    for photo_id, mime_type, data in items:
+        entries.append({'id': photo_id, 'offset': offset, 'length': len(data), 'mime': mime_type})
+        offset += len(data)
+    header = json.dumps({
+        'version': version,
+        'format': BUNDLE_FORMAT_VERSION,
+        'items': entries,
+        'missing': missing or []
+    }, separators=(',', ':')).encode('utf-8')
+    return b''.join([struct.pack('>I', len(header)), header] + [data for _, _, data in items])
+
+
+def unpack_bundle(body: bytes):
+    """解析打包结果，返回 (头部, {照片ID: 字节})"""
+    (header_length,) = struct.unpack('>I', body[:4])
+    header = json.loads(body[4:4 + header_length].decode('utf-8'))
+    data_start = 4 + header_length
+    files = {
+        item['id']: body[data_start + item['offset']:data_start + item['offset'] + item['length']]
+        for item in header['items']
+    }
+    return header, files
@@ -0,0 +1,163 @@
+"""
+内存向量索引（NumPy实现）
+向量较少时直接暴力计算内积；超过阈值后训练IVF（倒排文件）聚类，只在最近的若干簇中搜索
+"""
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# 少于该数量时使用暴力搜索（单次矩阵乘法已经足够快）
+BRUTE_FORCE_THRESHOLD = 20000
+# 训练聚类时最多使用的样本数
+TRAIN_SAMPLE_SIZE = 30000
+TRAIN_ITERATIONS = 10
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = TRAIN_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """球面k-means（向量已归一化，用内积作为相似度），返回聚类中心"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        # 空簇重新随机取一个样本作为中心
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+            norms[empty] = 1.0
+        centroids = sums / norms
+    return centroids.astype(np.float32)
+
+
+class VectorIndex:
+    """单个用户的向量索引，向量以float16连续存储，按照片ID增删"""
+
+    def __init__(self, dim: int, nprobe: int = 16, brute_force_threshold: int = BRUTE_FORCE_THRESHOLD):
+        self.dim = dim
+        self.nprobe = nprobe
+        self.brute_force_threshold = brute_force_threshold
+
+        self._vectors = np.zeros((0, dim), dtype=np.float16)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._alive = np.zeros(0, dtype=bool)
+        self._size = 0
+        self._row_of: Dict[int, int] = {}
+
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._row_of)
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 64)
+        vectors = np.zeros((new_capacity, self.dim), dtype=np.float16)
+        vectors[:self._size] = self._vectors[:self._size]
+        ids = np.zeros(new_capacity, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._vectors, self._ids, self._alive = vectors, ids, alive
+
+    def add(self, ids: Iterable[int], vectors: np.ndarray):
+        """添加或替换向量（vectors应已归一化）"""
+        ids = [int(i) for i in ids]
+        vectors = np.asarray(vectors, dtype=np.float16).reshape(len(ids), self.dim)
+        with self._lock:
+            for photo_id in ids:
+                self._remove_locked(photo_id)
+            self._reserve(len(ids))
+            start = self._size
+            end = start + len(ids)
+            self._vectors[start:end] = vectors
+            self._ids[start:end] = ids
+            self._alive[start:end] = True
+            self._size = end
+            for offset, photo_id in enumerate(ids):
+                self._row_of[photo_id] = start + offset
+
+            if self._centroids is not None:
+                self._assign_rows(np.arange(start, end))
+            elif len(self._row_of) >= self.brute_force_threshold:
+                self._train()
+
+    def remove(self, photo_id: int):
+        with self._lock:
+            self._remove_locked(int(photo_id))
+            # 删除过多时压缩存储
+            if self._size > 64 and len(self._row_of) < self._size * 0.7:
+                self._compact()
+
+    def _remove_locked(self, photo_id: int):
+        row = self._row_of.pop(photo_id, None)
+        if row is not None:
+            self._alive[row] = False
+
+    def _compact(self):
+        rows = np.flatnonzero(self._alive[:self._size])
+        self._vectors = self._vectors[rows].copy()
+        self._ids = self._ids[rows].copy()
+        self._alive = np.ones(len(rows), dtype=bool)
+        self._size = len(rows)
+        self._row_of = {int(photo_id): row for row, photo_id in enumerate(self._ids)}
+        if self._centroids is not None:
+            if self._size >= self.brute_force_threshold:
+                self._train()
+            else:
+                self._centroids = None
+                self._lists = []
+
+    def _train(self):
+        """训练IVF聚类中心并把所有向量分配到各簇"""
+        rows = np.flatnonzero(self._alive[:self._size])
+        nlist = max(1, int(np.sqrt(len(rows))))
+        rng = np.random.default_rng(0)
+        sample_rows = rows if len(rows) <= TRAIN_SAMPLE_SIZE else rng.choice(rows, TRAIN_SAMPLE_SIZE, replace=False)
+        sample = self._vectors[sample_rows].astype(np.float32)
+        self._centroids = kmeans(sample, min(nlist, len(sample)))
+        self._lists = [np.zeros(0, dtype=np.int64) for _ in range(len(self._centroids))]
+        self._assign_rows(rows)
+
+    def _assign_rows(self, rows: np.ndarray):
+        if len(rows) == 0:
+            return
+        assign = np.argmax(self._vectors[rows].astype(np.float32) @ self._centroids.T, axis=1)
+        order = np.argsort(assign, kind='stable')
+        assign, rows = assign[order], rows[order]
+        # 按簇分组后追加，每簇只拼接一次
+        bounds = np.flatnonzero(np.diff(assign)) + 1
+        starts = np.concatenate(([0], bounds))
+        for start, group_rows in zip(starts, np.split(rows, bounds)):
+            cluster = int(assign[start])
+            self._lists[cluster] = np.concatenate((self._lists[cluster], group_rows))
+
+    def search(self, query: np.ndarray, k: int = 20) -> List[Tuple[int, float]]:
+        """返回与query最相似的k个 (照片ID, 相似度)，相似度为内积（余弦）"""
+        query = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            if not self._row_of:
+                return []
+            if self._centroids is None:
+                rows = np.flatnonzero(self._alive[:self._size])
+            else:
+                nprobe = min(self.nprobe, len(self._centroids))
+                probe = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+                rows = np.concatenate([self._lists[c] for c in probe])
+                rows = rows[self._alive[rows]]
+            if len(rows) == 0:
+                return []
+            scores = self._vectors[rows].astype(np.float32) @ query
+            ids = self._ids[rows]
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top]